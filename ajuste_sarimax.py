@@ -0,0 +1,178 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace import kalman_filter
+
+# Ajuste rápido de los modelos SARIMAX de irradiación. En lugar de estimar desde cero el modelo completo:
+#   - el periodo estacional se elige a partir de la autocorrelación de la serie (24 en series horarias
+#     de irradiación, donde un periodo de 12 no sigue el ciclo solar)
+#   - la verosimilitud se maximiza sobre la serie ya diferenciada (simple_differencing) y con la
+#     varianza concentrada, lo que reduce el tamaño del estado y elimina un parámetro
+#   - el optimizador parte de los parámetros de un modelo ya entrenado con la misma especificación
+#     (la versión anterior del mismo modelo u otra ubicación) cuando lo hay
+# El resultado devuelto es siempre el del modelo estándar (serie sin diferenciar y varianza explícita),
+# con los parámetros estimados aplicados mediante un único filtrado: se guarda y predice igual que un
+# ajuste convencional. Para incorporar observaciones nuevas a un modelo ya ajustado basta con extender
+# el filtro (extender) sin volver a estimar
+
+PERIODOS_CANDIDATOS = (12, 24, 168)
+
+# El filtro de Kalman guarda por defecto las matrices de covarianza del estado en cada instante: con un
+# periodo de 24 son unos 50 x 50 valores por hora (más de 1 GB por modelo con un año de datos). Las
+# predicciones, sus intervalos y los diagnósticos solo necesitan las del último instante
+MEMORIA_FILTRO = (kalman_filter.MEMORY_NO_FILTERED_COV | kalman_filter.MEMORY_NO_PREDICTED_COV
+                  | kalman_filter.MEMORY_NO_GAIN | kalman_filter.MEMORY_NO_SMOOTHING)
+
+
+def autocorrelacion(serie, retardos):
+    # Autocorrelación muestral en los retardos indicados, calculada con FFT (los huecos cuentan como la media)
+    valores = np.asarray(serie, dtype=float)
+    valores = np.nan_to_num(valores - np.nanmean(valores))
+    n = len(valores)
+    tamano = 1 << (2 * n - 1).bit_length()
+    espectro = np.fft.rfft(valores, tamano)
+    covarianzas = np.fft.irfft(espectro * np.conj(espectro), tamano)[:n]
+    return covarianzas[np.asarray(retardos)] / covarianzas[0]
+
+
+def periodo_estacional(serie, candidatos=PERIODOS_CANDIDATOS):
+    # Candidato con mayor autocorrelación entre los que caben al menos dos veces en la serie
+    candidatos = [periodo for periodo in candidatos if 2 * periodo < len(serie)]
+    if not candidatos:
+        raise ValueError(f"La serie ({len(serie)} observaciones) es demasiado corta para estimar un periodo estacional")
+    return int(candidatos[int(np.argmax(autocorrelacion(serie, candidatos)))])
+
+
+def especificacion(serie, order, seasonal_order, candidatos=PERIODOS_CANDIDATOS):
+    # (order, seasonal_order) con el periodo resuelto: un periodo None se elige con periodo_estacional
+    seasonal_order = tuple(seasonal_order)
+    if seasonal_order[3] is None:
+        seasonal_order = seasonal_order[:3] + (periodo_estacional(serie, candidatos),)
+    return tuple(order), seasonal_order
+
+
+def ajustar(endog, order=(2, 1, 0), seasonal_order=(1, 1, 0, None), exog=None, iniciales=None, maxiter=50):
+    # Ajusta el SARIMAX y devuelve sus resultados sobre el modelo estándar.
+    # iniciales: parámetros de partida (Series con los nombres de los parámetros, p. ej. los de
+    # parametros_previos); se usan solo si contienen todos los que estima el modelo
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    order, seasonal_order = especificacion(endog, order, seasonal_order)
+    rapido = SARIMAX(endog, exog=exog, order=order, seasonal_order=seasonal_order,
+                     simple_differencing=True, concentrate_scale=True)
+    inicio = None
+    if iniciales is not None and set(rapido.param_names) <= set(iniciales.index):
+        inicio = iniciales[rapido.param_names].to_numpy(dtype=float)
+    estimados = rapido.fit(start_params=inicio, method='lbfgs', maxiter=maxiter, return_params=True, disp=False)
+    escala = rapido.filter(estimados, cov_type='none', conserve_memory=MEMORIA_FILTRO).scale
+
+    # Los parámetros del modelo estándar son los mismos más la varianza, que va al final
+    completo = SARIMAX(endog, exog=exog, order=order, seasonal_order=seasonal_order)
+    params = pd.Series(np.r_[np.asarray(estimados), escala], index=completo.param_names)
+    return completo.filter(params, cov_type='none', conserve_memory=MEMORIA_FILTRO)
+
+
+def parametros_previos(almacen, nombres, order, seasonal_order):
+    # Parámetros (Series por nombre) de la versión actual del primer modelo de nombres que sea un SARIMAX
+    # con la misma especificación; None si ninguno lo es. Solo se leen los arrays, sin reconstruir el filtro
+    for nombre in nombres:
+        try:
+            arrays, metadatos = almacen.cargar_arrays(nombre)
+        except (KeyError, FileNotFoundError):
+            continue
+        if metadatos['tipo'] != 'sarimax' or not metadatos['parametros'].get('nombres_params'):
+            continue
+        previa = metadatos['parametros']['especificacion']
+        if list(previa.get('order', ())) != list(order) or list(previa.get('seasonal_order', ())) != list(seasonal_order):
+            continue
+        return pd.Series(np.asarray(arrays['params'], dtype=float), index=metadatos['parametros']['nombres_params'])
+    return None
+
+
+def extender(resultado, observaciones, exog=None):
+    # Añade al modelo las observaciones posteriores a su entrenamiento con los mismos parámetros: solo se
+    # recalcula el filtro, de modo que las predicciones parten de los datos más recientes sin reentrenar
+    # (las horas que falten entre el final del entrenamiento y la última observación quedan como huecos).
+    # Equivale a resultado.append(..., refit=False), que sobre un resultado filtrado con MEMORIA_FILTRO
+    # intentaría suavizar y necesitaría todos los estados
+    datos = resultado.model.data
+    fin = datos.row_labels[-1]
+    observaciones = observaciones[observaciones.index > fin]
+    if observaciones.empty:
+        return resultado
+    if datos.freq is not None:
+        indice = pd.date_range(fin, observaciones.index[-1], freq=datos.freq)[1:]
+        observaciones = observaciones.reindex(indice)
+    endog = pd.Series(np.asarray(datos.orig_endog, dtype=float).ravel(), index=datos.row_labels, name=datos.ynames)
+    endog = pd.concat([endog, pd.Series(observaciones.to_numpy(dtype=float), index=observaciones.index, name=datos.ynames)])
+    if datos.orig_exog is None:
+        exog = None
+    else:
+        exog = pd.concat([pd.DataFrame(datos.orig_exog, index=datos.row_labels), exog.reindex(observaciones.index)])
+    if datos.freq is not None:
+        endog.index.freq = datos.freq
+        if exog is not None:
+            exog.index.freq = datos.freq
+    return resultado.model.clone(endog, exog=exog).filter(resultado.params, cov_type='none', conserve_memory=MEMORIA_FILTRO)
+
+
+class PronosticoSarimax:
+    # SARIMAX ajustado reducido a lo necesario para predecir a partir del final del entrenamiento: sus
+    # parámetros y el estado previsto para la primera hora siguiente (media y covarianza), que es de
+    # donde parte statsmodels al predecir fuera de la muestra. Al cargarlo no se copia la serie ni se
+    # repite el filtro de Kalman; las predicciones filtran solo las horas pedidas, sin observaciones.
+    # Para predicciones dentro del periodo de entrenamiento se reconstruye el modelo completo
+    # (completo, una función sin argumentos) la primera vez que se necesita
+    def __init__(self, especificacion, params, estado, covarianza, inicio, frecuencia, nombre_endog=None,
+                 nombres_exog=None, completo=None):
+        self.especificacion = especificacion
+        self.params = params
+        self.estado = np.asarray(estado, dtype=float)
+        self.covarianza = np.asarray(covarianza, dtype=float)
+        self.inicio = pd.Timestamp(inicio)  # Primera hora sin observar
+        self.frecuencia = frecuencia
+        self.nombre_endog = nombre_endog
+        self.nombres_exog = nombres_exog
+        self._completo = completo
+        self._resultado_completo = None
+
+    def completo(self):
+        if self._resultado_completo is None:
+            if self._completo is None:
+                raise ValueError(f"El modelo solo puede predecir a partir de {self.inicio}")
+            self._resultado_completo = self._completo()
+        return self._resultado_completo
+
+    def _pronostico(self, indice, exog=None):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        endog = pd.Series(np.nan, index=indice, name=self.nombre_endog)
+        if self.nombres_exog:
+            exog = pd.DataFrame(np.asarray(exog, dtype=float).reshape(len(indice), -1), index=indice,
+                                columns=self.nombres_exog)
+        modelo = SARIMAX(endog, exog=exog, **self.especificacion)
+        modelo.initialize_known(self.estado, self.covarianza)
+        return modelo.filter(self.params, cov_type='none').predict()
+
+    def forecast(self, steps=1, exog=None):
+        return self._pronostico(pd.date_range(self.inicio, periods=steps, freq=self.frecuencia), exog)
+
+    def predict(self, start, end, exog=None):
+        # Como el predict de statsmodels con fechas: exog cubre desde la primera hora sin observar hasta end
+        inicio, fin = pd.Timestamp(start), pd.Timestamp(end)
+        if inicio < self.inicio:
+            return self.completo().predict(start=start, end=end, exog=exog)
+        prediccion = self._pronostico(pd.date_range(self.inicio, fin, freq=self.frecuencia), exog)
+        return prediccion[prediccion.index >= inicio]
@@ -0,0 +1,219 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Almacenamiento columnar de los datos del proyecto. Cada conjunto es un dataset Parquet con columnas
+# tipadas, particionado en directorios estilo Hive (capital=Albacete/slope=30/azimuth=180/...) para que
+# cada script lea solo las columnas y particiones que necesita. Si un conjunto todavía no se ha
+# convertido (conversion_datos.py) se lee su CSV original con los mismos tipos.
+
+# Directorio raíz de los datos (ajustable mediante la variable de entorno DATOS_PATH)
+RAIZ_DATOS = os.environ.get('DATOS_PATH', 'datos')
+
+# Definición de cada conjunto: directorio, particiones (con su tipo), columna temporal y su zona
+# horaria, tipos de las demás columnas y CSV de origen
+CONJUNTOS = {
+    # Series horarias de PVGIS descargadas (horas en UTC)
+    'pvgis': {
+        'particiones': {'capital': pa.string(), 'slope': pa.int16(), 'azimuth': pa.int16()},
+        'tiempo': 'time',
+        'zona': 'UTC',
+        'tipos': {'G(i)': 'float32', 'T2m': 'float32'},
+        'csv': 'combined_data_spain.csv',
+    },
+    # Año típico (media y percentiles por día del año y hora) por capital, inclinación y orientación
+    'anio_tipico': {
+        'particiones': {'capital': pa.string()},
+        'tiempo': None,
+        'tipos': {
+            'day': 'int16', 'hour': 'int8', 'slope': 'int16', 'azimuth': 'int16', 'observaciones': 'int16',
+            'G(i)': 'float32', 'G(i)_p10': 'float32', 'G(i)_p50': 'float32', 'G(i)_p90': 'float32',
+            'T2m': 'float32', 'T2m_p10': 'float32', 'T2m_p50': 'float32', 'T2m_p90': 'float32',
+        },
+        'csv': 'typical_year_spain_corrected.csv',
+    },
+    # Serie horaria de irradiación y temperatura con la que se entrenan los modelos de irradiación
+    'serie_irradiacion': {
+        'particiones': {},
+        'tiempo': 'datetime',
+        'zona': None,
+        'tipos': {'G(i)': 'float64', 'T2m': 'float64'},
+        'csv': 'little_typical_year_spain_corrected.csv',
+    },
+    # Precios horarios de REE (hora local peninsular), particionados por año
+    'precio_spot': {
+        'particiones': {'anio': pa.int16()},
+        'tiempo': 'datetime',
+        'zona': 'Europe/Madrid',
+        'tipos': {'value': 'float64', 'percentage': 'float64'},
+        'csv': 'spot_prices.csv',
+    },
+    'precio_pvpc': {
+        'particiones': {'anio': pa.int16()},
+        'tiempo': 'datetime',
+        'zona': 'Europe/Madrid',
+        'tipos': {'value': 'float64', 'percentage': 'float64'},
+        'csv': 'pvpc_prices.csv',
+    },
+    # Perfiles de consumo (tarifas A a D) por día del año y hora
+    'perfil': {
+        'particiones': {},
+        'tiempo': None,
+        'tipos': {
+            'day': 'int16', 'hour': 'int8',
+            'COEF. PERFIL A': 'float64', 'COEF. PERFIL B': 'float64', 'COEF. PERFIL C': 'float64', 'COEF. PERFIL D': 'float64',
+        },
+        'csv': 'typical_year_profile.csv',
+    },
+}
+
+
+def ruta_conjunto(nombre, raiz=None):
+    return os.path.join(raiz or RAIZ_DATOS, nombre)
+
+
+def existe(nombre, raiz=None):
+    return os.path.isdir(ruta_conjunto(nombre, raiz))
+
+
+def normalizar(nombre, df):
+    # Aplica los tipos del conjunto: instantes con zona horaria, números compactos y ciudades categóricas
+    conjunto = CONJUNTOS[nombre]
+    df = df.copy()
+    tiempo = conjunto['tiempo']
+    if tiempo is not None and tiempo in df:
+        fechas = pd.to_datetime(df[tiempo], utc=conjunto['zona'] is not None)
+        df[tiempo] = fechas.dt.tz_convert(conjunto['zona']) if conjunto['zona'] else fechas
+    for columna, tipo in conjunto['tipos'].items():
+        if columna in df:
+            df[columna] = df[columna].astype(tipo)
+    if 'anio' in conjunto['particiones'] and tiempo in df:
+        df['anio'] = df[tiempo].dt.year.astype('int16')
+    for columna, tipo in conjunto['particiones'].items():
+        if columna in df and columna != 'anio':
+            df[columna] = df[columna].astype('category' if tipo == pa.string() else tipo.to_pandas_dtype())
+    return df
+
+
+def _particionado(nombre):
+    particiones = CONJUNTOS[nombre]['particiones']
+    if not particiones:
+        return None
+    return ds.partitioning(pa.schema(list(particiones.items())), flavor='hive')
+
+
+def guardar(nombre, df, raiz=None, reemplazar=True, prefijo='parte'):
+    # Escribe las filas en el dataset. Con reemplazar=True, las particiones presentes en df sustituyen a
+    # las existentes (volver a guardar una capital o un año no duplica filas); con False se añaden
+    df = normalizar(nombre, df)
+    particiones = list(CONJUNTOS[nombre]['particiones'])
+    for columna in particiones:
+        # Las particiones se escriben con su valor, no como diccionario
+        df[columna] = df[columna].astype(str) if CONJUNTOS[nombre]['particiones'][columna] == pa.string() else df[columna]
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    if particiones:
+        tabla = tabla.cast(pa.schema([
+            pa.field(campo.name, CONJUNTOS[nombre]['particiones'].get(campo.name, campo.type)) for campo in tabla.schema
+        ]))
+
+    ruta = ruta_conjunto(nombre, raiz)
+    if not particiones and reemplazar and os.path.isdir(ruta):
+        shutil.rmtree(ruta)
+    escritos = []
+    ds.write_dataset(
+        tabla,
+        ruta,
+        format='parquet',
+        partitioning=_particionado(nombre),
+        basename_template=prefijo + '-{i}.parquet',
+        existing_data_behavior='delete_matching' if reemplazar else 'overwrite_or_ignore',
+        # Grupos de filas grandes: las estadísticas por grupo permiten saltar rangos de fechas al leer
+        max_rows_per_group=1 << 20,
+        file_visitor=lambda archivo: escritos.append(archivo.path),
+    )
+    # Archivos escritos, para que quien guarda pueda registrarlos (p. ej. el manifiesto de descargas)
+    return escritos
+
+
+def _filtro(filtros, desde, hasta, tiempo):
+    expresion = None
+    for columna, valor in (filtros or {}).items():
+        condicion = ds.field(columna).isin(valor) if isinstance(valor, (list, tuple, set)) else ds.field(columna) == valor
+        expresion = condicion if expresion is None else expresion & condicion
+    for limite, operador in ((desde, '__ge__'), (hasta, '__le__')):
+        if limite is not None:
+            condicion = getattr(ds.field(tiempo), operador)(pa.scalar(pd.Timestamp(limite)))
+            expresion = condicion if expresion is None else expresion & condicion
+    return expresion
+
+
+def _leer_csv(nombre, raiz, columnas, filtros, desde, hasta):
+    conjunto = CONJUNTOS[nombre]
+    ruta = os.path.join(raiz or RAIZ_DATOS, conjunto['csv'])
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No existe el conjunto '{nombre}' ({ruta_conjunto(nombre, raiz)}) ni su CSV ({ruta})")
+    necesarias = None
+    if columnas is not None:
+        derivadas = {'anio'} & set(columnas) | {'anio'} & set(filtros or {})
+        necesarias = (set(columnas) | set(filtros or {})) - derivadas
+        if derivadas or desde is not None or hasta is not None:
+            necesarias.add(conjunto['tiempo'])
+    df = normalizar(nombre, pd.read_csv(ruta, usecols=lambda c: necesarias is None or c in necesarias))
+    for columna, valor in (filtros or {}).items():
+        df = df[df[columna].isin(valor if isinstance(valor, (list, tuple, set)) else [valor])]
+    if desde is not None:
+        df = df[df[conjunto['tiempo']] >= pd.Timestamp(desde)]
+    if hasta is not None:
+        df = df[df[conjunto['tiempo']] <= pd.Timestamp(hasta)]
+    return _ordenar(nombre, df if columnas is None else df[list(columnas)])
+
+
+def _ordenar(nombre, df):
+    # Ni Parquet ni las descargas en paralelo garantizan el orden: se devuelve ordenado por partición y tiempo
+    conjunto = CONJUNTOS[nombre]
+    if conjunto['tiempo'] in df:
+        orden = [c for c in conjunto['particiones'] if c in df and c != 'anio'] + [conjunto['tiempo']]
+        df = df.sort_values(orden, kind='stable')
+    return df.reset_index(drop=True)
+
+
+def leer(nombre, columnas=None, filtros=None, desde=None, hasta=None, raiz=None):
+    # Lee un conjunto cargando solo las columnas indicadas. filtros: {columna: valor o lista de valores};
+    # los filtros sobre particiones descartan directorios enteros sin abrirlos. desde/hasta acotan la
+    # columna temporal (con la zona horaria del conjunto si no se indica otra)
+    conjunto = CONJUNTOS[nombre]
+    tiempo = conjunto['tiempo']
+    if conjunto.get('zona'):
+        desde = None if desde is None else _con_zona(desde, conjunto['zona'])
+        hasta = None if hasta is None else _con_zona(hasta, conjunto['zona'])
+
+    if not existe(nombre, raiz):
+        return _leer_csv(nombre, raiz, columnas, filtros, desde, hasta)
+
+    dataset = ds.dataset(ruta_conjunto(nombre, raiz), format='parquet', partitioning=_particionado(nombre))
+    tabla = dataset.to_table(columns=columnas, filter=_filtro(filtros, desde, hasta, tiempo))
+    df = tabla.to_pandas()
+    for columna, tipo in conjunto['particiones'].items():
+        if columna in df and tipo == pa.string():
+            df[columna] = df[columna].astype('category')
+    return _ordenar(nombre, df)
+
+
+def _con_zona(instante, zona):
+    instante = pd.Timestamp(instante)
+    return instante.tz_localize(zona) if instante.tzinfo is None else instante.tz_convert(zona)
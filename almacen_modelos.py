@@ -0,0 +1,304 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import datetime
+import functools
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from prophet_numpy import ProphetNumpy
+
+# Almacén versionado de modelos. Cada modelo guarda sus parámetros como arrays .npy (que se abren
+# con mmap, de modo que varios procesos comparten una sola copia física en memoria) junto con sus
+# metadatos: tipo, rango de entrenamiento, métricas y huella de los datos.
+#
+#   <raiz>/<nombre>/<version>/metadatos.json
+#   <raiz>/<nombre>/<version>/<array>.npy
+#   <raiz>/<nombre>/<version>/objeto.pkl   (opcional, para modelos que no se descomponen en arrays)
+#   <raiz>/<nombre>/ACTUAL                 versión que carga la API
+#   <raiz>/<nombre>/FIJADA                 si existe, los nuevos entrenamientos no cambian ACTUAL
+
+ARCHIVO_METADATOS = 'metadatos.json'
+ARCHIVO_OBJETO = 'objeto.pkl'
+ARCHIVO_ACTUAL = 'ACTUAL'
+ARCHIVO_FIJADA = 'FIJADA'
+
+
+def huella_datos(datos):
+    # Huella estable del conjunto de entrenamiento (DataFrame o Series), incluido su índice
+    return hashlib.sha256(pd.util.hash_pandas_object(datos, index=True).values.tobytes()).hexdigest()[:16]
+
+
+def rango_entrenamiento(indice):
+    indice = pd.DatetimeIndex(indice)
+    return {'inicio': indice.min().isoformat(), 'fin': indice.max().isoformat(), 'observaciones': len(indice)}
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+
+# Conversión de cada familia de modelos a (arrays, parámetros JSON) y vuelta
+def _componentes_prophet(modelo):
+    exportado = modelo if isinstance(modelo, ProphetNumpy) else ProphetNumpy.desde_prophet(modelo)
+    return exportado.componentes()
+
+
+def _reconstruir_prophet(arrays, parametros, completo=False):
+    return ProphetNumpy.desde_componentes(arrays, parametros)
+
+
+def _componentes_sarimax(resultado):
+    # Un SARIMAX ajustado queda definido por su especificación, sus parámetros y la serie de
+    # entrenamiento. Se guarda además el estado previsto tras la última observación (media y
+    # covarianza), del que parten las predicciones sin repetir el filtro de Kalman al cargar
+    modelo = resultado.model
+    datos = modelo.data
+    indice = pd.DatetimeIndex(datos.row_labels)
+    arrays = {
+        'params': np.asarray(resultado.params, dtype=float),
+        'endog': np.asarray(datos.orig_endog, dtype=float).reshape(len(indice), -1),
+        'indice': indice.asi8,
+        'estado': np.asarray(resultado.filter_results.predicted_state[:, -1], dtype=float),
+        'estado_cov': np.asarray(resultado.filter_results.predicted_state_cov[:, :, -1], dtype=float),
+    }
+    if datos.orig_exog is not None:
+        arrays['exog'] = np.asarray(datos.orig_exog, dtype=float)
+    especificacion = {
+        clave: valor for clave, valor in modelo._get_init_kwds().items()
+        if clave in ('order', 'seasonal_order', 'trend', 'measurement_error', 'time_varying_regression',
+                     'mle_regression', 'simple_differencing', 'enforce_stationarity', 'enforce_invertibility',
+                     'hamilton_representation', 'concentrate_scale', 'trend_offset')
+    }
+    parametros = {
+        'especificacion': especificacion,
+        'frecuencia': indice.freqstr or indice.inferred_freq,
+        'nombres_params': list(resultado.params.index) if hasattr(resultado.params, 'index') else None,
+        'nombre_endog': datos.ynames if isinstance(datos.ynames, str) else None,
+        'nombres_exog': list(datos.xnames) if datos.orig_exog is not None else None,
+    }
+    return arrays, parametros
+
+
+def _especificacion_sarimax(parametros):
+    return {
+        clave: tuple(valor) if isinstance(valor, list) else valor
+        for clave, valor in parametros['especificacion'].items()
+    }
+
+
+def _params_sarimax(arrays, parametros):
+    params = np.asarray(arrays['params'])
+    if parametros['nombres_params']:
+        params = pd.Series(params, index=parametros['nombres_params'])
+    return params
+
+
+def _filtrar_sarimax(arrays, parametros):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    from ajuste_sarimax import MEMORIA_FILTRO
+
+    indice = pd.DatetimeIndex(np.asarray(arrays['indice']), freq=parametros['frecuencia'])
+    endog = pd.Series(arrays['endog'][:, 0], index=indice, name=parametros['nombre_endog'])
+    exog = None
+    if 'exog' in arrays:
+        exog = pd.DataFrame(np.asarray(arrays['exog']), index=indice, columns=parametros['nombres_exog'])
+    # Aplicar el filtro con los parámetros guardados reproduce el resultado del ajuste sin reentrenar
+    # (sin conservar las covarianzas del estado de cada instante, que no se usan para predecir)
+    return SARIMAX(endog, exog=exog, **_especificacion_sarimax(parametros)).filter(
+        _params_sarimax(arrays, parametros), conserve_memory=MEMORIA_FILTRO)
+
+
+def _reconstruir_sarimax(arrays, parametros, completo=False):
+    # Por defecto, un modelo solo para predecir a partir del final del entrenamiento: no lee la serie ni
+    # repite el filtro. Con completo=True (o en versiones guardadas sin el estado final) se reconstruye
+    # el resultado del ajuste entero, necesario para predecir dentro del periodo de entrenamiento,
+    # extender el filtro o analizar los residuos
+    from ajuste_sarimax import PronosticoSarimax
+
+    if completo or 'estado' not in arrays:
+        return _filtrar_sarimax(arrays, parametros)
+    especificacion = _especificacion_sarimax(parametros)
+    indice = arrays['indice']
+    if especificacion.get('trend_offset') is not None:
+        # La tendencia temporal continúa donde acabó el entrenamiento
+        especificacion['trend_offset'] += len(indice)
+    frecuencia = parametros['frecuencia']
+    return PronosticoSarimax(
+        especificacion, _params_sarimax(arrays, parametros), arrays['estado'], arrays['estado_cov'],
+        pd.Timestamp(int(indice[-1])) + pd.tseries.frequencies.to_offset(frecuencia), frecuencia,
+        parametros['nombre_endog'], parametros['nombres_exog'],
+        completo=functools.partial(_filtrar_sarimax, arrays, parametros),
+    )
+
+
+FAMILIAS = {
+    'prophet': (_componentes_prophet, _reconstruir_prophet),
+    'sarimax': (_componentes_sarimax, _reconstruir_sarimax),
+}
+
+
+class AlmacenModelos:
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def _ruta(self, nombre, version=None):
+        return os.path.join(self.raiz, nombre) if version is None else os.path.join(self.raiz, nombre, version)
+
+    def nombres(self):
+        if not os.path.isdir(self.raiz):
+            return []
+        return sorted(nombre for nombre in os.listdir(self.raiz) if os.path.isdir(self._ruta(nombre)))
+
+    def versiones(self, nombre):
+        # Las versiones empiezan por la fecha de creación: el orden alfabético es el cronológico
+        ruta = self._ruta(nombre)
+        if not os.path.isdir(ruta):
+            return []
+        return sorted(v for v in os.listdir(ruta) if os.path.isfile(os.path.join(ruta, v, ARCHIVO_METADATOS)))
+
+    def version_actual(self, nombre):
+        ruta = os.path.join(self._ruta(nombre), ARCHIVO_ACTUAL)
+        if os.path.exists(ruta):
+            with open(ruta) as f:
+                return f.read().strip()
+        versiones = self.versiones(nombre)
+        if not versiones:
+            raise KeyError(f"No hay versiones del modelo '{nombre}' en {self.raiz}")
+        return versiones[-1]
+
+    def fijada(self, nombre):
+        return os.path.exists(os.path.join(self._ruta(nombre), ARCHIVO_FIJADA))
+
+    def guardar(self, nombre, modelo, tipo, rango=None, metricas=None, huella=None, objeto=False, etiquetas=None):
+        # Guarda una versión nueva del modelo y la marca como actual salvo que la versión esté fijada.
+        # tipo es una de FAMILIAS o 'pickle' (el modelo se guarda tal cual en objeto.pkl).
+        # Con objeto=True se guarda además el objeto completo, p. ej. para seguir analizándolo.
+        # etiquetas: datos descriptivos libres (p. ej. la ubicación de un modelo de irradiación)
+        if tipo == 'pickle':
+            arrays, parametros = {}, {}
+        else:
+            arrays, parametros = FAMILIAS[tipo][0](modelo)
+
+        contenido = hashlib.sha256()
+        for clave in sorted(arrays):
+            contenido.update(clave.encode())
+            contenido.update(np.ascontiguousarray(arrays[clave]).tobytes())
+        contenido.update(json.dumps(parametros, sort_keys=True).encode())
+        objeto_serializado = pickle.dumps(modelo) if tipo == 'pickle' or objeto else None
+        if objeto_serializado is not None:
+            contenido.update(objeto_serializado)
+
+        creado_en = datetime.datetime.now(datetime.timezone.utc)
+        version = f"{creado_en:%Y%m%dT%H%M%S}-{contenido.hexdigest()[:8]}"
+        metadatos = {
+            'nombre': nombre,
+            'version': version,
+            'tipo': tipo,
+            'creado_en': creado_en.isoformat(),
+            'rango_entrenamiento': rango,
+            'metricas': metricas or {},
+            'huella_datos': huella,
+            'etiquetas': etiquetas or {},
+            'parametros': parametros,
+            'arrays': sorted(arrays),
+            'objeto': objeto_serializado is not None,
+        }
+
+        # Se escribe en un directorio temporal y se renombra: una versión nunca queda a medias
+        os.makedirs(self._ruta(nombre), exist_ok=True)
+        temporal = tempfile.mkdtemp(prefix='.tmp-', dir=self._ruta(nombre))
+        try:
+            for clave, valores in arrays.items():
+                np.save(os.path.join(temporal, clave + '.npy'), np.ascontiguousarray(valores))
+            if objeto_serializado is not None:
+                with open(os.path.join(temporal, ARCHIVO_OBJETO), 'wb') as f:
+                    f.write(objeto_serializado)
+            with open(os.path.join(temporal, ARCHIVO_METADATOS), 'w') as f:
+                json.dump(metadatos, f, indent=2, ensure_ascii=False)
+            if os.path.isdir(self._ruta(nombre, version)):
+                # Mismo contenido guardado en el mismo segundo: la versión ya existe
+                shutil.rmtree(temporal)
+            else:
+                os.rename(temporal, self._ruta(nombre, version))
+        except Exception:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+        if not self.fijada(nombre):
+            self._apuntar(nombre, version)
+        return version
+
+    def _apuntar(self, nombre, version):
+        if version not in self.versiones(nombre):
+            raise KeyError(f"El modelo '{nombre}' no tiene la versión '{version}'")
+        _escribir_atomico(os.path.join(self._ruta(nombre), ARCHIVO_ACTUAL), version + '\n')
+
+    def metadatos(self, nombre, version=None):
+        version = version or self.version_actual(nombre)
+        with open(os.path.join(self._ruta(nombre, version), ARCHIVO_METADATOS)) as f:
+            return json.load(f)
+
+    def cargar_arrays(self, nombre, version=None):
+        # Devuelve (arrays, metadatos) sin reconstruir el modelo. Los arrays se abren en modo mmap de solo lectura
+        metadatos = self.metadatos(nombre, version)
+        ruta = self._ruta(nombre, metadatos['version'])
+        arrays = {clave: np.load(os.path.join(ruta, clave + '.npy'), mmap_mode='r') for clave in metadatos['arrays']}
+        return arrays, metadatos
+
+    def cargar(self, nombre, version=None, completo=False):
+        # Devuelve (modelo, metadatos). completo: los SARIMAX se reconstruyen con el filtro entero en
+        # lugar de solo para predecir (ver _reconstruir_sarimax)
+        metadatos = self.metadatos(nombre, version)
+        if metadatos['tipo'] == 'pickle':
+            with open(os.path.join(self._ruta(nombre, metadatos['version']), ARCHIVO_OBJETO), 'rb') as f:
+                return pickle.load(f), metadatos
+        arrays, metadatos = self.cargar_arrays(nombre, metadatos['version'])
+        return FAMILIAS[metadatos['tipo']][1](arrays, metadatos['parametros'], completo), metadatos
+
+    def cargar_objeto(self, nombre, version=None):
+        # Objeto completo guardado con objeto=True (p. ej. el modelo Prophet original)
+        metadatos = self.metadatos(nombre, version)
+        with open(os.path.join(self._ruta(nombre, metadatos['version']), ARCHIVO_OBJETO), 'rb') as f:
+            return pickle.load(f)
+
+    def fijar(self, nombre, version):
+        # La API usará esta versión aunque se entrenen otras nuevas, hasta liberar el modelo
+        self._apuntar(nombre, version)
+        _escribir_atomico(os.path.join(self._ruta(nombre), ARCHIVO_FIJADA), version + '\n')
+
+    def liberar(self, nombre):
+        # Quita la fijación y vuelve a la versión más reciente
+        ruta = os.path.join(self._ruta(nombre), ARCHIVO_FIJADA)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        self._apuntar(nombre, self.versiones(nombre)[-1])
+
+    def revertir(self, nombre):
+        # Vuelve a la versión anterior a la actual y la fija para que un entrenamiento no la sustituya
+        versiones = self.versiones(nombre)
+        posicion = versiones.index(self.version_actual(nombre))
+        if posicion == 0:
+            raise ValueError(f"El modelo '{nombre}' no tiene una versión anterior a {versiones[0]}")
+        self.fijar(nombre, versiones[posicion - 1])
+        return versiones[posicion - 1]
@@ -0,0 +1,76 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from almacen_datos import RAIZ_DATOS
+import estacionariedad
+import informes
+
+# Diagnóstico de estacionariedad de todas las series en un pool de procesos, con una única tabla resumen:
+#   python analisis_estacionariedad.py                               (todas las series)
+#   python analisis_estacionariedad.py --capitales Albacete Madrid --trabajadores 8
+#   python analisis_estacionariedad.py --forzar --salida estacionariedad.parquet
+# Los resultados se guardan en la caché de datos por huella de cada serie: al repetir el análisis solo
+# se calculan las series cuyos datos han cambiado
+parser = argparse.ArgumentParser(description="Pruebas de estacionariedad de todas las series en paralelo")
+parser.add_argument('--datos', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--capitales', nargs='*', help="Solo estas capitales (series por ubicación)")
+parser.add_argument('--trabajadores', type=int, default=os.cpu_count(), help="Procesos de análisis")
+parser.add_argument('--forzar', action='store_true', help="Repetir las pruebas aunque estén en la caché")
+parser.add_argument('--salida', default='estacionariedad.parquet', help="Tabla resumen (Parquet o CSV)")
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    series = estacionariedad.series(args.datos, args.capitales)
+
+    # Un hilo de BLAS por proceso (ver entrenamiento_modelos.py)
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, '1')
+
+    inicio = time.perf_counter()
+    filas, errores = [], []
+    with ProcessPoolExecutor(max_workers=args.trabajadores, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futuros = {executor.submit(estacionariedad.analizar, nombre, conjunto, argumentos, args.datos, args.forzar): nombre
+                   for nombre, conjunto, argumentos in series}
+        for futuro in as_completed(futuros):
+            nombre = futuros[futuro]
+            try:
+                filas += futuro.result()
+            except Exception as e:
+                logging.error("%s: %s: %s", nombre, type(e).__name__, e)
+                errores.append((nombre, str(e)))
+
+    # Mismo orden que la lista de series, independiente del orden de finalización
+    orden = {nombre: posicion for posicion, (nombre, _, _) in enumerate(series)}
+    resumen = estacionariedad.resumen(sorted(filas, key=lambda fila: (orden[fila['serie']], fila['variable'])))
+    if args.salida.endswith('.csv'):
+        resumen.to_csv(args.salida, index=False)
+    else:
+        resumen.to_parquet(args.salida, index=False)
+
+    with pd.option_context('display.width', 250, 'display.max_columns', None, 'display.max_rows', None):
+        print(resumen.to_string(index=False))
+    informes.tabla(resumen, "Estacionariedad de las series")
+    print(f"Series: {len(series)}, con error: {len(errores)} ({time.perf_counter() - inicio:.1f} s con "
+          f"{args.trabajadores} procesos). Resumen en {args.salida}")
+    for nombre, error in errores:
+        print(f"  {nombre}: {error}")
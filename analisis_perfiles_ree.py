@@ -10,34 +10,22 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFB), centra
 Fecha: 07/09/2024
 """
 
-import pandas as pd
-from datetime import datetime
-from statsmodels.tsa.stattools import adfuller
 import plotly.express as px
 
-def Prueba_Dickey_Fuller(series , column_name):
-    print (f'Resultados de la prueba de Dickey-Fuller para columna: {column_name}')
-    dftest = adfuller(series, autolag='AIC')
-    dfoutput = pd.Series(dftest[0:4], index=['Test Statistic','p-value','No Lags Used','Número de observaciones utilizadas'])
-    for key,value in dftest[4].items():
-       dfoutput['Critical Value (%s)'%key] = value
-    print (dfoutput)
-    if dftest[1] <= 0.05:
-        print("Conclusion:====>")
-        print("Rechazar la hipótesis nula")
-        print("Los datos son estacionarios")
-    else:
-        print("Conclusion:====>")
-        print("No se puede rechazar la hipótesis nula")
-        print("Los datos no son estacionarios")
-
-df = pd.read_csv("typical_year_profile.csv")
-df.info()
+import estacionariedad
+import informes
+import preprocesado
 
-df['datetime'] = pd.to_datetime('2023-01-01') + pd.to_timedelta(df['day'] - 1, unit='d') + pd.to_timedelta(df['hour'], unit='h')
+# Perfil A como serie horaria de 2023, ya preparado (preprocesado.py)
+df = preprocesado.serie_perfil('COEF. PERFIL A').rename(columns={'ds': 'datetime', 'y': 'COEF. PERFIL A'})
+df.info()
 
-fig = px.line(df, x=df["datetime"], y="COEF. PERFIL A",
+fig = px.line(informes.reducir_tabla(df, "datetime", "COEF. PERFIL A"), x="datetime", y="COEF. PERFIL A",
               title="Perfil de Consumo")
-fig.show()
+informes.mostrar(fig)
 
-Prueba_Dickey_Fuller(df["COEF. PERFIL A"],"COEF. PERFIL A")
+# Pruebas de estacionariedad de la serie y de su primera diferencia (ADF y KPSS), periodo y fuerza de
+# la estacionalidad y retardos con más autocorrelación (estacionariedad.py)
+resumen = estacionariedad.tabla_series({"COEF. PERFIL A": df["COEF. PERFIL A"]})
+print(resumen.to_string(index=False))
+informes.tabla(resumen, "Estacionariedad")
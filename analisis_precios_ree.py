@@ -10,42 +10,31 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFB), centra
 Fecha: 07/09/2024
 """
 
-import pandas as pd
-from datetime import datetime
-from statsmodels.tsa.stattools import adfuller
 import plotly.express as px
 
-def Prueba_Dickey_Fuller(series , column_name):
-    print (f'Resultados de la prueba de Dickey-Fuller para columna: {column_name}')
-    dftest = adfuller(series, autolag='AIC')
-    dfoutput = pd.Series(dftest[0:4], index=['Test Statistic','p-value','No Lags Used','Número de observaciones utilizadas'])
-    for key,value in dftest[4].items():
-       dfoutput['Critical Value (%s)'%key] = value
-    print (dfoutput)
-    if dftest[1] <= 0.05:
-        print("Conclusion:====>")
-        print("Rechazar la hipótesis nula")
-        print("Los datos son estacionarios")
-    else:
-        print("Conclusion:====>")
-        print("No se puede rechazar la hipótesis nula")
-        print("Los datos no son estacionarios")
-
-df = pd.read_csv("pvpc_prices.csv")
+import estacionariedad
+import informes
+import preprocesado
+
+# Precios ya preparados (preprocesado.py), con los instantes en UTC
+df = preprocesado.serie_precio('precio_pvpc').rename(columns={'ds': 'datetime', 'y': 'value'})
 df.info()
 
-fig = px.line(df, x=df["datetime"], y="value",
+fig = px.line(informes.reducir_tabla(df, "datetime", "value"), x="datetime", y="value",
               title="PVPC")
-fig.show()
-
-Prueba_Dickey_Fuller(df["value"],"value")
+informes.mostrar(fig)
 
+pvpc = df["value"]
 
-df = pd.read_csv("spot_prices.csv")
+df = preprocesado.serie_precio('precio_spot').rename(columns={'ds': 'datetime', 'y': 'value'})
 df.info()
 
-fig = px.line(df, x=df["datetime"], y="value",
+fig = px.line(informes.reducir_tabla(df, "datetime", "value"), x="datetime", y="value",
               title="Precio Energía")
-fig.show()
+informes.mostrar(fig)
 
-Prueba_Dickey_Fuller(df["value"],"value")
+# Pruebas de estacionariedad de la serie y de su primera diferencia (ADF y KPSS), periodo y fuerza de
+# la estacionalidad y retardos con más autocorrelación (estacionariedad.py)
+resumen = estacionariedad.tabla_series({"PVPC": pvpc, "Precio Energía": df["value"]})
+print(resumen.to_string(index=False))
+informes.tabla(resumen, "Estacionariedad")
@@ -10,49 +10,26 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFB), centra
 Fecha: 07/09/2024
 """
 
-import pandas as pd
-from datetime import datetime
-from statsmodels.tsa.stattools import adfuller
 import plotly.express as px
 
-def Prueba_Dickey_Fuller(series , column_name):
-    print (f'Resultados de la prueba de Dickey-Fuller para columna: {column_name}')
-    dftest = adfuller(series, autolag='AIC')
-    dfoutput = pd.Series(dftest[0:4], index=['Test Statistic','p-value','No Lags Used','Número de observaciones utilizadas'])
-    for key,value in dftest[4].items():
-       dfoutput['Critical Value (%s)'%key] = value
-    print (dfoutput)
-    if dftest[1] <= 0.05:
-        print("Conclusion:====>")
-        print("Rechazar la hipótesis nula")
-        print("Los datos son estacionarios")
-    else:
-        print("Conclusion:====>")
-        print("No se puede rechazar la hipótesis nula")
-        print("Los datos no son estacionarios")
-
-df = pd.read_csv("little_typical_year_spain_corrected.csv")
+import estacionariedad
+import informes
+import preprocesado
+
+# Serie de irradiación y temperatura ya preparada (preprocesado.py)
+df = preprocesado.serie_irradiacion().reset_index()
 df.info()
 
-fig = px.line(df, x=df["datetime"], y="G(i)",
+fig = px.line(informes.reducir_tabla(df, "datetime", "G(i)"), x="datetime", y="G(i)",
               title="Irradiación")
-fig.show()
+informes.mostrar(fig)
 
-fig = px.line(df, x=df["datetime"], y="T2m",
+fig = px.line(informes.reducir_tabla(df, "datetime", "T2m"), x="datetime", y="T2m",
               title="Temperatura")
-fig.show()
-
-Prueba_Dickey_Fuller(df["G(i)"],"G(i)")
-Prueba_Dickey_Fuller(df["T2m"],"T2m")
-
-df1=df.copy()
-df1['G(i)'] = df['G(i)'].diff()
-df1.dropna(inplace=True)
-df1.head()
-Prueba_Dickey_Fuller(df1["G(i)"],"G(i)")
-
-df1=df.copy()
-df1['T2m'] = df['T2m'].diff()
-df1.dropna(inplace=True)
-df1.head()
-Prueba_Dickey_Fuller(df1["T2m"],"T2m")
+informes.mostrar(fig)
+
+# Pruebas de estacionariedad de la serie y de su primera diferencia (ADF y KPSS), periodo y fuerza de
+# la estacionalidad y retardos con más autocorrelación (estacionariedad.py)
+resumen = estacionariedad.tabla_series({"G(i)": df["G(i)"], "T2m": df["T2m"]})
+print(resumen.to_string(index=False))
+informes.tabla(resumen, "Estacionariedad")
@@ -0,0 +1,124 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# Caché LRU de predicciones por (versión de modelos, sitio, fecha), con un nivel opcional en disco
+# compartido con el proceso de precálculo nocturno
+class CachePredicciones:
+    def __init__(self, capacidad=365, directorio=None):
+        self.capacidad = capacidad
+        self.directorio = directorio
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, '_'.join(str(parte) for parte in clave) + '.npz')
+
+    def _guardar_en_memoria(self, clave, prediccion):
+        with self._lock:
+            self._entradas[clave] = prediccion
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def obtener(self, clave):
+        with self._lock:
+            prediccion = self._entradas.get(clave)
+            if prediccion is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return prediccion
+
+        if self.directorio and os.path.exists(self._ruta(clave)):
+            try:
+                with np.load(self._ruta(clave)) as datos:
+                    prediccion = {nombre: datos[nombre] for nombre in datos.files}
+            except Exception:
+                logger.exception("Entrada de caché ilegible en %s", self._ruta(clave))
+            else:
+                for valores in prediccion.values():
+                    valores.setflags(write=False)
+                self._guardar_en_memoria(clave, prediccion)
+                with self._lock:
+                    self.aciertos_disco += 1
+                return prediccion
+
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def guardar(self, clave, prediccion):
+        self._guardar_en_memoria(clave, prediccion)
+        if self.directorio:
+            # Escritura atómica: otro proceso nunca debe leer un archivo a medio escribir
+            ruta = self._ruta(clave)
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as f:
+                np.savez(f, **prediccion)
+            os.replace(temporal, ruta)
+
+    def purgar(self, version):
+        # Elimina las predicciones de otras versiones de modelos, que ya no se van a consultar: sin esto
+        # el directorio crece con un archivo por (versión, sitio, fecha) en cada reentrenamiento. Las
+        # de la versión actual (p. ej. precalculadas antes de recargar) se conservan. Devuelve cuántos
+        # archivos se han borrado
+        with self._lock:
+            for clave in [clave for clave in self._entradas if clave[0] != version]:
+                del self._entradas[clave]
+        if not self.directorio:
+            return 0
+        prefijo = f"{version}_"
+        borrados = 0
+        for archivo in os.listdir(self.directorio):
+            # Los temporales los está escribiendo otro proceso; se dejan
+            if archivo.endswith('.npz') and not archivo.startswith(prefijo):
+                try:
+                    os.remove(os.path.join(self.directorio, archivo))
+                    borrados += 1
+                except FileNotFoundError:
+                    pass  # Otro proceso purgando el mismo directorio
+        if borrados:
+            logger.info("Caché de predicciones: %d entradas de versiones anteriores eliminadas", borrados)
+        return borrados
+
+    def obtener_o_calcular(self, clave, calcular):
+        prediccion = self.obtener(clave)
+        if prediccion is None:
+            prediccion = calcular()
+            self.guardar(clave, prediccion)
+        return prediccion
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "capacidad": self.capacidad,
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_aciertos": (self.aciertos_memoria + self.aciertos_disco) / consultas if consultas else 0.0,
+            }
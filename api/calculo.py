@@ -0,0 +1,382 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import asyncio
+import datetime
+import json
+import traceback
+
+import numpy as np
+
+from despacho import calcular_ahorro, calcular_consumo, calcular_generacion, simular_despacho
+from inferencia import Sobrecarga
+from optimizacion_dp import optimizar_despacho as optimizar_despacho_dp
+from optimizacion_lp import optimizar_despacho as optimizar_despacho_lp
+from predicciones import HORAS_DIA
+from sitios import SitioDesconocido, clave_sitio
+
+# Días del mes con los que se reparte el consumo mensual
+DIAS_EN_MES = 30
+
+# Horizonte máximo de simulación (un año completo, incluido el bisiesto)
+HORIZONTE_MAXIMO_DIAS = 366
+
+
+# Estrategias de despacho de la batería. Todas reciben las series horarias de forma (instalaciones, horas)
+# y las entradas de cada instalación, y devuelven los flujos horarios con las mismas claves
+def _despacho_voraz(entradas, generacion, consumo, tarifa_pvpc_kwh, precio_energia_kwh):
+    # Carga solo con excedente solar y descarga siempre que hay demanda, sin mirar los precios
+    return simular_despacho(
+        generacion,
+        consumo,
+        np.array([user_input.capacidad_bateria for user_input in entradas]),
+        np.array([user_input.carga_inicial_bateria for user_input in entradas]),
+    )
+
+
+def _despacho_lp(entradas, generacion, consumo, tarifa_pvpc_kwh, precio_energia_kwh):
+    # Programa de carga y descarga óptimo para las tarifas y precios previstos
+    return optimizar_despacho_lp(
+        generacion,
+        consumo,
+        np.array([user_input.capacidad_bateria for user_input in entradas]),
+        np.array([user_input.carga_inicial_bateria for user_input in entradas]),
+        tarifa_pvpc_kwh,
+        precio_energia_kwh,
+        carga_desde_red=[user_input.carga_desde_red for user_input in entradas],
+        limite_exportacion=[user_input.limite_exportacion for user_input in entradas],
+    )
+
+
+def _despacho_dp(entradas, generacion, consumo, tarifa_pvpc_kwh, precio_energia_kwh):
+    # Programa según precios por programación dinámica: todas las instalaciones se resuelven en una llamada
+    return optimizar_despacho_dp(
+        generacion,
+        consumo,
+        np.array([user_input.capacidad_bateria for user_input in entradas]),
+        np.array([user_input.carga_inicial_bateria for user_input in entradas]),
+        tarifa_pvpc_kwh,
+        precio_energia_kwh,
+        carga_desde_red=[user_input.carga_desde_red for user_input in entradas],
+        limite_exportacion=[np.inf if user_input.limite_exportacion is None else user_input.limite_exportacion for user_input in entradas],
+    )
+
+
+ESTRATEGIAS = {
+    'voraz': _despacho_voraz,
+    'lp': _despacho_lp,
+    'dp': _despacho_dp,
+}
+
+# Conceptos que se devuelven en el detalle horario y en los totales de la respuesta
+CONCEPTOS_HORARIOS = [
+    "energia_generada",
+    "consumo",
+    "energia_autoconsumida",
+    "energia_almacenada",
+    "energia_vendida",
+    "energia_bateria_utilizada",
+    "capacidad_bateria_actual",
+]
+CONCEPTOS_TOTALES = CONCEPTOS_HORARIOS[:-1]
+
+
+# Error de cálculo con la respuesta que debe devolverse al usuario
+class ErrorCalculo(Exception):
+    def __init__(self, respuesta):
+        super().__init__(respuesta["error"])
+        self.respuesta = respuesta
+
+
+def validar_entrada(user_input):
+    # Validar y parsear la fecha de estimación
+    try:
+        fecha_estimacion = datetime.datetime.strptime(user_input.fecha_estimacion, '%Y-%m-%d')
+    except ValueError:
+        raise ErrorCalculo({"error": "La fecha de estimación debe estar en formato 'YYYY-MM-DD'"})
+
+    if not 1 <= user_input.horizonte_dias <= HORIZONTE_MAXIMO_DIAS:
+        raise ErrorCalculo({"error": f"El horizonte debe estar entre 1 y {HORIZONTE_MAXIMO_DIAS} días"})
+
+    if user_input.estrategia not in ESTRATEGIAS:
+        raise ErrorCalculo({"error": f"Estrategia desconocida '{user_input.estrategia}'. Opciones: {', '.join(ESTRATEGIAS)}"})
+
+    if user_input.limite_exportacion is not None and user_input.limite_exportacion < 0:
+        raise ErrorCalculo({"error": "El límite de exportación no puede ser negativo"})
+
+    # Validaciones de la batería
+    if user_input.carga_inicial_bateria > user_input.capacidad_bateria:
+        raise ErrorCalculo({"error": "La carga inicial de la batería no puede exceder su capacidad máxima"})
+
+    if user_input.carga_inicial_bateria < 0:
+        raise ErrorCalculo({"error": "La carga inicial de la batería no puede ser negativa"})
+
+    # Días simulados de forma consecutiva a partir de la fecha de estimación
+    return [
+        (fecha_estimacion + datetime.timedelta(days=dia)).strftime('%Y-%m-%d')
+        for dia in range(user_input.horizonte_dias)
+    ]
+
+
+def sitio_entrada(user_input):
+    # Ubicación y orientación de la instalación, que determinan la predicción de irradiación
+    return (user_input.ciudad, user_input.inclinacion, user_input.orientacion)
+
+
+async def obtener_predicciones(pool, cache, fechas, sitio):
+    # Se consulta la caché por (sitio, fecha) y los días que faltan se predicen juntos en una sola
+    # llamada al pool de inferencia. La saturación del pool (Sobrecarga) se propaga para responder 503
+    clave = clave_sitio(*sitio)
+    predicciones = {}
+    pendientes = []
+    for fecha in fechas:
+        prediccion = cache.obtener((pool.version, clave, fecha))
+        if prediccion is None:
+            pendientes.append(fecha)
+        else:
+            predicciones[fecha] = prediccion
+
+    if pendientes:
+        try:
+            version, nuevas = await pool.predecir(pendientes, sitio)
+        except Sobrecarga:
+            raise
+        except SitioDesconocido as e:
+            raise ErrorCalculo({"error": str(e)})
+        except Exception as e:
+            # Capturar la traza completa del error
+            raise ErrorCalculo({"error": f"No se pudieron generar las predicciones: {e}", "details": traceback.format_exc()})
+        # Se guardan con la versión que las calculó, que puede ser más nueva si hubo una recarga entre medias
+        for fecha, prediccion in nuevas.items():
+            cache.guardar((version, clave, fecha), prediccion)
+        predicciones.update(nuevas)
+
+    return predicciones
+
+
+def preparar_series(prediccion, fecha):
+    irradiacion_solar = prediccion['irradiacion_solar']
+    precio_energia = prediccion['precio_energia']
+    tarifa_pvpc = prediccion['tarifa_pvpc']
+    perfil_consumo_horario = prediccion['perfil_consumo_horario']
+
+    # Asegurarnos de que los datos tengan 24 valores
+    if not (len(irradiacion_solar) == len(precio_energia) == len(tarifa_pvpc) == len(perfil_consumo_horario) == HORAS_DIA):
+        raise ErrorCalculo({"error": f"Los datos para la fecha {fecha} no tienen 24 valores por hora"})
+
+    # Normalizar el perfil de consumo horario
+    total_consumo = np.sum(perfil_consumo_horario)
+    if total_consumo == 0:
+        raise ErrorCalculo({"error": "El perfil de consumo horario tiene suma cero, no se puede normalizar"})
+
+    return {
+        'irradiacion_solar': irradiacion_solar,
+        'perfil_consumo_horario': perfil_consumo_horario / total_consumo,
+        # Convertir tarifas de PVPC y precios de energía a €/kWh
+        'tarifa_pvpc_kwh': tarifa_pvpc / 1000,  # De €/MWh a €/kWh
+        'precio_energia_kwh': precio_energia / 1000,
+    }
+
+
+# Resultado de simular una instalación durante todo su horizonte
+class Simulacion:
+    def __init__(self, fechas, flujos, ahorro_diario, costo_carga_inicial_bateria):
+        self.fechas = fechas
+        self.flujos = flujos  # Series horarias de forma (días * 24,)
+        self.ahorro_diario = ahorro_diario
+        self.ahorro_total = float(np.sum(ahorro_diario) - costo_carga_inicial_bateria)
+
+    def totales(self):
+        return {f"total_{concepto}": float(self.flujos[concepto].sum()) for concepto in CONCEPTOS_TOTALES}
+
+    def totales_diarios(self):
+        # Agregados por día a partir de las series horarias, sin recorrerlas hora a hora
+        dias = len(self.fechas)
+        sumas = {concepto: self.flujos[concepto].reshape(dias, HORAS_DIA).sum(axis=1).tolist() for concepto in CONCEPTOS_TOTALES}
+        carga_final = self.flujos["capacidad_bateria_actual"].reshape(dias, HORAS_DIA)[:, -1].tolist()
+        ahorro = self.ahorro_diario.tolist()
+        for dia, fecha in enumerate(self.fechas):
+            yield {
+                "fecha": fecha,
+                "ahorro": ahorro[dia],
+                **{f"total_{concepto}": valores[dia] for concepto, valores in sumas.items()},
+                "capacidad_bateria_final": carga_final[dia],
+            }
+
+    def filas_horarias(self):
+        # Detalle horario generado día a día para no materializar de golpe un año de diccionarios
+        varios_dias = len(self.fechas) > 1
+        for dia, fecha in enumerate(self.fechas):
+            tramo = slice(dia * HORAS_DIA, (dia + 1) * HORAS_DIA)
+            columnas = {concepto: self.flujos[concepto][tramo].tolist() for concepto in CONCEPTOS_HORARIOS}
+            for hora in range(HORAS_DIA):
+                fila = {"fecha": fecha, "hora": hora} if varios_dias else {"hora": hora}
+                fila.update({concepto: valores[hora] for concepto, valores in columnas.items()})
+                yield fila
+
+
+async def simular_registros(entradas, pool, cache):
+    # Simula una lista de instalaciones de una vez: cada (sitio, fecha) se predice una sola vez y la
+    # batería de todas las instalaciones con el mismo horizonte se simula en una única llamada.
+    # Devuelve, en el orden de entrada, una Simulacion o la respuesta de error de cada registro
+    resultados = [None] * len(entradas)
+
+    fechas = {}
+    for i, user_input in enumerate(entradas):
+        try:
+            fechas[i] = validar_entrada(user_input)
+        except ErrorCalculo as e:
+            resultados[i] = e.respuesta
+
+    # Las instalaciones se agrupan por sitio: cada sitio se predice en una tarea del pool y los sitios
+    # distintos se calculan a la vez en procesos diferentes, sin ocupar más huecos de la cola del pool
+    # que procesos tiene (un lote con muchos sitios no debe saturarla por sí solo)
+    sitios = {}
+    for i in fechas:
+        sitios.setdefault(sitio_entrada(entradas[i]), []).append(i)
+    semaforo = asyncio.Semaphore(pool.trabajadores)
+
+    async def predecir_sitio(sitio, indices):
+        async with semaforo:
+            return await obtener_predicciones(pool, cache, sorted({f for i in indices for f in fechas[i]}), sitio)
+
+    respuestas = await asyncio.gather(
+        *(predecir_sitio(sitio, indices) for sitio, indices in sitios.items()),
+        return_exceptions=True,
+    )
+
+    predicciones = {}
+    for (sitio, indices), respuesta in zip(sitios.items(), respuestas):
+        if isinstance(respuesta, ErrorCalculo):
+            for i in indices:
+                resultados[i] = respuesta.respuesta
+        elif isinstance(respuesta, BaseException):
+            raise respuesta
+        else:
+            predicciones.update({(sitio, fecha): prediccion for fecha, prediccion in respuesta.items()})
+
+    # La simulación es cálculo con arrays: se ejecuta fuera del bucle de eventos para no bloquear otras peticiones
+    return await asyncio.to_thread(_simular_con_predicciones, entradas, resultados, fechas, predicciones)
+
+
+def _simular_con_predicciones(entradas, resultados, fechas, predicciones):
+    # predicciones: {(sitio, fecha): predicción}
+    series = {}
+    for (sitio, fecha), prediccion in predicciones.items():
+        try:
+            series[sitio, fecha] = preparar_series(prediccion, fecha)
+        except ErrorCalculo as e:
+            for i, dias in fechas.items():
+                if fecha in dias and sitio_entrada(entradas[i]) == sitio:
+                    resultados[i] = e.respuesta
+
+    # Las instalaciones se agrupan por horizonte y estrategia para simularlas con arrays de la misma forma
+    grupos = {}
+    for i, dias in fechas.items():
+        if resultados[i] is None:
+            grupos.setdefault((len(dias), entradas[i].estrategia), []).append(i)
+
+    for (dias, estrategia), validos in grupos.items():
+        def apilar(nombre):
+            # Series horarias de cada instalación, concatenando sus días: forma (instalaciones, días * 24)
+            return np.stack([np.concatenate([series[sitio_entrada(entradas[i]), fecha][nombre] for fecha in fechas[i]]) for i in validos])
+
+        # Cálculo del área total de paneles
+        numero_paneles = np.array([entradas[i].area_disponible / entradas[i].tamano_panel for i in validos])
+        area_total_paneles = numero_paneles * np.array([entradas[i].tamano_panel for i in validos])
+
+        # Calcular el consumo diario
+        consumo_diario = np.array([entradas[i].consumo_mensual for i in validos]) / DIAS_EN_MES
+
+        # Simulación horaria de la batería: el estado de carga se arrastra de un día al siguiente
+        tarifa_pvpc_kwh = apilar('tarifa_pvpc_kwh')
+        precio_energia_kwh = apilar('precio_energia_kwh')
+        try:
+            flujos = ESTRATEGIAS[estrategia](
+                [entradas[i] for i in validos],
+                calcular_generacion(apilar('irradiacion_solar'), area_total_paneles),
+                calcular_consumo(consumo_diario, apilar('perfil_consumo_horario')),
+                tarifa_pvpc_kwh,
+                precio_energia_kwh,
+            )
+        except Exception as e:
+            for i in validos:
+                resultados[i] = {"error": f"No se pudo simular la batería: {e}"}
+            continue
+
+        # Ahorro de cada día considerando el autoconsumo y la venta de energía excedente
+        forma_diaria = (len(validos), dias, HORAS_DIA)
+        ahorro_diario = calcular_ahorro(
+            {concepto: valores.reshape(forma_diaria) for concepto, valores in flujos.items()},
+            tarifa_pvpc_kwh.reshape(forma_diaria),
+            precio_energia_kwh.reshape(forma_diaria),
+        )
+
+        for indice, i in enumerate(validos):
+            resultados[i] = Simulacion(
+                fechas[i],
+                {concepto: valores[indice] for concepto, valores in flujos.items()},
+                ahorro_diario[indice],
+                entradas[i].costo_carga_inicial_bateria,
+            )
+
+    return resultados
+
+
+def construir_resultado(user_input, simulacion):
+    # Preparar la respuesta final con los totales y el detalle horario
+    resultado = {
+        "fecha": simulacion.fechas[0],
+        "carga_inicial_bateria": user_input.carga_inicial_bateria,
+        "costo_carga_inicial_bateria": user_input.costo_carga_inicial_bateria,
+        "ahorro_total": simulacion.ahorro_total,
+        "totales": simulacion.totales(),
+    }
+    if len(simulacion.fechas) > 1:
+        resultado["horizonte_dias"] = len(simulacion.fechas)
+        resultado["resultados_diarios"] = list(simulacion.totales_diarios())
+    resultado["resultados_horarios"] = list(simulacion.filas_horarias())
+    return resultado
+
+
+def _construir_resultados(entradas, simulaciones):
+    return [
+        construir_resultado(user_input, simulacion) if isinstance(simulacion, Simulacion) else simulacion
+        for user_input, simulacion in zip(entradas, simulaciones)
+    ]
+
+
+async def calcular_registros(entradas, pool, cache):
+    simulaciones = await simular_registros(entradas, pool, cache)
+    return await asyncio.to_thread(_construir_resultados, entradas, simulaciones)
+
+
+def lineas_ndjson(user_input, simulacion):
+    # Respuesta en streaming (una línea JSON por registro): primero el resumen, después cada día
+    # con sus 24 horas seguidas de su agregado diario
+    yield json.dumps({
+        "tipo": "resumen",
+        "fecha": simulacion.fechas[0],
+        "horizonte_dias": len(simulacion.fechas),
+        "carga_inicial_bateria": user_input.carga_inicial_bateria,
+        "costo_carga_inicial_bateria": user_input.costo_carga_inicial_bateria,
+        "ahorro_total": simulacion.ahorro_total,
+        "totales": simulacion.totales(),
+    }) + "\n"
+
+    filas = simulacion.filas_horarias()
+    for agregado in simulacion.totales_diarios():
+        for _ in range(HORAS_DIA):
+            fila = next(filas)
+            fila.setdefault("fecha", agregado["fecha"])
+            yield json.dumps({"tipo": "hora", **fila}) + "\n"
+        yield json.dumps({"tipo": "dia", **agregado}) + "\n"
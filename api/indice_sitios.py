@@ -0,0 +1,85 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from sitios import PREFIJO_MODELO_SITIO, ponderar_sitio
+
+logger = logging.getLogger(__name__)
+
+
+# Modelos de irradiación por ubicación del almacén. Al cargar solo se leen los metadatos (capital,
+# inclinación y orientación de cada modelo); los modelos se cargan al usarse por primera vez y se
+# mantienen como mucho 'capacidad' en memoria, descartando los menos usados recientemente
+class IndiceSitios:
+    def __init__(self, almacen, sitios, capacidad=32):
+        # sitios: {(capital, slope, azimuth): (nombre del modelo, versión)}
+        self.almacen = almacen
+        self.capacidad = capacidad
+        self.sitios = {clave: nombre for clave, (nombre, _) in sitios.items()}
+        self.versiones = {nombre: version for nombre, version in sitios.values()}
+        self._modelos = OrderedDict()
+        self._lock = threading.Lock()
+        self.cargas = 0
+
+    @classmethod
+    def desde_almacen(cls, almacen, capacidad=32):
+        sitios = {}
+        for nombre in almacen.nombres():
+            if not nombre.startswith(PREFIJO_MODELO_SITIO):
+                continue
+            metadatos = almacen.metadatos(nombre)
+            etiquetas = metadatos.get('etiquetas', {})
+            if not {'capital', 'slope', 'azimuth'} <= set(etiquetas):
+                logger.warning("Modelo %s sin ubicación en sus etiquetas, se omite", nombre)
+                continue
+            clave = (etiquetas['capital'], etiquetas['slope'], etiquetas['azimuth'])
+            sitios[clave] = (nombre, metadatos['version'])
+        return cls(almacen, sitios, capacidad)
+
+    def __len__(self):
+        return len(self.sitios)
+
+    def huella(self):
+        # Identifica el conjunto de versiones: forma parte de la versión de la instantánea de modelos
+        huella = hashlib.sha256()
+        for nombre in sorted(self.versiones):
+            huella.update(f"{nombre}={self.versiones[nombre]};".encode())
+        return huella.hexdigest()[:12]
+
+    def modelo(self, nombre):
+        with self._lock:
+            modelo = self._modelos.get(nombre)
+            if modelo is not None:
+                self._modelos.move_to_end(nombre)
+                return modelo
+        # Se carga la versión registrada al crear el índice, aunque después se haya entrenado otra
+        modelo, _ = self.almacen.cargar(nombre, self.versiones[nombre])
+        with self._lock:
+            self._modelos[nombre] = modelo
+            self.cargas += 1
+            while len(self._modelos) > self.capacidad:
+                self._modelos.popitem(last=False)
+        return modelo
+
+    def predecir(self, ciudad, inclinacion, orientacion, inicio, fin):
+        # Irradiación horaria entre inicio y fin como combinación ponderada de los modelos elegidos
+        _, pesos = ponderar_sitio(self.sitios, ciudad, inclinacion, orientacion)
+        return sum(
+            peso * np.asarray(self.modelo(nombre).predict(start=inicio, end=fin), dtype=float)
+            for nombre, peso in pesos
+        )
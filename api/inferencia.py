@@ -0,0 +1,161 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from predicciones import predecir_dias, tabla_solar
+from registro_modelos import RegistroModelos
+
+logger = logging.getLogger(__name__)
+
+# Registro de modelos propio de cada proceso trabajador
+_registro = None
+
+
+def _inicializar_trabajador(base_path, capacidad_sitios):
+    # Cada proceso carga su copia de los modelos una sola vez, al arrancar (los modelos por ubicación,
+    # al usarse, en la caché LRU de cada proceso)
+    global _registro
+    _registro = RegistroModelos(base_path, capacidad_sitios)
+    _registro.cargar()
+    tabla_solar()
+
+
+def _version_trabajador():
+    return _registro.obtener().version
+
+
+def _predecir_en_trabajador(fechas, sitio):
+    instantanea = _registro.obtener()
+    return instantanea.version, predecir_dias(instantanea.modelos, fechas, sitio, instantanea.sitios)
+
+
+# El servicio no admite más trabajo: se responde 503 indicando cuándo reintentar
+class Sobrecarga(Exception):
+    def __init__(self, mensaje, reintentar_en):
+        super().__init__(mensaje)
+        self.reintentar_en = reintentar_en
+
+
+# Pool de procesos dedicado a la inferencia de SARIMAX/Prophet. Al ser procesos y no hilos, las
+# predicciones se ejecutan en paralelo en varios núcleos sin competir por el GIL del servidor
+class PoolInferencia:
+    def __init__(self, base_path, trabajadores, max_pendientes, timeout, reintentar_en=1, capacidad_sitios=32,
+                 al_cargar=None):
+        self.base_path = base_path
+        self.al_cargar = al_cargar  # Se llama con la versión tras cada carga correcta
+        self.capacidad_sitios = capacidad_sitios
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self.timeout = timeout
+        self.reintentar_en = reintentar_en
+        self.version = None
+        self.cargado_en = None
+        self._executor = None
+        self._pendientes = 0
+        self._lock_recarga = threading.Lock()
+
+    @property
+    def listo(self):
+        return self._executor is not None
+
+    @property
+    def pendientes(self):
+        return self._pendientes
+
+    def cargar(self):
+        # Arranca un pool nuevo con todos los modelos en memoria y solo entonces sustituye al anterior,
+        # que termina las predicciones que ya tenía en curso
+        with self._lock_recarga:
+            executor = ProcessPoolExecutor(
+                max_workers=self.trabajadores,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_trabajador,
+                initargs=(self.base_path, self.capacidad_sitios),
+            )
+            try:
+                versiones = {futuro.result() for futuro in [executor.submit(_version_trabajador) for _ in range(self.trabajadores)]}
+            except Exception:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            if len(versiones) != 1:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise RuntimeError("Los modelos cambiaron durante la carga; vuelve a intentarlo")
+
+            anterior = self._executor
+            self._executor = executor
+            self.version = versiones.pop()
+            self.cargado_en = datetime.datetime.now(datetime.timezone.utc)
+            logger.info("Pool de inferencia listo con %d procesos (versión %s)", self.trabajadores, self.version)
+            if anterior is not None:
+                anterior.shutdown(wait=False)
+            if self.al_cargar is not None:
+                try:
+                    self.al_cargar(self.version)
+                except Exception:
+                    logger.exception("Error tras cargar la versión %s", self.version)
+            return self.version
+
+    def cargar_en_segundo_plano(self):
+        # Permite arrancar el servidor (y responder /health) mientras los procesos cargan los modelos
+        def _cargar():
+            try:
+                self.cargar()
+            except Exception:
+                logger.exception("No se pudo iniciar el pool de inferencia desde %s", self.base_path)
+
+        hilo = threading.Thread(target=_cargar, name='carga-modelos', daemon=True)
+        hilo.start()
+        return hilo
+
+    def _liberar(self):
+        self._pendientes -= 1
+
+    async def predecir(self, fechas, sitio=None):
+        # Devuelve (versión de los modelos, predicciones por fecha) calculadas en un proceso trabajador
+        # para la instalación sitio = (ciudad, inclinación, orientación)
+        if not self.listo:
+            raise RuntimeError("Los modelos todavía no están cargados")
+
+        # Cola acotada: con demasiadas predicciones pendientes es mejor rechazar que acumular latencia
+        if self._pendientes >= self.max_pendientes:
+            raise Sobrecarga("Servicio saturado, demasiadas predicciones en cola", self.reintentar_en)
+
+        loop = asyncio.get_running_loop()
+        try:
+            futuro = self._executor.submit(_predecir_en_trabajador, list(fechas), sitio)
+        except BrokenProcessPool:
+            # Un proceso trabajador ha muerto: se reconstruye el pool sin bloquear la petición
+            self.cargar_en_segundo_plano()
+            raise Sobrecarga("El pool de inferencia se está reiniciando", self.reintentar_en)
+
+        # El hueco en la cola se libera cuando termina el proceso, no cuando la petición deja de esperar
+        self._pendientes += 1
+        def _al_terminar(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._liberar)
+
+        futuro.add_done_callback(_al_terminar)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futuro), self.timeout)
+        except asyncio.TimeoutError:
+            raise Sobrecarga(f"La predicción superó el tiempo máximo de {self.timeout} s", self.reintentar_en)
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,68 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import datetime
+import os
+import sys
+
+# Los módulos compartidos con los scripts de entrenamiento están en la raíz del repositorio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_predicciones import CachePredicciones
+from predicciones import predecir_dia
+from registro_modelos import RegistroModelos
+from sitios import clave_sitio
+
+# Precálculo nocturno de las predicciones de los próximos días. Se ejecuta fuera del servicio
+# (por ejemplo desde cron) y deja las predicciones en el nivel en disco de la caché, que la API
+# comparte a través de CACHE_PREDICCIONES_DIR
+parser = argparse.ArgumentParser(description="Precalcula las predicciones de los próximos días")
+parser.add_argument('--dias', type=int, default=7, help="Número de días a precalcular")
+parser.add_argument('--desde', default=None, help="Primer día en formato 'YYYY-MM-DD' (por defecto, mañana)")
+parser.add_argument('--modelos', default=os.environ.get('MODELOS_PATH', 'modelos'), help="Almacén o directorio de los modelos")
+parser.add_argument('--cache', default=os.environ.get('CACHE_PREDICCIONES_DIR'), help="Directorio de la caché en disco")
+parser.add_argument('--sitio', action='append', default=[], metavar='CIUDAD:INCLINACION:ORIENTACION',
+                    help="Instalación a precalcular (repetible; por defecto, todas las ubicaciones entrenadas)")
+args = parser.parse_args()
+
+if not args.cache:
+    parser.error("Es necesario indicar el directorio de la caché (--cache o CACHE_PREDICCIONES_DIR)")
+
+if args.desde:
+    desde = datetime.datetime.strptime(args.desde, '%Y-%m-%d').date()
+else:
+    desde = datetime.date.today() + datetime.timedelta(days=1)
+
+instantanea = RegistroModelos(args.modelos).cargar()
+cache = CachePredicciones(capacidad=args.dias, directorio=args.cache)
+
+sitios = []
+for sitio in args.sitio:
+    ciudad, inclinacion, orientacion = sitio.rsplit(':', 2)
+    sitios.append((ciudad, float(inclinacion), float(orientacion)))
+if not sitios and instantanea.sitios:
+    sitios = [(capital, float(slope), float(azimuth)) for capital, slope, azimuth in instantanea.sitios.sitios]
+if not sitios:
+    parser.error("El almacén no tiene modelos por ubicación: indica las instalaciones con --sitio")
+
+for sitio in sitios:
+    for i in range(args.dias):
+        fecha = desde + datetime.timedelta(days=i)
+        clave = (instantanea.version, clave_sitio(*sitio), fecha.strftime('%Y-%m-%d'))
+        if cache.obtener(clave) is not None:
+            print(f"Predicción para {clave[1]} {clave[2]} ya disponible.")
+            continue
+        cache.guardar(clave, predecir_dia(instantanea.modelos, fecha, sitio, instantanea.sitios))
+        print(f"Predicción para {clave[1]} {clave[2]} calculada y guardada.")
+
+print(f"Precálculo completado para la versión de modelos {instantanea.version}.")
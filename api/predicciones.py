@@ -0,0 +1,106 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import pandas as pd
+import numpy as np
+
+from geometria_solar import TablaSolar
+from prophet_numpy import predecir_yhat
+from sitios import CAPITALES, buscar_capital
+
+# Número de horas que se predicen por día
+HORAS_DIA = 24
+
+# La irradiación predicha se anula entre la puesta y la salida del sol de la ubicación y se limita a la
+# de cielo despejado sobre el panel con este margen (el modelo de cielo despejado es aproximado y las
+# nubes pueden reflejar radiación adicional)
+MARGEN_CIELO_DESPEJADO = 1.2
+
+# Sin modelo de irradiación se predice esta fracción de la irradiación de cielo despejado
+INDICE_CLARIDAD = 0.75
+
+# Ubicación de la serie con la que se entrena el modelo de irradiación general (preparacion_pvgis.py),
+# usada cuando no se indica el sitio
+CIUDAD_POR_DEFECTO = 'Albacete'
+
+# Posición del sol de cada capital, calculada una vez por proceso (al arrancar los trabajadores)
+_tabla_solar = None
+
+
+def tabla_solar():
+    global _tabla_solar
+    if _tabla_solar is None:
+        _tabla_solar = TablaSolar(CAPITALES)
+    return _tabla_solar
+
+
+def predecir_dias(modelos, fechas, sitio=None, indice_sitios=None):
+    # Predice varios días con una sola llamada a cada modelo. Devuelve {fecha 'YYYY-MM-DD': predicción}.
+    # sitio: (ciudad, inclinación, orientación) de la instalación; si hay modelos por ubicación
+    # (indice_sitios) la irradiación se estima con ellos y si no con el modelo de irradiación general
+    dias = sorted({pd.Timestamp(fecha).strftime('%Y-%m-%d') for fecha in fechas})
+    fechas_horarias = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(start=dia, periods=HORAS_DIA, freq='H').values for dia in dias
+    ]))
+    df_pred = pd.DataFrame({'ds': fechas_horarias})
+    df_pred['ds'] = df_pred['ds'].dt.tz_localize(None)
+
+    # Predicción de irradiación solar con SARIMAX: un único tramo continuo del primer al último día
+    inicio, fin = fechas_horarias[0], fechas_horarias[-1]
+    tabla = tabla_solar()
+    capital = buscar_capital(sitio[0] if sitio is not None else CIUDAD_POR_DEFECTO)
+    if sitio is not None and indice_sitios:
+        irradiacion_pred = indice_sitios.predecir(*sitio, inicio, fin)
+    elif 'irradiacion' in modelos:
+        irradiacion_pred = np.asarray(modelos['irradiacion'].predict(start=inicio, end=fin), dtype=float)
+    else:
+        irradiacion_pred = None
+    posiciones = (fechas_horarias - inicio) // pd.Timedelta(hours=1)
+
+    if sitio is not None:
+        cielo_despejado = tabla.cielo_despejado(capital, sitio[1], sitio[2], fechas_horarias)
+        if irradiacion_pred is None:
+            irradiacion_solar = INDICE_CLARIDAD * cielo_despejado
+        else:
+            irradiacion_solar = np.clip(irradiacion_pred[posiciones], 0, MARGEN_CIELO_DESPEJADO * cielo_despejado)
+    elif irradiacion_pred is None:
+        # Sin sitio se desconoce la inclinación: se supone el panel horizontal
+        irradiacion_solar = INDICE_CLARIDAD * tabla.cielo_despejado(capital, 0, 0, fechas_horarias)
+    else:
+        irradiacion_solar = np.maximum(irradiacion_pred[posiciones], 0)  # Evitar valores negativos
+
+    # Forzar a cero la irradiación en las horas sin sol de la ubicación
+    irradiacion_solar[~tabla.horas_diurnas(capital, fechas_horarias)] = 0
+
+    # Predicciones de precio de energía, tarifa PVPC y perfil de consumo horario con Prophet
+    series = {
+        'irradiacion_solar': irradiacion_solar,
+        'precio_energia': predecir_yhat(modelos['precio_energia'], df_pred['ds']),
+        'tarifa_pvpc': predecir_yhat(modelos['tarifa_pvpc'], df_pred['ds']),
+        'perfil_consumo_horario': predecir_yhat(modelos['perfil_consumo'], df_pred['ds']),
+    }
+
+    predicciones = {}
+    for i, dia in enumerate(dias):
+        prediccion = {}
+        for nombre, valores in series.items():
+            # Copia por día para que cada entrada de la caché sea independiente
+            prediccion[nombre] = np.array(valores[i * HORAS_DIA:(i + 1) * HORAS_DIA], dtype=float)
+            # Las predicciones se comparten entre peticiones a través de la caché: no deben modificarse
+            prediccion[nombre].setflags(write=False)
+        predicciones[dia] = prediccion
+    return predicciones
+
+
+def predecir_dia(modelos, fecha, sitio=None, indice_sitios=None):
+    dia = pd.Timestamp(fecha).strftime('%Y-%m-%d')
+    return predecir_dias(modelos, [dia], sitio, indice_sitios)[dia]
@@ -0,0 +1,136 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import datetime
+import hashlib
+import io
+import logging
+import os
+import pickle
+import threading
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+import joblib
+
+from almacen_modelos import AlmacenModelos
+from indice_sitios import IndiceSitios
+from prophet_numpy import ProphetNumpy
+
+logger = logging.getLogger(__name__)
+
+# Modelos que necesita la API. Si base_path es un almacén de modelos (almacen_modelos.py) se carga la
+# versión ACTUAL de cada uno con sus arrays en mmap; si no, se leen los archivos sueltos de ARTEFACTOS
+
+# Artefactos sueltos: clave interna -> archivos candidatos (archivo, formato de serialización)
+# en orden de preferencia. Los modelos Prophet exportados con exportar_prophet.py (.npz) se evalúan con
+# NumPy y se usan en lugar del pickle cuando existen
+ARTEFACTOS = {
+    'irradiacion': [('irradiation_model.pkl', 'joblib')],
+    'precio_energia': [('price_model.npz', 'prophet_numpy'), ('price_model.pkl', 'pickle')],
+    'tarifa_pvpc': [('pvpc_model.npz', 'prophet_numpy'), ('pvpc_model.pkl', 'pickle')],
+    'perfil_consumo': [('profile_model.npz', 'prophet_numpy'), ('profile_model.pkl', 'pickle')],
+}
+
+# Modelos que pueden faltar: sin modelo de irradiación se usa la irradiación de cielo despejado
+OPCIONALES = {'irradiacion'}
+
+# Conjunto de modelos cargados juntos. Se sustituye entero en cada recarga, nunca se modifica.
+# sitios es el índice de modelos de irradiación por ubicación (None si el almacén no tiene ninguno)
+class InstantaneaModelos(NamedTuple):
+    modelos: MappingProxyType
+    version: str
+    cargado_en: datetime.datetime
+    sitios: Optional[IndiceSitios] = None
+
+
+class RegistroModelos:
+    def __init__(self, base_path, capacidad_sitios=32):
+        self.base_path = base_path
+        self.capacidad_sitios = capacidad_sitios
+        self._instantanea = None
+        self._lock_recarga = threading.Lock()
+
+    @property
+    def listo(self):
+        return self._instantanea is not None
+
+    def obtener(self):
+        # Cada petición debe quedarse con una única instantánea para no mezclar versiones
+        instantanea = self._instantanea
+        if instantanea is None:
+            raise RuntimeError("Los modelos todavía no están cargados")
+        return instantanea
+
+    def _elegir_archivo(self, candidatos):
+        # Primer candidato presente; si no hay ninguno se intenta el último para que el error indique el archivo
+        for archivo, formato in candidatos:
+            if os.path.exists(os.path.join(self.base_path, archivo)):
+                return archivo, formato
+        return candidatos[-1]
+
+    def _cargar_archivos(self):
+        modelos = {}
+        huella = hashlib.sha256()
+        for clave, candidatos in ARTEFACTOS.items():
+            archivo, formato = self._elegir_archivo(candidatos)
+            if clave in OPCIONALES and not os.path.exists(os.path.join(self.base_path, archivo)):
+                continue
+            with open(os.path.join(self.base_path, archivo), 'rb') as f:
+                contenido = f.read()
+            huella.update(contenido)
+            if formato == 'joblib':
+                modelos[clave] = joblib.load(io.BytesIO(contenido))
+            elif formato == 'prophet_numpy':
+                modelos[clave] = ProphetNumpy.cargar(contenido)
+            else:
+                modelos[clave] = pickle.loads(contenido)
+        return modelos, huella.hexdigest()[:12]
+
+    def _cargar_almacen(self, almacen):
+        # Las versiones del almacén ya identifican el contenido: no hace falta leer y resumir los archivos
+        modelos = {}
+        huella = hashlib.sha256()
+        disponibles = set(almacen.nombres())
+        for clave in ARTEFACTOS:
+            if clave in OPCIONALES and clave not in disponibles:
+                continue
+            modelos[clave], metadatos = almacen.cargar(clave)
+            huella.update(f"{clave}={metadatos['version']};".encode())
+        # Los modelos por ubicación no se cargan aquí: el índice los carga al usarlos
+        sitios = IndiceSitios.desde_almacen(almacen, self.capacidad_sitios)
+        if not sitios:
+            sitios = None
+        else:
+            huella.update(f"sitios={sitios.huella()};".encode())
+        return modelos, huella.hexdigest()[:12], sitios
+
+    def cargar(self):
+        # Solo una recarga a la vez; las peticiones en curso siguen usando la instantánea anterior
+        with self._lock_recarga:
+            almacen = AlmacenModelos(self.base_path)
+            if set(ARTEFACTOS) - OPCIONALES <= set(almacen.nombres()):
+                modelos, version, sitios = self._cargar_almacen(almacen)
+            else:
+                modelos, version = self._cargar_archivos()
+                sitios = None
+
+            # La asignación de la referencia es atómica: el cambio de versión es instantáneo
+            instantanea = InstantaneaModelos(
+                modelos=MappingProxyType(modelos),
+                version=version,
+                cargado_en=datetime.datetime.now(datetime.timezone.utc),
+                sitios=sitios,
+            )
+            self._instantanea = instantanea
+            logger.info("Modelos cargados desde %s (versión %s, %d ubicaciones)", self.base_path, instantanea.version, len(sitios or ()))
+            return instantanea
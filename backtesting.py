@@ -0,0 +1,225 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos
+from despacho import calcular_ahorro, calcular_consumo, calcular_generacion, simular_despacho
+from metricas import errores, escala_mase
+import preprocesado
+from sitios import CAPITALES, PREFIJO_MODELO_SITIO
+
+# Evaluación con origen móvil (walk-forward) de los modelos del almacén: a partir del final del
+# entrenamiento de cada modelo se toman varios cortes diarios y en cada uno se predicen las HORIZONTE
+# horas siguientes solo con los datos anteriores al corte. Cada modelo se evalúa de forma independiente
+# (en un proceso del pool de backtesting_modelos.py) y sin reentrenar:
+#   - SARIMAX: el filtro se extiende con las observaciones nuevas hasta cada corte (ajuste_sarimax.extender)
+#   - Prophet y gradient boosting de irradiación: la predicción no depende de las observaciones recientes
+#   - gradient boosting de precios: sus retardos (al menos 24 horas) se calculan una vez sobre toda la serie
+# Además de los errores de la predicción se mide su error económico: la diferencia entre el ahorro del
+# día calculado con la predicción y el calculado con los valores reales, en una instalación de referencia
+
+HORIZONTE = 24
+
+# Horas finales de la serie que se evalúan si el rango de entrenamiento del modelo no se conoce o no se
+# solapa con la serie (las mismas que reservan los scripts modelo_*.py)
+PRUEBA = 868
+
+# Instalación de la simulación económica (la del ejemplo de la API: 20 m² de paneles, 300 kWh al mes y
+# batería de 10 kWh)
+INSTALACION = {'area_paneles': 20., 'consumo_diario': 10., 'capacidad_bateria': 10., 'carga_inicial_bateria': 2.}
+
+VARIABLES = ('irradiacion', 'precio_energia', 'tarifa_pvpc', 'perfil_consumo')
+METRICAS = ('mae', 'rmse', 'mape', 'smape', 'mase', 'error_economico')
+COLUMNAS = ['modelo', 'tipo', 'variable', 'corte', 'metrica', 'valor']
+
+
+def variable_modelo(nombre):
+    # Variable que predice un modelo del almacén (por el prefijo de su nombre); None si no es de la API
+    return next((variable for variable in VARIABLES if nombre.startswith(variable)), None)
+
+
+def serie_real(nombre, metadatos, raiz=None):
+    # Valores reales del modelo: DataFrame horario con la columna y (y T2m en la irradiación)
+    variable = variable_modelo(nombre)
+    if nombre.startswith(PREFIJO_MODELO_SITIO):
+        etiquetas = metadatos['etiquetas']
+        serie = preprocesado.serie_sitio(etiquetas['capital'], etiquetas['slope'], etiquetas['azimuth'], raiz)
+        return serie.rename(columns={'G(i)': 'y'})
+    if variable == 'irradiacion':
+        return preprocesado.serie_irradiacion(raiz).rename(columns={'G(i)': 'y'})
+    if variable == 'precio_energia':
+        return preprocesado.serie_precio_horaria('precio_spot', raiz).to_frame('y')
+    if variable == 'tarifa_pvpc':
+        return preprocesado.serie_precio_horaria('precio_pvpc', raiz).to_frame('y')
+    if variable == 'perfil_consumo':
+        return preprocesado.serie_perfil(raiz=raiz).set_index('ds').asfreq('h')
+    raise KeyError(f"No se conoce la serie real del modelo {nombre}")
+
+
+def cortes(serie, metadatos, maximo=None, fin_entrenamiento=None):
+    # Instantes (medianoche) en que empieza cada horizonte: posteriores al final del entrenamiento y con
+    # el horizonte completo dentro de la serie. Con maximo se toman cortes repartidos por todo el periodo
+    rango = metadatos.get('rango_entrenamiento') or {}
+    fin = fin_entrenamiento if fin_entrenamiento is not None else pd.Timestamp(rango['fin']) if 'fin' in rango else None
+    if fin is not None and fin.tz is not None:
+        fin = fin.tz_convert('UTC').tz_localize(None)
+    ultimo = serie.index[-1] - pd.Timedelta(hours=HORIZONTE - 1)
+    if fin is None or not serie.index[0] <= fin < ultimo:
+        fin = serie.index[-PRUEBA - 1]
+    candidatos = pd.date_range(fin.floor('D') + pd.Timedelta(days=1), ultimo, freq='D')
+    if maximo is not None and len(candidatos) > maximo:
+        candidatos = candidatos[np.unique(np.linspace(0, len(candidatos) - 1, maximo).round().astype(int))]
+    return candidatos
+
+
+def _horizontes(cortes_evaluados):
+    # Instantes de todos los horizontes, forma (cortes, HORIZONTE)
+    return cortes_evaluados.to_numpy()[:, None] + pd.to_timedelta(np.arange(HORIZONTE), unit='h').to_numpy()[None, :]
+
+
+def _predecir_sarimax(resultado, serie, cortes_evaluados):
+    import ajuste_sarimax
+
+    # Cada corte parte del filtro del anterior, extendido con las observaciones intermedias
+    con_exog = resultado.model.exog is not None
+    exog = serie[['T2m']] if con_exog else None
+    fin = resultado.model.data.row_labels[-1]
+    predicciones = []
+    for corte in cortes_evaluados:
+        if corte - pd.Timedelta(hours=1) > fin:
+            observaciones = serie['y'].loc[fin:corte - pd.Timedelta(hours=1)]
+            resultado = ajuste_sarimax.extender(resultado, observaciones, exog)
+            fin = corte - pd.Timedelta(hours=1)
+        exog_horizonte = exog.reindex(pd.date_range(corte, periods=HORIZONTE, freq='h')) if con_exog else None
+        predicciones.append(np.asarray(resultado.forecast(HORIZONTE, exog=exog_horizonte), dtype=float))
+    return np.array(predicciones)
+
+
+def _predecir_prophet(modelo, serie, cortes_evaluados):
+    from prophet_numpy import predecir_yhat
+
+    instantes = _horizontes(cortes_evaluados)
+    return np.asarray(predecir_yhat(modelo, pd.DatetimeIndex(instantes.ravel())), dtype=float).reshape(instantes.shape)
+
+
+def _predecir_gradiente_irradiacion(modelo, serie, cortes_evaluados, raiz=None):
+    import gradiente
+
+    # serie_irradiacion es el año típico de Albacete: se usa la inclinación y orientación cuya media
+    # coincide (como en comparativa_modelos.py)
+    albacete = leer('anio_tipico', columnas=['slope', 'azimuth', 'G(i)'], filtros={'capital': 'Albacete'}, raiz=raiz)
+    slope, azimuth = (albacete.groupby(['slope', 'azimuth'])['G(i)'].mean() - serie['y'].mean()).abs().idxmin()
+    instantes = pd.DatetimeIndex(_horizontes(cortes_evaluados).ravel())
+    temperatura = serie['T2m'].reindex(instantes).to_numpy()
+    prediccion = gradiente.predecir_irradiacion(modelo, [(*CAPITALES['Albacete'], slope, azimuth)], instantes, temperatura[None, :])
+    return prediccion.reshape(len(cortes_evaluados), HORIZONTE)
+
+
+def _predecir_gradiente_precio(modelo, serie, cortes_evaluados):
+    import gradiente
+
+    # Con un horizonte no mayor que el menor retardo, las características de cada hora del horizonte solo
+    # usan precios anteriores al corte: se calculan una vez para toda la serie
+    assert HORIZONTE <= gradiente.RETARDOS_PRECIO[0]
+    X, _ = gradiente.caracteristicas_precio(serie['y'].tz_localize('UTC'))
+    instantes = pd.DatetimeIndex(_horizontes(cortes_evaluados).ravel()).tz_localize('UTC')
+    X = X.reindex(instantes)
+    # Las horas sin precio real no tienen características
+    conocidas = X['hora'].notna().to_numpy()
+    prediccion = np.full(len(instantes), np.nan)
+    prediccion[conocidas] = modelo.predict(X[conocidas])
+    return prediccion.reshape(len(cortes_evaluados), HORIZONTE)
+
+
+def predecir(modelo, metadatos, variable, serie, cortes_evaluados, raiz=None):
+    # Predicciones (cortes, HORIZONTE) de un modelo, sin valores negativos
+    if metadatos['tipo'] == 'sarimax':
+        prediccion = _predecir_sarimax(modelo, serie, cortes_evaluados)
+    elif metadatos['tipo'] == 'prophet':
+        prediccion = _predecir_prophet(modelo, serie, cortes_evaluados)
+    elif variable == 'irradiacion':
+        prediccion = _predecir_gradiente_irradiacion(modelo, serie, cortes_evaluados, raiz)
+    else:
+        prediccion = _predecir_gradiente_precio(modelo, serie, cortes_evaluados)
+    return np.maximum(prediccion, 0)
+
+
+def escenario_referencia(raiz=None):
+    # Día de referencia para la simulación económica: media de cada variable en cada hora (UTC) del día.
+    # Al evaluar un modelo, su variable se sustituye por la predicción o por los valores reales del corte
+    referencia = {}
+    for variable in VARIABLES:
+        serie = serie_real(variable, {}, raiz)['y']
+        referencia[variable] = serie.groupby(serie.index.hour).mean().reindex(range(HORIZONTE)).to_numpy(dtype=float)
+    return referencia
+
+
+def ahorro_diario(entradas, instalacion=INSTALACION):
+    # Ahorro (€) de cada escenario con la estrategia voraz. entradas: irradiación (W/m²), precios (€/MWh)
+    # y perfil de consumo de forma (escenarios, HORIZONTE); el perfil se normaliza en cada escenario
+    with np.errstate(divide='ignore', invalid='ignore'):
+        perfil = entradas['perfil_consumo'] / entradas['perfil_consumo'].sum(axis=1, keepdims=True)
+    flujos = simular_despacho(
+        calcular_generacion(entradas['irradiacion'], instalacion['area_paneles']),
+        calcular_consumo(instalacion['consumo_diario'], perfil),
+        instalacion['capacidad_bateria'],
+        instalacion['carga_inicial_bateria'],
+    )
+    return calcular_ahorro(flujos, entradas['tarifa_pvpc'] / 1000, entradas['precio_energia'] / 1000)
+
+
+def error_economico(variable, reales, predicciones, referencia, instalacion=INSTALACION):
+    # Ahorro con la predicción menos ahorro con los valores reales, por corte. Las demás variables toman
+    # el día de referencia; las horas sin valor real dejan el corte sin error económico
+    escenarios = len(reales)
+    entradas = {nombre: np.broadcast_to(valores, (2 * escenarios, HORIZONTE)) for nombre, valores in referencia.items()}
+    entradas[variable] = np.concatenate([predicciones, reales])
+    ahorro = ahorro_diario(entradas, instalacion)
+    return ahorro[:escenarios] - ahorro[escenarios:]
+
+
+def evaluar(nombre, raiz_modelos, raiz_datos=None, maximo_cortes=None, referencia=None):
+    # Evalúa la versión actual de un modelo en todos sus cortes. Devuelve la tabla en formato largo
+    # (COLUMNAS: una fila por modelo, corte y métrica) y la duración
+    inicio = time.perf_counter()
+    # Completo: los cortes extienden el filtro con las observaciones reales
+    modelo, metadatos = AlmacenModelos(raiz_modelos).cargar(nombre, completo=True)
+    variable = variable_modelo(nombre)
+    serie = serie_real(nombre, metadatos, raiz_datos)
+
+    # Un SARIMAX conoce su última observación aunque el almacén no guarde su rango de entrenamiento
+    fin = modelo.model.data.row_labels[-1] if metadatos['tipo'] == 'sarimax' else None
+    cortes_evaluados = cortes(serie, metadatos, maximo_cortes, fin)
+    predicciones = predecir(modelo, metadatos, variable, serie, cortes_evaluados, raiz_datos)
+    reales = serie['y'].reindex(pd.DatetimeIndex(_horizontes(cortes_evaluados).ravel())).to_numpy().reshape(predicciones.shape)
+
+    # El MASE se escala con la predicción ingenua de un día para otro en la serie anterior al primer corte
+    metricas = errores(reales, predicciones, escala=escala_mase(serie['y'][serie.index < cortes_evaluados[0]].to_numpy()))
+    if referencia is None:
+        referencia = escenario_referencia(raiz_datos)
+    metricas['error_economico'] = error_economico(variable, reales, predicciones, referencia)
+
+    tabla = pd.DataFrame({
+        'modelo': nombre,
+        'tipo': metadatos['tipo'],
+        'variable': variable,
+        'corte': np.tile(cortes_evaluados.to_numpy(), len(METRICAS)),
+        'metrica': np.repeat(METRICAS, len(cortes_evaluados)),
+        'valor': np.concatenate([metricas[metrica] for metrica in METRICAS]),
+    }, columns=COLUMNAS)
+    return tabla, time.perf_counter() - inicio
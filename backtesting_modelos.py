@@ -0,0 +1,84 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from almacen_datos import RAIZ_DATOS
+from almacen_modelos import AlmacenModelos
+from backtesting import HORIZONTE, escenario_referencia, evaluar, variable_modelo
+from entrenamiento import silenciar_registros
+
+# Evaluación con origen móvil de todos los modelos del almacén en un pool de procesos, sin gráficos:
+#   python backtesting_modelos.py                                         (todos los modelos, 30 cortes)
+#   python backtesting_modelos.py --nombres irradiacion precio_energia_gradiente --cortes 60
+# El resultado es una tabla en formato largo (modelo, tipo, variable, corte, métrica, valor) en Parquet,
+# con una fila por corte y métrica: MAE, RMSE, MAPE, sMAPE y MASE de las 24 horas siguientes al corte y error
+# económico (€ de ahorro diario que se ganan o pierden por el error de la predicción)
+
+parser = argparse.ArgumentParser(description="Evalúa en paralelo los modelos del almacén con origen móvil")
+parser.add_argument('--modelos', default=os.environ.get('MODELOS_PATH', 'modelos'), help="Almacén de modelos")
+parser.add_argument('--datos', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--nombres', nargs='*', help="Solo estos modelos (por defecto, todos los de la API)")
+parser.add_argument('--cortes', type=int, default=30, help="Número máximo de cortes por modelo")
+parser.add_argument('--trabajadores', type=int, default=os.cpu_count(), help="Procesos de evaluación")
+parser.add_argument('--salida', default='backtesting.parquet', help="Tabla de resultados (Parquet)")
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    silenciar_registros()
+
+    nombres = [nombre for nombre in (args.nombres or AlmacenModelos(args.modelos).nombres()) if variable_modelo(nombre)]
+    # El día de referencia de la simulación económica se calcula una vez y se comparte con los procesos
+    referencia = escenario_referencia(args.datos)
+
+    # Un hilo de BLAS por proceso, como en entrenamiento_modelos.py
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, '1')
+
+    inicio = time.perf_counter()
+    tablas, errores = [], []
+    with ProcessPoolExecutor(max_workers=args.trabajadores, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=silenciar_registros) as executor:
+        futuros = {executor.submit(evaluar, nombre, args.modelos, args.datos, args.cortes, referencia): nombre
+                   for nombre in nombres}
+        for futuro in as_completed(futuros):
+            nombre = futuros[futuro]
+            try:
+                tabla, segundos = futuro.result()
+            except Exception as e:
+                logging.error("%s: %s: %s", nombre, type(e).__name__, e)
+                errores.append((nombre, str(e)))
+                continue
+            tablas.append(tabla)
+            logging.info("[%d/%d] %s: %d cortes (%.1f s)", len(tablas) + len(errores), len(nombres),
+                         nombre, tabla['corte'].nunique(), segundos)
+
+    if tablas:
+        resultados = pd.concat(tablas, ignore_index=True)
+        resultados.to_parquet(args.salida, index=False)
+        resumen = resultados.pivot_table(index='modelo', columns='metrica', values='valor', aggfunc='mean')
+        print(f"Media por modelo de los cortes a {HORIZONTE} horas:")
+        print(resumen.to_string(float_format=lambda valor: f'{valor:.3f}'))
+        print(f"Resultados en {args.salida}")
+    print(f"Modelos: {len(nombres)}, evaluados: {len(tablas)}, con error: {len(errores)} "
+          f"({time.perf_counter() - inicio:.1f} s con {args.trabajadores} procesos)")
+    for nombre, error in errores:
+        print(f"  {nombre}: {error}")
@@ -0,0 +1,102 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from despacho import EFICIENCIA_BATERIA, njit, simular_despacho
+
+
+# Bucle horario original de la API, como referencia de resultados y de rendimiento
+def despacho_referencia(energia_generada, consumo, capacidad_bateria_max, capacidad_bateria_actual,
+                        eficiencia_bateria=EFICIENCIA_BATERIA):
+    energia_almacenada = []
+    energia_vendida = []
+    energia_bateria_utilizada = []
+    capacidad_bateria_por_hora = []
+
+    for hora in range(len(energia_generada)):
+        autoconsumida = min(energia_generada[hora], consumo[hora])
+        excedente = max(energia_generada[hora] - autoconsumida, 0)
+        energia_necesaria = consumo[hora] - autoconsumida
+
+        almacenada = 0
+        if excedente > 0 and capacidad_bateria_actual < capacidad_bateria_max:
+            espacio_bateria = capacidad_bateria_max - capacidad_bateria_actual
+            energia_a_almacenar = min(excedente * eficiencia_bateria, espacio_bateria)
+            capacidad_bateria_actual += energia_a_almacenar
+            almacenada = energia_a_almacenar
+            excedente -= energia_a_almacenar / eficiencia_bateria
+        energia_almacenada.append(almacenada)
+        energia_vendida.append(excedente)
+
+        energia_bateria_usada = 0
+        if energia_necesaria > 0 and capacidad_bateria_actual > 0:
+            energia_disponible_bateria = capacidad_bateria_actual * eficiencia_bateria
+            energia_bateria_usada = min(energia_necesaria, energia_disponible_bateria)
+            capacidad_bateria_actual -= energia_bateria_usada / eficiencia_bateria
+        energia_bateria_utilizada.append(energia_bateria_usada)
+        capacidad_bateria_por_hora.append(capacidad_bateria_actual)
+
+    return energia_almacenada, energia_vendida, energia_bateria_utilizada, capacidad_bateria_por_hora
+
+
+# Escenarios sintéticos: generación con forma de campana diurna y consumo con ruido
+def generar_escenarios(escenarios, horas, semilla=0):
+    rng = np.random.default_rng(semilla)
+    hora_del_dia = np.arange(horas) % 24
+    campana = np.clip(np.sin((hora_del_dia - 6) / 12 * np.pi), 0, None)
+    generacion = campana * rng.uniform(0.5, 3.0, size=(escenarios, 1)) * rng.uniform(0.6, 1.0, size=(escenarios, horas))
+    consumo = rng.uniform(0.1, 1.0, size=(escenarios, horas))
+    capacidad = rng.uniform(2.0, 15.0, size=escenarios)
+    carga_inicial = capacidad * rng.uniform(0.0, 1.0, size=escenarios)
+    return generacion, consumo, capacidad, carga_inicial
+
+
+def medir(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+parser = argparse.ArgumentParser(description="Rendimiento del despacho vectorizado frente al bucle horario original")
+parser.add_argument('--horas', type=int, default=24, help="Horas simuladas por escenario")
+parser.add_argument('--escenarios', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+parser.add_argument('--repeticiones', type=int, default=5)
+args = parser.parse_args()
+
+# Comprobar que el despacho vectorizado reproduce el bucle original
+generacion, consumo, capacidad, carga_inicial = generar_escenarios(50, args.horas)
+flujos = simular_despacho(generacion, consumo, capacidad, carga_inicial)
+for i in range(len(capacidad)):
+    referencia = despacho_referencia(generacion[i], consumo[i], capacidad[i], carga_inicial[i])
+    for concepto, valores in zip(['energia_almacenada', 'energia_vendida', 'energia_bateria_utilizada', 'capacidad_bateria_actual'], referencia):
+        np.testing.assert_allclose(flujos[concepto][i], valores, rtol=1e-12, atol=1e-12)
+print(f"Resultados idénticos al bucle original (núcleo {'numba' if njit is not None else 'NumPy'}).")
+
+# Calentar la compilación de numba antes de medir
+simular_despacho(generacion[:1], consumo[:1], capacidad[:1], carga_inicial[:1])
+
+print(f"{'escenarios':>10} {'bucle (s)':>12} {'vectorizado (s)':>16} {'escenarios/s':>14} {'aceleración':>12}")
+for escenarios in args.escenarios:
+    generacion, consumo, capacidad, carga_inicial = generar_escenarios(escenarios, args.horas)
+    tiempo_vectorizado = medir(lambda: simular_despacho(generacion, consumo, capacidad, carga_inicial), args.repeticiones)
+
+    # El bucle original se mide sobre una muestra y se extrapola para no eternizar el benchmark
+    muestra = min(escenarios, 200)
+    tiempo_bucle = medir(lambda: [despacho_referencia(generacion[i], consumo[i], capacidad[i], carga_inicial[i]) for i in range(muestra)], 1)
+    tiempo_bucle *= escenarios / muestra
+
+    print(f"{escenarios:>10} {tiempo_bucle:>12.5f} {tiempo_vectorizado:>16.5f} {escenarios / tiempo_vectorizado:>14.0f} {tiempo_bucle / tiempo_vectorizado:>11.1f}x")
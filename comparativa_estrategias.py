@@ -0,0 +1,94 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from despacho import simular_despacho
+from optimizacion_dp import NIVELES_CARGA, optimizar_despacho as optimizar_despacho_dp
+from optimizacion_lp import optimizar_despacho as optimizar_despacho_lp
+
+
+# Cartera sintética de instalaciones: generación diurna, consumo con ruido y precios con punta de tarde
+def generar_cartera(instalaciones, dias, semilla=0):
+    rng = np.random.default_rng(semilla)
+    horas = dias * 24
+    hora_del_dia = np.arange(horas) % 24
+    campana = np.clip(np.sin((hora_del_dia - 6) / 12 * np.pi), 0, None)
+    generacion = campana * rng.uniform(0.5, 3.0, size=(instalaciones, 1)) * rng.uniform(0.6, 1.0, size=(instalaciones, horas))
+    consumo = rng.uniform(0.1, 1.0, size=(instalaciones, horas))
+    capacidad = rng.uniform(2.0, 15.0, size=instalaciones)
+    carga_inicial = capacidad * rng.uniform(0.0, 1.0, size=instalaciones)
+    punta = np.exp(-0.5 * ((hora_del_dia - 20) / 2) ** 2)
+    tarifa = 0.10 + 0.15 * punta + rng.normal(0, 0.01, size=horas)  # €/kWh
+    precio = 0.6 * tarifa
+    return generacion, consumo, capacidad, carga_inicial, tarifa, precio
+
+
+# Coste neto de la energía con cada estrategia: compras a la red menos ventas, a precio horario
+def coste_neto(flujos, tarifa, precio):
+    return np.sum(flujos['energia_red'] * tarifa, axis=1) - np.sum(flujos['energia_vendida'] * precio, axis=1)
+
+
+parser = argparse.ArgumentParser(description="Comparativa de beneficio y tiempo de las estrategias de despacho")
+parser.add_argument('--instalaciones', type=int, default=1000)
+parser.add_argument('--dias', type=int, default=1)
+parser.add_argument('--niveles', type=int, default=NIVELES_CARGA, help="Niveles de carga de la programación dinámica")
+parser.add_argument('--muestra-lp', type=int, default=100, help="Instalaciones resueltas con LP (una a una)")
+parser.add_argument('--carga-desde-red', action='store_true')
+parser.add_argument('--tolerancia', type=float, default=0.02,
+                    help="Diferencia dp - lp máxima admitida, como fracción del ahorro de lp frente a voraz")
+args = parser.parse_args()
+
+generacion, consumo, capacidad, carga_inicial, tarifa, precio = generar_cartera(args.instalaciones, args.dias)
+muestra = slice(0, min(args.muestra_lp, args.instalaciones))
+
+estrategias = {
+    'voraz': lambda s: simular_despacho(generacion[s], consumo[s], capacidad[s], carga_inicial[s]),
+    'dp': lambda s: optimizar_despacho_dp(generacion[s], consumo[s], capacidad[s], carga_inicial[s], tarifa, precio,
+                                          carga_desde_red=args.carga_desde_red, niveles=args.niveles),
+    'lp': lambda s: optimizar_despacho_lp(generacion[s], consumo[s], capacidad[s], carga_inicial[s], tarifa, precio,
+                                          carga_desde_red=args.carga_desde_red),
+}
+
+# Calentar compilaciones y cachés antes de medir
+for estrategia in estrategias.values():
+    estrategia(slice(0, 1))
+
+costes = {}
+print(f"{'estrategia':>10} {'instalaciones':>14} {'tiempo (s)':>11} {'ms/instalación':>15}")
+for nombre, estrategia in estrategias.items():
+    tramo = muestra if nombre == 'lp' else slice(None)
+    inicio = time.perf_counter()
+    flujos = estrategia(tramo)
+    tiempo = time.perf_counter() - inicio
+    costes[nombre] = coste_neto(flujos, tarifa, precio)
+    instalaciones = len(costes[nombre])
+    print(f"{nombre:>10} {instalaciones:>14} {tiempo:>11.4f} {tiempo / instalaciones * 1000:>15.4f}")
+
+# Beneficio frente a la estrategia voraz sobre las instalaciones resueltas con todas las estrategias
+n = len(costes['lp'])
+print(f"\nCoste neto medio sobre {n} instalaciones (€):")
+for nombre, coste in costes.items():
+    mejora = costes['voraz'][:n] - coste[:n]
+    print(f"{nombre:>10}: {coste[:n].mean():.4f}  (ahorro frente a voraz: {mejora.mean():.4f} €)")
+
+# La programación dinámica es aproximada: su coste no puede quedar por encima del de LP más que una
+# fracción del ahorro que consigue LP. Si lo hace, el script termina con error
+diferencia = (costes['dp'][:n] - costes['lp']).mean()
+ahorro_lp = (costes['voraz'][:n] - costes['lp']).mean()
+relativa = diferencia / ahorro_lp if ahorro_lp > 0 else 0.
+print(f"\nDiferencia media dp - lp (error de discretización): {diferencia:.5f} € ({relativa:.2%} del ahorro de lp)")
+if relativa > args.tolerancia:
+    raise SystemExit(f"La diferencia dp - lp supera la tolerancia del {args.tolerancia:.2%}")
@@ -13,23 +13,40 @@ Fecha: 07/09/2024
 import numpy as np
 import pandas as pd
 from statsmodels.tsa.statespace.sarimax import SARIMAX
-from sklearn.metrics import mean_squared_error, mean_absolute_error
 import matplotlib.pyplot as plt
-import joblib
-import pickle
-
-# Función para evaluar predicciones con las métricas solicitadas
-def evaluate_metrics(actual, predicted, model_name):
-    mae = mean_absolute_error(actual, predicted)
-    mse = mean_squared_error(actual, predicted)
-    rmse = np.sqrt(mse)
-    mape = np.mean(np.abs((actual - predicted) / actual)) * 100
-    
+import os
+import time
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos
+from geometria_solar import horas_diurnas
+from prophet_numpy import predecir_yhat
+from sitios import CAPITALES
+import gradiente
+import metricas
+import informes
+
+# Función para evaluar predicciones con las métricas solicitadas (metricas.py). La irradiación es nula
+# de noche: el MAPE solo cuenta las horas con valor real distinto de cero
+def evaluate_metrics(actual, predicted, model_name, scale=None):
+    results = metricas.errores(actual, predicted, escala=scale)
+
     print(f'Evaluación del modelo {model_name}:')
-    print(f'MAE (Error Absoluto Medio): {mae}')
-    print(f'MSE (Error Cuadrático Medio): {mse}')
-    print(f'RMSE (Raíz del Error Cuadrático Medio): {rmse}')
-    print(f'MAPE (Error Absoluto Porcentual Medio): {mape}%\n')
+    print(f'MAE (Error Absoluto Medio): {results["mae"]}')
+    print(f'MSE (Error Cuadrático Medio): {results["mse"]}')
+    print(f'RMSE (Raíz del Error Cuadrático Medio): {results["rmse"]}')
+    print(f'MAPE (Error Absoluto Porcentual Medio): {results["mape"]}%')
+    print(f'sMAPE (Error Absoluto Porcentual Simétrico): {results["smape"]}%')
+    print(f'MASE (Error Absoluto Escalado): {results["mase"]}\n')
+    return results
+
+# Tabla final: precisión y tiempo de cada modelo
+resumen = []
+
+def add_summary(model_name, metrics, prediction_seconds, model_metadata):
+    training_seconds = model_metadata['metricas'].get('segundos_entrenamiento')
+    resumen.append({'Modelo': model_name, 'MAE': metrics['mae'], 'RMSE': metrics['rmse'], 'sMAPE': metrics['smape'],
+                    'MASE': metrics['mase'], 'Predicción (ms)': prediction_seconds * 1000, 'Entrenamiento (s)': training_seconds})
 
 # Función para graficar los residuos
 def plot_residuals(actual, predicted, model_name):
@@ -41,76 +58,147 @@ def plot_residuals(actual, predicted, model_name):
     plt.xlabel('Fecha')
     plt.ylabel('Residuos')
     plt.legend()
-    plt.show()
+    informes.mostrar()
 
 # Cargar los datos
-data = pd.read_csv('little_typical_year_spain_corrected.csv', parse_dates=['datetime'], index_col='datetime')
+data = leer('serie_irradiacion', columnas=['datetime', 'G(i)', 'T2m']).set_index('datetime')
 
 # Dividir en entrenamiento y prueba
 n_periods = 868  # Número de periodos para el conjunto de prueba
 train = data.iloc[:-n_periods]
 test = data.iloc[-n_periods:]
 
-# Cargar y evaluar el modelo ARIMAX
-sarimax_model = joblib.load('sarimax_model_sin_exo.pkl')
+# Escala del MASE: error de repetir el valor del día anterior en el entrenamiento
+irradiation_scale = metricas.escala_mase(train['G(i)'])
+
+# Modelos entrenados, leídos del almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+
+# Cargar y evaluar el modelo ARIMAX (completo: se predice por posición a partir del entrenamiento)
+sarimax_model, sarimax_metadata = almacen.cargar('irradiacion_arimax', completo=True)
 test_exog = test[['T2m']]
+inicio = time.perf_counter()
 sarimax_predictions = sarimax_model.predict(start=len(train), end=len(train)+len(test)-1, exog=test_exog)
+sarimax_seconds = time.perf_counter() - inicio
 
 # Aplicar clipping para evitar valores negativos
 sarimax_predictions = np.maximum(sarimax_predictions, 0)
 
 # Evaluar y mostrar resultados del modelo ARIMAX
-evaluate_metrics(test['G(i)'], sarimax_predictions, 'ARIMAX')
+add_summary('ARIMAX', evaluate_metrics(test['G(i)'], sarimax_predictions, 'ARIMAX', irradiation_scale), sarimax_seconds, sarimax_metadata)
 
 # Graficar residuos del modelo ARIMAX
 plot_residuals(test['G(i)'], sarimax_predictions, 'ARIMAX')
 
 # Cargar y evaluar el modelo ARIMA
-with open('arima_model.pkl', 'rb') as pkl_file:
-    arima_model = pickle.load(pkl_file)
+arima_model, arima_metadata = almacen.cargar('irradiacion_arima')
+inicio = time.perf_counter()
 arima_predictions = arima_model.predict(start=test.index[0], end=test.index[-1])
+arima_seconds = time.perf_counter() - inicio
 
 # Aplicar clipping para evitar valores negativos
 arima_predictions = np.maximum(arima_predictions, 0)
 
 # Evaluar y mostrar resultados del modelo ARIMA
-evaluate_metrics(test['G(i)'], arima_predictions, 'ARIMA')
+add_summary('ARIMA', evaluate_metrics(test['G(i)'], arima_predictions, 'ARIMA', irradiation_scale), arima_seconds, arima_metadata)
 
 # Graficar residuos del modelo ARIMA
 plot_residuals(test['G(i)'], arima_predictions, 'ARIMA')
 
 # Cargar y evaluar el modelo Prophet
-with open('prophet_model.pkl', 'rb') as pkl_file:
-    prophet_model = pickle.load(pkl_file)
+prophet_model, prophet_metadata = almacen.cargar('irradiacion_prophet')
 
-# Generar el DataFrame futuro para las predicciones de Prophet
-future = pd.DataFrame(test.index)
-future.columns = ['ds']
-
-# Realizar las predicciones
-prophet_forecast = prophet_model.predict(future)
-
-# Alinear las fechas de las predicciones de Prophet con las fechas de test
-prophet_forecast.set_index('ds', inplace=True)
-prophet_predictions = prophet_forecast.reindex(test.index).interpolate(method='time')['yhat']
+# Realizar las predicciones para las fechas de test
+inicio = time.perf_counter()
+prophet_predictions = pd.Series(predecir_yhat(prophet_model, test.index), index=test.index)
+prophet_seconds = time.perf_counter() - inicio
 
 # Aplicar clipping para evitar valores negativos
 prophet_predictions = np.maximum(prophet_predictions, 0)
 
 # Evaluar y mostrar resultados del modelo Prophet
-evaluate_metrics(test['G(i)'], prophet_predictions, 'Prophet')
+add_summary('Prophet', evaluate_metrics(test['G(i)'], prophet_predictions, 'Prophet', irradiation_scale), prophet_seconds, prophet_metadata)
 
 # Graficar residuos del modelo Prophet
 plot_residuals(test['G(i)'], prophet_predictions, 'Prophet')
 
+# Cargar y evaluar el modelo de gradient boosting (entrenado con todas las ubicaciones del año típico)
+gradient_model, gradient_metadata = almacen.cargar('irradiacion_gradiente')
+
+# serie_irradiacion es el año típico de Albacete: se usa la inclinación y orientación cuya media coincide
+albacete = leer('anio_tipico', columnas=['slope', 'azimuth', 'G(i)'], filtros={'capital': 'Albacete'})
+slope, azimuth = (albacete.groupby(['slope', 'azimuth'])['G(i)'].mean() - data['G(i)'].mean()).abs().idxmin()
+site = [(*CAPITALES['Albacete'], slope, azimuth)]
+
+inicio = time.perf_counter()
+gradient_predictions = pd.Series(
+    gradiente.predecir_irradiacion(gradient_model, site, test.index, test['T2m'].to_numpy()[None, :])[0], index=test.index)
+gradient_seconds = time.perf_counter() - inicio
+
+# Evaluar y mostrar resultados del modelo de gradient boosting
+add_summary('Gradient boosting', evaluate_metrics(test['G(i)'], gradient_predictions, 'Gradient boosting', irradiation_scale), gradient_seconds, gradient_metadata)
+
+# Graficar residuos del modelo de gradient boosting
+plot_residuals(test['G(i)'], gradient_predictions, 'Gradient boosting')
+
+# Todos los modelos de irradiación de una vez: solo las horas con sol y por hora del día
+irradiation_names = ['ARIMAX', 'ARIMA', 'Prophet', 'Gradient boosting']
+irradiation_predictions = np.vstack([sarimax_predictions, arima_predictions, prophet_predictions, gradient_predictions])
+daylight = horas_diurnas(test.index, *CAPITALES['Albacete'])
+daylight_metrics = metricas.tabla(test['G(i)'], irradiation_predictions, irradiation_names, mascara=daylight, escala=irradiation_scale)
+print('Métricas en las horas con sol:')
+print(daylight_metrics.to_string(float_format=lambda valor: f'{valor:.3f}'))
+informes.tabla(daylight_metrics, 'Irradiación: métricas en las horas con sol')
+by_hour = metricas.por_grupos(test['G(i)'], irradiation_predictions, test.index.hour, nombres=irradiation_names)
+hourly_rmse = by_hour['rmse'].unstack('serie')
+print('\nRMSE por hora del día (UTC):')
+print(hourly_rmse.to_string(float_format=lambda valor: f'{valor:.1f}'))
+print()
+informes.tabla(hourly_rmse, 'Irradiación: RMSE por hora del día (UTC)')
+
+# Un solo modelo predice las 24 horas de un día para todas las capitales y orientaciones en una llamada
+all_sites = [(latitud, longitud, inclinacion, orientacion)
+             for latitud, longitud in CAPITALES.values() for inclinacion in (0, 30) for orientacion in (90, 180, 270)]
+inicio = time.perf_counter()
+gradiente.predecir_irradiacion(gradient_model, all_sites, pd.date_range(test.index[0].normalize(), periods=24, freq='h'))
+print(f'Gradient boosting: 24 horas de {len(all_sites)} sitios en {(time.perf_counter() - inicio) * 1000:.1f} ms\n')
+
 # Comparación de todos los modelos
 plt.figure(figsize=(12, 8))
-plt.plot(test.index, test['G(i)'], label='Datos Reales', color ='black')
-plt.plot(test.index, sarimax_predictions, label='ARIMAX Predicciones', color='red')
-plt.plot(test.index, arima_predictions, label='ARIMA Predicciones', color='green')
-plt.plot(test.index, prophet_predictions, label='Prophet Predicciones', color='blue')
-plt.title('Comparación de Predicciones - ARIMA, ARIMAX, Prophet')
+plt.plot(*informes.reducir(test.index, test['G(i)']), label='Datos Reales', color ='black')
+plt.plot(*informes.reducir(test.index, sarimax_predictions), label='ARIMAX Predicciones', color='red')
+plt.plot(*informes.reducir(test.index, arima_predictions), label='ARIMA Predicciones', color='green')
+plt.plot(*informes.reducir(test.index, prophet_predictions), label='Prophet Predicciones', color='blue')
+plt.plot(*informes.reducir(test.index, gradient_predictions), label='Gradient boosting Predicciones', color='orange')
+plt.title('Comparación de Predicciones - ARIMA, ARIMAX, Prophet, Gradient boosting')
 plt.xlabel('Fecha')
 plt.ylabel('Irradiación G(i)')
 plt.legend()
-plt.show()
+informes.mostrar()
+
+# Precio de la energía: Prophet frente a gradient boosting sobre el último 20% de la serie
+prices = leer('precio_spot', columnas=['datetime', 'value']).set_index('datetime')['value']
+_, prices = gradiente.caracteristicas_precio(prices)
+train_prices = prices[:int(0.8 * len(prices))]
+test_prices = prices[int(0.8 * len(prices)):]
+price_scale = metricas.escala_mase(train_prices)
+
+prophet_price_model, prophet_price_metadata = almacen.cargar('precio_energia')
+inicio = time.perf_counter()
+prophet_price_predictions = np.maximum(predecir_yhat(prophet_price_model, test_prices.index.tz_localize(None)), 0)
+prophet_price_seconds = time.perf_counter() - inicio
+add_summary('Prophet (precio)', evaluate_metrics(test_prices, prophet_price_predictions, 'Prophet (precio)', price_scale),
+            prophet_price_seconds, prophet_price_metadata)
+
+# El modelo de gradient boosting predice de forma recursiva todo el periodo, como Prophet
+gradient_price_model, gradient_price_metadata = almacen.cargar('precio_energia_gradiente')
+inicio = time.perf_counter()
+gradient_price_predictions = gradiente.predecir_precio(gradient_price_model, train_prices, test_prices.index)
+gradient_price_seconds = time.perf_counter() - inicio
+add_summary('Gradient boosting (precio)', evaluate_metrics(test_prices, gradient_price_predictions, 'Gradient boosting (precio)', price_scale),
+            gradient_price_seconds, gradient_price_metadata)
+
+# Resumen de precisión y tiempos
+resumen = pd.DataFrame(resumen)
+print(resumen.to_string(index=False, float_format=lambda valor: f'{valor:.3f}'))
+informes.tabla(resumen.set_index('Modelo'), 'Resumen de precisión y tiempos')
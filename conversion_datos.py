@@ -0,0 +1,53 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import os
+import shutil
+
+import pandas as pd
+
+from almacen_datos import CONJUNTOS, RAIZ_DATOS, existe, guardar, ruta_conjunto
+
+# Convierte los CSV originales de datos/ a los datasets Parquet de almacen_datos.py. Los CSV grandes
+# (la descarga completa de PVGIS supera los 50 millones de filas) se procesan por bloques para no
+# cargarlos enteros en memoria
+parser = argparse.ArgumentParser(description="Convierte los CSV de datos a Parquet particionado")
+parser.add_argument('conjuntos', nargs='*', default=list(CONJUNTOS), help="Conjuntos a convertir")
+parser.add_argument('--raiz', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--filas-bloque', type=int, default=5_000_000, help="Filas de CSV procesadas por bloque")
+parser.add_argument('--forzar', action='store_true', help="Volver a convertir los conjuntos ya convertidos")
+args = parser.parse_args()
+
+for nombre in args.conjuntos:
+    origen = os.path.join(args.raiz, CONJUNTOS[nombre]['csv'])
+    if not os.path.exists(origen):
+        print(f"{nombre}: no existe {origen}, se omite")
+        continue
+    if existe(nombre, args.raiz):
+        if not args.forzar:
+            print(f"{nombre}: ya convertido, se omite (usa --forzar para repetirlo)")
+            continue
+        shutil.rmtree(ruta_conjunto(nombre, args.raiz))
+
+    # Cada bloque se añade con un prefijo propio: un bloque no borra lo escrito por los anteriores
+    filas = 0
+    for numero, bloque in enumerate(pd.read_csv(origen, chunksize=args.filas_bloque)):
+        guardar(nombre, bloque, raiz=args.raiz, reemplazar=False, prefijo=f'parte-{numero}')
+        filas += len(bloque)
+
+    tamano_csv = os.path.getsize(origen)
+    tamano_parquet = sum(
+        os.path.getsize(os.path.join(directorio, archivo))
+        for directorio, _, archivos in os.walk(ruta_conjunto(nombre, args.raiz)) for archivo in archivos
+    )
+    print(f"{nombre}: {filas} filas, {tamano_csv / 1e6:.1f} MB en CSV -> {tamano_parquet / 1e6:.1f} MB en Parquet")
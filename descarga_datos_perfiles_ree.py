@@ -10,60 +10,41 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFB), centra
 Fecha: 07/09/2024
 """
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+import argparse
+import logging
 import os
-from datetime import datetime
 
-# Configurar el Service para usar ChromeDriver
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service)
-
-# Navega a la página web
-driver.get('https://www.ree.es/en/node/13430')
-
-# Espera a que la página cargue completamente
-wait = WebDriverWait(driver, 10)
-
-# Encuentra los menús desplegables por su identificador o nombre
-combo1 = Select(wait.until(EC.presence_of_element_located((By.ID, 'edit-month'))))
-combo2 = Select(wait.until(EC.presence_of_element_located((By.ID, 'edit-year'))))
-
-# Obtener el mes y año actual
-current_year = datetime.now().year
-current_month = datetime.now().month
-
-# Iterar sobre todas las combinaciones posibles hasta el mes anterior del año actual
-for option2 in combo2.options:
-    year = int(option2.get_attribute('value'))
-    if year > current_year:
-        continue  # Saltar años futuros
-
-    for option1 in combo1.options:
-        month = int(option1.get_attribute('value'))
-        if year == current_year and month >= current_month:
-            continue  # Saltar el mes actual y futuros meses
-
-        combo1.select_by_value(option1.get_attribute('value'))
-        combo2.select_by_value(option2.get_attribute('value'))
-
-        # Usar JavaScript para hacer clic en el botón
-        try:
-            download_button = driver.find_element(By.ID, 'submit_simel')
-            driver.execute_script("arguments[0].click();", download_button)
-            print(f"Descargando archivo para {option1.text} {option2.text}")
-            
-            # Esperar a que la descarga se inicie y complete
-            time.sleep(4) 
-
-        except Exception as e:
-            print(f"Error al hacer clic en el botón: {e}")
-
-# Cierra el navegador
-driver.quit()
+from almacen_datos import RAIZ_DATOS, guardar
+from perfiles_ree import URL_PERFILES, anio_tipico, descargar, leer_directorio
+
+# Descarga de los perfiles de consumo mensuales de REE enviando el formulario de la página por HTTP (sin
+# navegador) y construcción del año típico de los perfiles A-D. Los archivos originales se conservan en
+# un directorio: solo se descargan los meses nuevos y con --offline se procesa lo ya descargado
+parser = argparse.ArgumentParser(description="Descarga y normaliza los perfiles de consumo de REE")
+parser.add_argument('--raiz', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--directorio', help="Directorio de los archivos mensuales (por defecto <raiz>/perfiles_ree)")
+parser.add_argument('--offline', action='store_true', help="No descargar; procesar solo los archivos existentes")
+parser.add_argument('--url', default=os.environ.get('PERFILES_URL', URL_PERFILES), help="Página del formulario")
+parser.add_argument('--desde-anio', type=int, help="Primer año a descargar")
+parser.add_argument('--hilos', type=int, default=4, help="Descargas simultáneas")
+parser.add_argument('--procesos', type=int, help="Procesos para leer los archivos")
+
+# Los archivos se leen en un pool de procesos: el script solo se ejecuta en el proceso principal
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    directorio = args.directorio or os.path.join(args.raiz, 'perfiles_ree')
+
+    if not args.offline:
+        descargados, fallidos = descargar(directorio, url=args.url, desde_anio=args.desde_anio, hilos=args.hilos)
+        print(f"Meses descargados: {len(descargados)}, fallidos: {len(fallidos)}")
+        for anio, mes, error in fallidos:
+            print(f"  {anio}-{mes:02d}: {error}")
+
+    perfiles, errores = leer_directorio(directorio, procesos=args.procesos)
+    for ruta, error in errores:
+        print(f"Archivo descartado {ruta}: {error}")
+
+    tipico = anio_tipico(perfiles)
+    guardar('perfil', tipico, raiz=args.raiz)
+    print(f"Año típico de los perfiles ({perfiles['anio'].nunique()} años, {len(tipico)} horas) guardado correctamente.")
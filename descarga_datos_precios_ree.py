@@ -10,62 +10,47 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFG), centra
 Fecha: 07/09/2024
 """
 
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-
-# Archivo de salida
-pvpc_file = "pvpc_prices.csv"
-spot_file = "spot_prices.csv"
-
-# Bloqueo para evitar conflictos al escribir en el archivo
-lock = threading.Lock()
-
-def download_pvpc_and_spot_prices_for_day(date):
-    url = f"https://apidatos.ree.es/es/datos/mercados/precios-mercados-tiempo-real?start_date={date}T00:00&end_date={date}T23:59&time_trunc=hour"
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json; application/vnd.esios-api-v1+json'
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        pvpc_values = data['included'][0]['attributes']['values']
-        spot_values = data['included'][1]['attributes']['values']
-        
-        pvpc_df = pd.DataFrame(pvpc_values)
-        spot_df = pd.DataFrame(spot_values)
-        
-        # Convertir la columna 'datetime' a formato datetime
-        pvpc_df['datetime'] = pd.to_datetime(pvpc_df['datetime'])
-        spot_df['datetime'] = pd.to_datetime(spot_df['datetime'])
-        
-        with lock:
-            pvpc_df.to_csv(pvpc_file, mode='a', header=not pd.io.common.file_exists(pvpc_file), index=False)
-            spot_df.to_csv(spot_file, mode='a', header=not pd.io.common.file_exists(spot_file), index=False)
-        
-        print(f"Datos para {date} descargados y guardados correctamente.")
-    else:
-        print(f"Error al obtener datos de {url}: {response.status_code}")
-
-# Fechas de inicio y fin
-start_date = datetime(2022, 1, 1)
-end_date = datetime(2023, 12, 31)
-date_generated = [start_date + timedelta(days=x) for x in range(0, (end_date-start_date).days + 1)]
-
-# Descargar los datos con hilos
-with ThreadPoolExecutor(max_workers=10) as executor:
-    futures = []
-    for date in date_generated:
-        futures.append(executor.submit(download_pvpc_and_spot_prices_for_day, date.strftime('%Y-%m-%d')))
-    
-    # Esperar a que todos los hilos terminen
-    for future in as_completed(futures):
-        try:
-            future.result()
-        except Exception as exc:
-            print(f"Generó una excepción: {exc}")
-
-print("Todos los datos han sido descargados y guardados correctamente.")
+import argparse
+import asyncio
+import logging
+import os
+
+from almacen_datos import RAIZ_DATOS
+from precios_ree import DIAS_POR_PETICION, URL_REE, actualizar
+
+# Actualización incremental de los precios PVPC y spot: solo se descargan los días que faltan o están
+# incompletos desde la fecha de inicio (los huecos de ejecuciones anteriores se rellenan solos) y las
+# horas se integran en los datasets sin duplicados. Pensado para ejecutarse cada noche
+parser = argparse.ArgumentParser(description="Descarga incremental de los precios horarios de REE")
+parser.add_argument('--desde', default='2022-01-01', help="Primer día de la serie (YYYY-MM-DD)")
+parser.add_argument('--hasta', help="Último día (por defecto, hoy)")
+parser.add_argument('--raiz', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--url', default=os.environ.get('REE_URL', URL_REE), help="URL del servicio de precios")
+parser.add_argument('--dias-por-peticion', type=int, default=DIAS_POR_PETICION, help="Días por petición")
+parser.add_argument('--concurrencia', type=int, default=4, help="Peticiones simultáneas")
+parser.add_argument('--peticiones-por-segundo', type=float, default=2, help="Límite de peticiones por segundo")
+parser.add_argument('--reintentos', type=int, default=4, help="Reintentos por petición")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+resumen = asyncio.run(actualizar(
+    args.desde,
+    args.hasta,
+    raiz=args.raiz,
+    url=args.url,
+    dias_por_peticion=args.dias_por_peticion,
+    concurrencia=args.concurrencia,
+    peticiones_por_segundo=args.peticiones_por_segundo,
+    reintentos=args.reintentos,
+))
+print(f"Peticiones: {resumen['peticiones']}, horas integradas: {resumen['filas']}, fallidas: {len(resumen['fallidas'])}")
+for inicio, fin, error in resumen['fallidas']:
+    print(f"  {inicio} - {fin}: {error}")
+for nombre, dias in resumen['incompletos'].items():
+    print(f"  {nombre}: {len(dias)} días incompletos ({dias[0]} ... {dias[-1]})")
+
+if resumen['fallidas'] or resumen['incompletos']:
+    print("Vuelve a ejecutar el script para completar los días que faltan.")
+else:
+    print("Precios actualizados correctamente.")
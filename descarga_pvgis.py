@@ -0,0 +1,179 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import random
+import time
+
+import aiohttp
+import pandas as pd
+
+from almacen_datos import guardar, ruta_conjunto
+
+logger = logging.getLogger(__name__)
+
+# Servicio de series horarias de PVGIS (configurable para apuntar a un servidor local de pruebas)
+URL_PVGIS = "https://re.jrc.ec.europa.eu/api/v5_2/seriescalc"
+
+# Manifiesto de combinaciones descargadas, una línea JSON por combinación. Se guarda dentro del dataset
+# 'pvgis'; el prefijo '_' hace que la lectura del dataset lo ignore
+ARCHIVO_MANIFIESTO = '_manifiesto.jsonl'
+
+# Versión del formato de los datos descargados, anotada en cada entrada del manifiesto. La 2 envía a
+# PVGIS el 'aspect' medido desde el sur (azimuth - 180); las entradas sin versión o de una versión
+# anterior se descargaron con otra orientación y se tratan como pendientes
+VERSION_FORMATO = 2
+
+# Columnas que se conservan de la respuesta horaria
+COLUMNAS = ['time', 'G(i)', 'T2m', 'capital', 'slope', 'azimuth']
+
+# Respuestas que merece la pena reintentar: límite de peticiones y errores temporales del servidor
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+# Error definitivo de una combinación (se registra y se continúa con las demás)
+class ErrorDescarga(Exception):
+    pass
+
+
+# Limitador de tasa compartido por todas las peticiones: reparte los turnos a intervalos regulares
+class LimitadorTasa:
+    def __init__(self, peticiones_por_segundo):
+        self.intervalo = 1 / peticiones_por_segundo if peticiones_por_segundo else 0
+        self._siguiente = 0.
+        self._lock = asyncio.Lock()
+
+    async def esperar(self):
+        async with self._lock:
+            ahora = time.monotonic()
+            espera = self._siguiente - ahora
+            self._siguiente = max(ahora, self._siguiente) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+def leer_manifiesto(raiz):
+    # Combinaciones completadas en el formato actual cuyos archivos siguen existiendo:
+    # (capital, slope, azimuth) -> entrada
+    directorio = ruta_conjunto('pvgis', raiz)
+    ruta = os.path.join(directorio, ARCHIVO_MANIFIESTO)
+    completadas = {}
+    if not os.path.exists(ruta):
+        return completadas
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                entrada = json.loads(linea)
+            except json.JSONDecodeError:
+                # Última línea incompleta si el proceso se interrumpió mientras escribía
+                continue
+            if entrada.get('formato') != VERSION_FORMATO:
+                continue
+            if all(os.path.exists(os.path.join(directorio, archivo)) for archivo in entrada['archivos']):
+                completadas[(entrada['capital'], int(entrada['slope']), str(entrada['azimuth']))] = entrada
+    return completadas
+
+
+def _registrar(raiz, entrada):
+    # Se añade y se fuerza a disco para que un reinicio nunca pierda una combinación ya guardada
+    with open(os.path.join(ruta_conjunto('pvgis', raiz), ARCHIVO_MANIFIESTO), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _guardar_respuesta(datos, capital, slope, azimuth, raiz):
+    # Conversión de la respuesta JSON a la partición Parquet de la combinación (en un hilo, para no
+    # bloquear el bucle de eventos). Volver a guardar una combinación sustituye su partición
+    if not datos or 'outputs' not in datos or 'hourly' not in datos['outputs']:
+        raise ErrorDescarga("Respuesta sin datos horarios")
+    df = pd.DataFrame(datos['outputs']['hourly'])
+    df['time'] = pd.to_datetime(df['time'], format='%Y%m%d:%H%M', errors='coerce')
+    df['time'] = df['time'].dt.floor('h')  # Eliminar los minutos
+    df['capital'] = capital
+    df['slope'] = slope
+    df['azimuth'] = azimuth
+    df = df[COLUMNAS]
+
+    archivos = guardar('pvgis', df, raiz=raiz)
+    return len(df), [os.path.relpath(archivo, ruta_conjunto('pvgis', raiz)) for archivo in archivos]
+
+
+async def pedir(sesion, limitador, url, parametros, reintentos, espera_base):
+    # Petición con reintentos y espera exponencial con jitter; respeta Retry-After si el servidor lo envía
+    for intento in range(reintentos + 1):
+        await limitador.esperar()
+        try:
+            async with sesion.get(url, params=parametros) as respuesta:
+                if respuesta.status == 200:
+                    return await respuesta.json(content_type=None)
+                if respuesta.status not in ESTADOS_REINTENTABLES:
+                    raise ErrorDescarga(f"HTTP {respuesta.status}: {(await respuesta.text())[:200]}")
+                motivo = f"HTTP {respuesta.status}"
+                reintentar_en = respuesta.headers.get('Retry-After')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            motivo = f"{type(e).__name__}: {e}"
+            reintentar_en = None
+
+        if intento == reintentos:
+            raise ErrorDescarga(f"{motivo} tras {reintentos + 1} intentos")
+        espera = espera_base * 2 ** intento * (1 + random.random())
+        if reintentar_en and reintentar_en.isdigit():
+            espera = max(espera, float(reintentar_en))
+        logger.warning("%s (%s); reintento en %.1f s", motivo, parametros, espera)
+        await asyncio.sleep(espera)
+
+
+async def descargar(combinaciones, raiz=None, url=URL_PVGIS, concurrencia=8, peticiones_por_segundo=10,
+                    reintentos=5, espera_base=1., timeout=120, anio_inicio=2005, anio_fin=2020):
+    # Descarga las combinaciones (capital, lat, lon, slope, azimuth) que no estén ya en el manifiesto y
+    # guarda cada una como partición del dataset 'pvgis'. Devuelve el resumen de la ejecución
+    os.makedirs(ruta_conjunto('pvgis', raiz), exist_ok=True)
+    completadas = leer_manifiesto(raiz)
+    pendientes = [c for c in combinaciones if (c[0], int(c[3]), str(c[4])) not in completadas]
+    resumen = {'omitidas': len(combinaciones) - len(pendientes), 'descargadas': 0, 'fallidas': []}
+    logger.info("%d combinaciones ya descargadas, %d pendientes", resumen['omitidas'], len(pendientes))
+
+    limitador = LimitadorTasa(peticiones_por_segundo)
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def procesar(sesion, capital, lat, lon, slope, azimuth):
+        # azimuth es la orientación del proyecto (180 = sur, 90 = este); PVGIS mide el 'aspect' desde el sur
+        parametros = {
+            'lat': lat, 'lon': lon, 'startyear': anio_inicio, 'endyear': anio_fin,
+            'slope': slope, 'aspect': float(azimuth) - 180, 'outputformat': 'json',
+        }
+        async with semaforo:
+            try:
+                datos = await pedir(sesion, limitador, url, parametros, reintentos, espera_base)
+                filas, archivos = await asyncio.to_thread(_guardar_respuesta, datos, capital, slope, azimuth, raiz)
+            except ErrorDescarga as e:
+                logger.error("Error en %s (%s, %s): %s", capital, slope, azimuth, e)
+                resumen['fallidas'].append((capital, slope, azimuth, str(e)))
+                return
+        _registrar(raiz, {
+            'capital': capital, 'slope': slope, 'azimuth': azimuth, 'aspect': parametros['aspect'],
+            'formato': VERSION_FORMATO, 'archivos': archivos, 'filas': filas,
+            'descargado_en': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        })
+        resumen['descargadas'] += 1
+        logger.info("Progreso: %d/%d combinaciones pendientes completadas", resumen['descargadas'], len(pendientes))
+
+    # Una sola sesión: las conexiones al servidor se reutilizan entre peticiones
+    conector = aiohttp.TCPConnector(limit=concurrencia)
+    async with aiohttp.ClientSession(connector=conector, timeout=aiohttp.ClientTimeout(total=timeout)) as sesion:
+        await asyncio.gather(*(procesar(sesion, *combinacion) for combinacion in pendientes))
+    return resumen
@@ -0,0 +1,152 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import numpy as np
+
+# numba es opcional: si está instalado, la recurrencia de la batería se compila
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Eficiencias por defecto del sistema
+EFICIENCIA_PANEL = 0.2  # Eficiencia paneles
+EFICIENCIA_BATERIA = 0.9  # Supongamos una eficiencia del 90%
+
+
+def calcular_generacion(irradiacion_solar, area_total_paneles, eficiencia_panel=EFICIENCIA_PANEL):
+    # Energía generada por hora (kWh) a partir de la irradiación (W/m²), forma (escenarios, horas)
+    irradiacion_kW_m2 = np.atleast_2d(irradiacion_solar) / 1000  # Convertir W/m² a kW/m²
+    return irradiacion_kW_m2 * np.reshape(area_total_paneles, (-1, 1)) * eficiencia_panel
+
+
+def calcular_consumo(consumo_diario, perfil_consumo_horario):
+    # Consumo por hora (kWh) a partir del consumo diario y del perfil horario normalizado
+    return np.reshape(consumo_diario, (-1, 1)) * np.atleast_2d(perfil_consumo_horario)
+
+
+def _recurrencia_bateria_numpy(excedente, necesaria, capacidad_max, carga_inicial, eficiencia):
+    # Único tramo secuencial: cada hora depende del estado de carga de la anterior.
+    # Se recorre hora a hora, pero cada paso opera sobre todos los escenarios a la vez
+    escenarios, horas = excedente.shape
+    almacenada = np.zeros((escenarios, horas))
+    bateria_usada = np.zeros((escenarios, horas))
+    carga_por_hora = np.zeros((escenarios, horas))
+    carga = carga_inicial.copy()
+
+    for hora in range(horas):
+        # Carga de la batería desde la generación solar
+        exc = excedente[:, hora]
+        cargar = (exc > 0) & (carga < capacidad_max)
+        a_almacenar = np.where(cargar, np.minimum(exc * eficiencia, capacidad_max - carga), 0.0)
+        carga += a_almacenar
+        almacenada[:, hora] = a_almacenar
+
+        # Uso de la batería
+        nec = necesaria[:, hora]
+        descargar = (nec > 0) & (carga > 0)
+        usada = np.where(descargar, np.minimum(nec, carga * eficiencia), 0.0)
+        carga -= usada / eficiencia
+        bateria_usada[:, hora] = usada
+
+        carga_por_hora[:, hora] = carga
+
+    return almacenada, bateria_usada, carga_por_hora
+
+
+def _recurrencia_bateria_escalar(excedente, necesaria, capacidad_max, carga_inicial, eficiencia):
+    # Misma recurrencia que la versión NumPy escrita como bucle escalar para compilarla con numba
+    escenarios, horas = excedente.shape
+    almacenada = np.zeros((escenarios, horas))
+    bateria_usada = np.zeros((escenarios, horas))
+    carga_por_hora = np.zeros((escenarios, horas))
+
+    for escenario in range(escenarios):
+        carga = carga_inicial[escenario]
+        capacidad = capacidad_max[escenario]
+        for hora in range(horas):
+            exc = excedente[escenario, hora]
+            if exc > 0 and carga < capacidad:
+                a_almacenar = min(exc * eficiencia, capacidad - carga)
+                carga += a_almacenar
+                almacenada[escenario, hora] = a_almacenar
+
+            nec = necesaria[escenario, hora]
+            if nec > 0 and carga > 0:
+                usada = min(nec, carga * eficiencia)
+                carga -= usada / eficiencia
+                bateria_usada[escenario, hora] = usada
+
+            carga_por_hora[escenario, hora] = carga
+
+    return almacenada, bateria_usada, carga_por_hora
+
+
+if njit is not None:
+    _recurrencia_bateria = njit(cache=True)(_recurrencia_bateria_escalar)
+else:
+    _recurrencia_bateria = _recurrencia_bateria_numpy
+
+
+def simular_despacho(energia_generada, consumo, capacidad_bateria_max, carga_inicial_bateria,
+                     eficiencia_bateria=EFICIENCIA_BATERIA):
+    # Estrategia voraz: la batería se carga solo con excedente solar y se descarga siempre que hay demanda.
+    # Entradas de forma (escenarios, horas); capacidad y carga inicial de forma (escenarios,)
+    energia_generada = np.atleast_2d(np.asarray(energia_generada, dtype=float))
+    consumo = np.broadcast_to(np.asarray(consumo, dtype=float), energia_generada.shape)
+    escenarios = energia_generada.shape[0]
+    capacidad_max = np.broadcast_to(np.asarray(capacidad_bateria_max, dtype=float), (escenarios,)).copy()
+    carga_inicial = np.broadcast_to(np.asarray(carga_inicial_bateria, dtype=float), (escenarios,)).copy()
+
+    # Energía autoconsumida directamente de la generación
+    autoconsumida = np.minimum(energia_generada, consumo)
+
+    # Energía excedente y energía necesaria adicional después del autoconsumo directo
+    excedente = np.maximum(energia_generada - autoconsumida, 0)
+    necesaria = consumo - autoconsumida
+
+    almacenada, bateria_usada, carga_por_hora = _recurrencia_bateria(
+        np.ascontiguousarray(excedente), np.ascontiguousarray(necesaria),
+        capacidad_max, carga_inicial, eficiencia_bateria,
+    )
+
+    return {
+        'energia_generada': energia_generada,
+        'consumo': consumo,
+        'energia_autoconsumida': autoconsumida,
+        'energia_almacenada': almacenada,
+        # El excedente que no cabe en la batería se vende
+        'energia_vendida': excedente - almacenada / eficiencia_bateria,
+        'energia_bateria_utilizada': bateria_usada,
+        # Lo que no cubren ni los paneles ni la batería se compra a la red
+        'energia_red': necesaria - bateria_usada,
+        'capacidad_bateria_actual': carga_por_hora,
+    }
+
+
+def calcular_ahorro(flujos, tarifa_pvpc_kwh, precio_energia_kwh, costo_carga_inicial_bateria=0):
+    # Ahorro por escenario respecto a comprar todo el consumo a la red. Se agrega sobre el último eje,
+    # de modo que con flujos de forma (escenarios, días, 24) se obtiene el ahorro de cada día
+    tarifa_pvpc_kwh = np.atleast_2d(tarifa_pvpc_kwh)
+    precio_energia_kwh = np.atleast_2d(precio_energia_kwh)
+
+    # Costo de la energía comprada a la red si no hubiera paneles solares
+    costo_consumo_sin_solar = np.sum(flujos['consumo'] * tarifa_pvpc_kwh, axis=-1)
+
+    # Costo de la energía comprada a la red después de autoconsumo y batería
+    costo_consumo_con_solar = np.sum(flujos['energia_red'] * tarifa_pvpc_kwh, axis=-1)
+
+    # Ingresos por la venta de la energía excedente, al precio de cada hora (el mismo objetivo que
+    # minimizan optimizacion_lp y optimizacion_dp)
+    ingresos_venta = np.sum(flujos['energia_vendida'] * precio_energia_kwh, axis=-1)
+
+    return costo_consumo_sin_solar - costo_consumo_con_solar + ingresos_venta - np.asarray(costo_carga_inicial_bateria)
@@ -0,0 +1,183 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import preprocesado
+from sitios import CAPITALES, nombre_modelo_sitio
+
+# Trabajos de entrenamiento de los modelos que usa la API. Cada trabajo indica el modelo del almacén que
+# produce, de qué datos parte y con qué hiperparámetros se ajusta; se ejecuta de forma independiente
+# (en un proceso del pool de entrenamiento_modelos.py) y se omite si ni los datos ni los
+# hiperparámetros han cambiado desde la última versión guardada
+
+
+class Trabajo(NamedTuple):
+    nombre: str  # Modelo en el almacén
+    familia: str  # 'sarimax' o 'prophet'
+    datos: str  # Preparador de los datos (clave de PREPARADORES)
+    argumentos: dict  # Argumentos del preparador (p. ej. la ubicación)
+    hiperparametros: dict
+    etiquetas: dict = {}
+
+
+# Especificaciones de los modelos (las mismas que los scripts modelo_*.py). Un periodo estacional
+# None se elige a partir de la autocorrelación de la serie (ajuste_sarimax.periodo_estacional)
+SARIMAX_IRRADIACION = {'order': [2, 1, 0], 'seasonal_order': [1, 1, 0, None], 'prueba': 868}
+PROPHET = {'prueba': 0.2}
+
+
+def _dividir(serie, prueba):
+    # prueba: número de observaciones finales o fracción del total reservadas para evaluar
+    corte = len(serie) - prueba if isinstance(prueba, int) else int((1 - prueba) * len(serie))
+    return serie.iloc[:corte], serie.iloc[corte:]
+
+
+def _serie_irradiacion(prueba, raiz=None):
+    return _dividir(preprocesado.serie_irradiacion(raiz)['G(i)'], prueba)
+
+
+def _serie_sitio(capital, slope, azimuth, prueba, raiz=None):
+    return _dividir(preprocesado.serie_sitio(capital, slope, azimuth, raiz)['G(i)'], prueba)
+
+
+def _serie_precio(conjunto, prueba, raiz=None):
+    # Prophet trabaja con instantes sin zona: los precios se pasan a UTC y se les quita la zona
+    return _dividir(preprocesado.serie_precio(conjunto, raiz), prueba)
+
+
+def _serie_perfil(prueba, raiz=None):
+    return _dividir(preprocesado.serie_perfil(raiz=raiz), prueba)
+
+
+PREPARADORES = {
+    'serie_irradiacion': _serie_irradiacion,
+    'sitio': _serie_sitio,
+    'precio': _serie_precio,
+    'perfil': _serie_perfil,
+}
+
+
+def _ajustar_sarimax(train, test, hiperparametros, almacen, nombre):
+    import ajuste_sarimax
+
+    order, seasonal_order = ajuste_sarimax.especificacion(train, hiperparametros['order'], hiperparametros['seasonal_order'])
+    # El ajuste parte de la versión anterior del modelo o, si no la hay, de otro modelo de irradiación
+    # con la misma especificación (las ubicaciones vecinas tienen parámetros parecidos)
+    referencias = [nombre] + [otro for otro in almacen.nombres() if otro.startswith('irradiacion') and otro != nombre]
+    iniciales = ajuste_sarimax.parametros_previos(almacen, referencias, order, seasonal_order)
+    resultado = ajuste_sarimax.ajustar(train, order, seasonal_order, iniciales=iniciales)
+    predicciones = resultado.predict(start=len(train), end=len(train) + len(test) - 1)
+    return resultado, np.asarray(predicciones, dtype=float), test.to_numpy(dtype=float), rango_entrenamiento(train.index)
+
+
+def _ajustar_prophet(train, test, hiperparametros, almacen, nombre):
+    from prophet import Prophet
+
+    from prophet_numpy import predecir_yhat
+
+    modelo = Prophet(**hiperparametros.get('prophet', {}))
+    modelo.fit(train)
+    predicciones = predecir_yhat(modelo, test['ds'])
+    return modelo, predicciones, test['y'].to_numpy(dtype=float), rango_entrenamiento(train['ds'])
+
+
+AJUSTADORES = {
+    'sarimax': _ajustar_sarimax,
+    'prophet': _ajustar_prophet,
+}
+
+
+def silenciar_registros():
+    # Prophet y cmdstanpy informan de cada ajuste; con cientos de trabajos solo interesan sus avisos.
+    # cmdstanpy configura su logger (nivel DEBUG y un handler propio) la primera vez que lo usa, lo que
+    # anularía el nivel fijado aquí: se fuerza esa configuración antes de fijarlo
+    from cmdstanpy.utils import get_logger
+
+    get_logger()
+    for ruidoso in ('prophet', 'cmdstanpy'):
+        logging.getLogger(ruidoso).setLevel(logging.WARNING)
+
+
+def huella_trabajo(trabajo, train, test):
+    # Cambia si cambian los datos (entrenamiento y prueba), la familia o los hiperparámetros
+    huella = hashlib.sha256()
+    huella.update(json.dumps([trabajo.familia, trabajo.hiperparametros], sort_keys=True).encode())
+    huella.update(huella_datos(train).encode())
+    huella.update(huella_datos(test).encode())
+    return huella.hexdigest()[:16]
+
+
+def ejecutar(trabajo, raiz_modelos, raiz_datos=None, forzar=False):
+    # Ejecuta un trabajo y devuelve su resumen: estado ('entrenado' u 'omitido'), versión, métricas y duración
+    inicio = time.perf_counter()
+    train, test = PREPARADORES[trabajo.datos](**trabajo.argumentos, prueba=trabajo.hiperparametros['prueba'], raiz=raiz_datos)
+    huella = huella_trabajo(trabajo, train, test)
+
+    almacen = AlmacenModelos(raiz_modelos)
+    versiones = almacen.versiones(trabajo.nombre)
+    if versiones and not forzar:
+        ultima = almacen.metadatos(trabajo.nombre, versiones[-1])
+        if ultima.get('etiquetas', {}).get('huella_trabajo') == huella:
+            return {'nombre': trabajo.nombre, 'estado': 'omitido', 'version': ultima['version'],
+                    'metricas': ultima['metricas'], 'segundos': time.perf_counter() - inicio}
+
+    modelo, predicciones, reales, rango = AJUSTADORES[trabajo.familia](train, test, trabajo.hiperparametros, almacen, trabajo.nombre)
+    # Las series que se predicen no pueden ser negativas
+    rmse = float(np.sqrt(np.mean((reales - np.maximum(predicciones, 0)) ** 2)))
+    version = almacen.guardar(
+        trabajo.nombre, modelo, trabajo.familia,
+        rango=rango,
+        metricas={'rmse': rmse},
+        huella=huella_datos(train),
+        etiquetas={**trabajo.etiquetas, 'huella_trabajo': huella, 'hiperparametros': trabajo.hiperparametros},
+        # El objeto Prophet se conserva para validar el evaluador NumPy (validacion_prophet_numpy.py)
+        objeto=trabajo.familia == 'prophet',
+    )
+    return {'nombre': trabajo.nombre, 'estado': 'entrenado', 'version': version,
+            'metricas': {'rmse': rmse}, 'segundos': time.perf_counter() - inicio}
+
+
+def trabajos_sitios(capitales=None, inclinaciones=None, orientaciones=None, raiz_datos=None):
+    # Un trabajo por (capital, inclinación, orientación) presente en el año típico
+    combinaciones = leer('anio_tipico', columnas=['capital', 'slope', 'azimuth'], raiz=raiz_datos).drop_duplicates()
+    trabajos = []
+    for capital, slope, azimuth in combinaciones.sort_values(['capital', 'slope', 'azimuth']).itertuples(index=False):
+        if capital not in CAPITALES or (capitales and capital not in capitales):
+            continue
+        if (inclinaciones and slope not in inclinaciones) or (orientaciones and azimuth not in orientaciones):
+            continue
+        latitud, longitud = CAPITALES[capital]
+        trabajos.append(Trabajo(
+            nombre_modelo_sitio(capital, slope, azimuth), 'sarimax', 'sitio',
+            {'capital': capital, 'slope': int(slope), 'azimuth': int(azimuth)},
+            SARIMAX_IRRADIACION,
+            {'capital': capital, 'slope': int(slope), 'azimuth': int(azimuth), 'latitud': latitud, 'longitud': longitud},
+        ))
+    return trabajos
+
+
+# Modelos generales de la API
+TRABAJOS_GENERALES = {
+    'irradiacion': Trabajo('irradiacion', 'sarimax', 'serie_irradiacion', {}, SARIMAX_IRRADIACION),
+    'precio_energia': Trabajo('precio_energia', 'prophet', 'precio', {'conjunto': 'precio_spot'}, PROPHET),
+    'tarifa_pvpc': Trabajo('tarifa_pvpc', 'prophet', 'precio', {'conjunto': 'precio_pvpc'}, PROPHET),
+    'perfil_consumo': Trabajo('perfil_consumo', 'prophet', 'perfil', {}, PROPHET),
+}
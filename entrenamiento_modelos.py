@@ -0,0 +1,83 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from almacen_datos import RAIZ_DATOS
+from entrenamiento import TRABAJOS_GENERALES, ejecutar, silenciar_registros, trabajos_sitios
+
+# Entrenamiento de todos los modelos de la API en un pool de procesos, sin gráficos ni ventanas:
+#   python entrenamiento_modelos.py                                  (todo lo que haya cambiado)
+#   python entrenamiento_modelos.py --objetivos sitios --capitales Albacete Madrid --trabajadores 8
+#   python entrenamiento_modelos.py --objetivos precio_energia --forzar
+# Cada trabajo se omite si sus datos e hiperparámetros coinciden con los de la última versión guardada.
+# Tras entrenar hay que llamar a POST /recargar para que la API use los modelos nuevos
+OBJETIVOS = [*TRABAJOS_GENERALES, 'sitios']
+
+parser = argparse.ArgumentParser(description="Entrena en paralelo los modelos de la API")
+parser.add_argument('--modelos', default=os.environ.get('MODELOS_PATH', 'modelos'), help="Almacén de modelos")
+parser.add_argument('--datos', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--objetivos', nargs='+', choices=OBJETIVOS, default=OBJETIVOS, help="Modelos a entrenar")
+parser.add_argument('--capitales', nargs='*', help="Solo estas capitales (modelos por ubicación)")
+parser.add_argument('--inclinaciones', type=int, nargs='*', help="Solo estas inclinaciones (modelos por ubicación)")
+parser.add_argument('--orientaciones', type=int, nargs='*', help="Solo estas orientaciones (modelos por ubicación)")
+parser.add_argument('--trabajadores', type=int, default=os.cpu_count(), help="Procesos de entrenamiento")
+parser.add_argument('--forzar', action='store_true', help="Reentrenar aunque no haya cambios")
+parser.add_argument('--listar', action='store_true', help="Mostrar los trabajos sin ejecutarlos")
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    silenciar_registros()
+
+    trabajos = [TRABAJOS_GENERALES[objetivo] for objetivo in args.objetivos if objetivo in TRABAJOS_GENERALES]
+    if 'sitios' in args.objetivos:
+        trabajos += trabajos_sitios(args.capitales, args.inclinaciones, args.orientaciones, raiz_datos=args.datos)
+
+    if args.listar:
+        for trabajo in trabajos:
+            print(f"{trabajo.nombre:<45} {trabajo.familia:<8} {trabajo.datos}")
+        raise SystemExit
+
+    # Un hilo de BLAS por proceso: con varios procesos, los hilos internos de NumPy solo compiten entre
+    # sí y el entrenamiento deja de escalar con los núcleos. Los procesos nuevos heredan estas variables
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, '1')
+
+    inicio = time.perf_counter()
+    resultados, errores = [], []
+    with ProcessPoolExecutor(max_workers=args.trabajadores, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=silenciar_registros) as executor:
+        futuros = {executor.submit(ejecutar, trabajo, args.modelos, args.datos, args.forzar): trabajo for trabajo in trabajos}
+        for futuro in as_completed(futuros):
+            trabajo = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                logging.error("%s: %s: %s", trabajo.nombre, type(e).__name__, e)
+                errores.append((trabajo.nombre, str(e)))
+                continue
+            resultados.append(resultado)
+            rmse = resultado['metricas'].get('rmse', float('nan'))
+            logging.info("[%d/%d] %s %s %s (RMSE %.4g, %.1f s)", len(resultados) + len(errores), len(trabajos),
+                         resultado['nombre'], resultado['estado'], resultado['version'], rmse, resultado['segundos'])
+
+    entrenados = [r for r in resultados if r['estado'] == 'entrenado']
+    print(f"Trabajos: {len(trabajos)}, entrenados: {len(entrenados)}, sin cambios: {len(resultados) - len(entrenados)}, "
+          f"con error: {len(errores)} ({time.perf_counter() - inicio:.1f} s con {args.trabajadores} procesos)")
+    for nombre, error in errores:
+        print(f"  {nombre}: {error}")
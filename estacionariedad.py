@@ -0,0 +1,209 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import json
+import logging
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from almacen_datos import leer
+from almacen_modelos import huella_datos
+from ajuste_sarimax import autocorrelacion, periodo_estacional
+import preprocesado
+
+logger = logging.getLogger(__name__)
+
+# Diagnóstico de estacionariedad de las series del proyecto: pruebas ADF (hipótesis nula: raíz
+# unitaria) y KPSS (hipótesis nula: estacionaria) de la serie y de su primera diferencia, periodo
+# estacional, fuerza de la estacionalidad y retardos con mayor autocorrelación (ACF) y autocorrelación
+# parcial (PACF). Cada serie se analiza de forma independiente (en un proceso del pool de
+# analisis_estacionariedad.py) y su resultado se guarda en la caché de preprocesado.py identificado por
+# la huella de sus valores: solo se vuelven a analizar las series que cambian
+
+# Cambiar VERSION al modificar las pruebas invalida los resultados guardados
+VERSION = 1
+NIVEL = 0.05
+RETARDOS_ACF = 200
+RETARDOS_PACF = 48
+PICOS = 3
+
+COLUMNAS = [
+    'serie', 'conjunto', 'variable', 'observaciones', 'adf_estadistico', 'adf_p', 'adf_retardos', 'kpss_estadistico',
+    'kpss_p', 'estacionaria', 'adf_p_diferencia', 'kpss_p_diferencia', 'estacionaria_diferencia', 'periodo',
+    'fuerza_estacional', 'picos_acf', 'picos_pacf',
+]
+
+
+def _sin_huecos(valores):
+    # Los NaN interiores se interpolan linealmente y los de los extremos se descartan
+    valores = np.asarray(valores, dtype=float)
+    conocidos = np.flatnonzero(~np.isnan(valores))
+    if len(conocidos) == 0:
+        return valores[:0]
+    valores = valores[conocidos[0]:conocidos[-1] + 1]
+    huecos = np.isnan(valores)
+    if huecos.any():
+        posiciones = np.arange(len(valores))
+        valores[huecos] = np.interp(posiciones[huecos], posiciones[~huecos], valores[~huecos])
+    return valores
+
+
+def pruebas(valores):
+    # ADF con el número de retardos elegido por AIC (como en los scripts analisis_*.py) y KPSS con
+    # constante. El p-valor de KPSS está acotado a [0.01, 0.1] por su tabla (se omiten ese aviso y el
+    # del cambio anunciado en el tipo de resultado)
+    from statsmodels.tools.sm_exceptions import InterpolationWarning
+    from statsmodels.tsa.stattools import adfuller, kpss
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', InterpolationWarning)
+        warnings.simplefilter('ignore', FutureWarning)
+        adf = adfuller(valores, autolag='AIC')
+        estadistico_kpss, p_kpss = kpss(valores, regression='c', nlags='auto')[:2]
+    return {
+        'adf_estadistico': float(adf[0]), 'adf_p': float(adf[1]), 'adf_retardos': int(adf[2]),
+        'kpss_estadistico': float(estadistico_kpss), 'kpss_p': float(p_kpss),
+        # Estacionaria si ADF rechaza la raíz unitaria y KPSS no rechaza la estacionariedad
+        'estacionaria': bool(adf[1] <= NIVEL and p_kpss > NIVEL),
+    }
+
+
+def fuerza_estacional(valores, periodo):
+    # Fuerza de la estacionalidad (0 a 1): 1 - Var(resto) / Var(estacional + resto) con una
+    # descomposición aditiva clásica (tendencia por media móvil centrada de un periodo)
+    valores = np.asarray(valores, dtype=float)
+    if periodo % 2:
+        pesos = np.full(periodo, 1 / periodo)
+    else:
+        pesos = np.r_[0.5, np.ones(periodo - 1), 0.5] / periodo
+    mitad = len(pesos) // 2
+    tendencia = np.full(len(valores), np.nan)
+    tendencia[mitad:len(valores) - mitad] = np.convolve(valores, pesos, mode='valid')
+    sin_tendencia = valores - tendencia
+    fases = np.arange(len(valores)) % periodo
+    validos = ~np.isnan(sin_tendencia)
+    medias = np.bincount(fases[validos], weights=sin_tendencia[validos], minlength=periodo) / np.bincount(fases[validos], minlength=periodo)
+    estacional = medias[fases] - medias.mean()
+    resto = sin_tendencia - estacional
+    return float(max(0., 1 - np.nanvar(resto) / np.nanvar(estacional + resto)))
+
+
+def picos_acf(valores, retardos=RETARDOS_ACF, picos=PICOS):
+    # Retardos de los máximos locales significativos de la ACF, de mayor a menor autocorrelación
+    acf = autocorrelacion(valores, np.arange(retardos + 2))
+    maximos = np.flatnonzero((acf[1:-1] > acf[:-2]) & (acf[1:-1] >= acf[2:])) + 1
+    maximos = maximos[acf[maximos] > 1.96 / np.sqrt(len(valores))]
+    return [int(retardo) for retardo in maximos[np.argsort(-acf[maximos])][:picos]]
+
+
+def picos_pacf(valores, retardos=RETARDOS_PACF, picos=PICOS):
+    # Retardos con mayor autocorrelación parcial significativa (en valor absoluto)
+    from statsmodels.tsa.stattools import pacf
+
+    parcial = np.abs(pacf(valores, nlags=retardos, method='ywm')[1:])
+    significativos = np.flatnonzero(parcial > 1.96 / np.sqrt(len(valores)))
+    return [int(retardo) + 1 for retardo in significativos[np.argsort(-parcial[significativos])][:picos]]
+
+
+def diagnostico(valores):
+    # Diagnóstico completo de una serie horaria (array o Series; los huecos se interpolan)
+    valores = _sin_huecos(valores)
+    # La diferencia se calcula sobre el array, sin copiar la tabla de datos
+    diferencia = np.diff(valores)
+    de_diferencia = pruebas(diferencia)
+    periodo = periodo_estacional(valores)
+    return {
+        'observaciones': len(valores),
+        **pruebas(valores),
+        'adf_p_diferencia': de_diferencia['adf_p'],
+        'kpss_p_diferencia': de_diferencia['kpss_p'],
+        'estacionaria_diferencia': de_diferencia['estacionaria'],
+        'periodo': periodo,
+        'fuerza_estacional': fuerza_estacional(valores, periodo),
+        'picos_acf': picos_acf(valores),
+        'picos_pacf': picos_pacf(valores),
+    }
+
+
+def series(raiz=None, capitales=None):
+    # Series a analizar: (nombre, conjunto, argumentos del cargador). Todas las ubicaciones del año
+    # típico, la serie de irradiación, los dos precios y el perfil de consumo. Si aún no se ha generado
+    # el año típico (preparacion_union_datos.py) se analizan solo las demás
+    resultado = []
+    try:
+        combinaciones = leer('anio_tipico', columnas=['capital', 'slope', 'azimuth'], raiz=raiz).drop_duplicates()
+    except FileNotFoundError as e:
+        logger.warning("Se omiten las series por ubicación: %s", e)
+        combinaciones = pd.DataFrame(columns=['capital', 'slope', 'azimuth'])
+    for capital, slope, azimuth in combinaciones.sort_values(['capital', 'slope', 'azimuth']).itertuples(index=False):
+        if capitales and capital not in capitales:
+            continue
+        resultado.append((f'{capital} {slope}/{azimuth}', 'anio_tipico',
+                          {'capital': str(capital), 'slope': int(slope), 'azimuth': int(azimuth)}))
+    resultado += [
+        ('serie_irradiacion', 'serie_irradiacion', {}),
+        ('precio_spot', 'precio_spot', {}),
+        ('precio_pvpc', 'precio_pvpc', {}),
+        ('perfil', 'perfil', {}),
+    ]
+    return resultado
+
+
+def cargar(conjunto, argumentos, raiz=None):
+    # Variables de la serie: DataFrame horario con una columna por variable
+    if conjunto == 'anio_tipico':
+        return preprocesado.serie_sitio(**argumentos, raiz=raiz)
+    if conjunto == 'serie_irradiacion':
+        return preprocesado.serie_irradiacion(raiz)
+    if conjunto in ('precio_spot', 'precio_pvpc'):
+        return preprocesado.serie_precio_horaria(conjunto, raiz).to_frame('value')
+    if conjunto == 'perfil':
+        return preprocesado.serie_perfil(raiz=raiz).set_index('ds').rename(columns={'y': 'COEF. PERFIL A'})
+    raise KeyError(f"Conjunto desconocido: {conjunto}")
+
+
+def analizar(nombre, conjunto, argumentos, raiz=None, forzar=False):
+    # Filas del resumen (una por variable) de una serie, leídas de la caché si sus valores no han cambiado
+    directorio = os.path.join(preprocesado.directorio_cache(raiz), 'estacionariedad')
+    filas = []
+    for variable, valores in cargar(conjunto, argumentos, raiz).items():
+        ruta = os.path.join(directorio, f'{VERSION}-{huella_datos(valores)}.json')
+        if os.path.exists(ruta) and not forzar:
+            with open(ruta) as f:
+                resultado = json.load(f)
+        else:
+            resultado = diagnostico(valores)
+            os.makedirs(directorio, exist_ok=True)
+            temporal = f'{ruta}.{os.getpid()}.tmp'
+            with open(temporal, 'w') as f:
+                json.dump(resultado, f)
+            os.replace(temporal, ruta)
+        filas.append({'serie': nombre, 'conjunto': conjunto, 'variable': variable, **resultado})
+    return filas
+
+
+def resumen(filas):
+    # Tabla de resultados con los retardos de los picos como texto ("24, 48, 168")
+    tabla = pd.DataFrame(filas, columns=COLUMNAS)
+    for columna in ('picos_acf', 'picos_pacf'):
+        tabla[columna] = tabla[columna].map(lambda retardos: ', '.join(map(str, retardos)))
+    return tabla
+
+
+def tabla_series(columnas):
+    # Diagnóstico en serie de unas pocas series ({nombre: valores}), para los scripts de análisis
+    filas = [{'serie': nombre, **diagnostico(valores)} for nombre, valores in columnas.items()]
+    return resumen(filas).drop(columns=['conjunto', 'variable'])
@@ -0,0 +1,39 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import os
+import pickle
+
+from prophet_numpy import ProphetNumpy
+
+# Exporta los modelos Prophet entrenados (pickle) a un .npz con sus componentes, junto a cada pickle.
+# La API carga el .npz cuando existe y calcula yhat con NumPy en lugar de Prophet.predict
+parser = argparse.ArgumentParser(description="Exporta modelos Prophet a un formato evaluable con NumPy")
+parser.add_argument('modelos', nargs='*', default=['price_model.pkl', 'pvpc_model.pkl', 'profile_model.pkl'],
+                    help="Pickles de los modelos Prophet")
+parser.add_argument('--directorio', default=os.environ.get('MODELOS_PATH', 'pkl'),
+                    help="Directorio de los modelos (para rutas relativas)")
+args = parser.parse_args()
+
+for archivo in args.modelos:
+    origen = os.path.join(args.directorio, archivo)
+    destino = os.path.splitext(origen)[0] + '.npz'
+    with open(origen, 'rb') as f:
+        modelo = pickle.load(f)
+
+    exportado = ProphetNumpy.desde_prophet(modelo)
+    # Escritura atómica para que la API nunca lea un archivo a medias
+    temporal = destino + '.tmp.npz'
+    exportado.guardar(temporal)
+    os.replace(temporal, destino)
+    print(f"{origen} -> {destino} ({os.path.getsize(destino) / 1024:.1f} KB)")
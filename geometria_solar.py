@@ -0,0 +1,159 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import numpy as np
+import pandas as pd
+
+# Posición del sol, ángulo de incidencia sobre un panel e irradiancia de cielo despejado, vectorizados
+# para arrays de instantes y ubicaciones (se combinan con las reglas de broadcasting de NumPy). Se usan
+# las aproximaciones de la NOAA (ecuación del tiempo y declinación en serie de Fourier del año), con
+# errores de pocas décimas de grado, y el modelo de cielo despejado de Meinel para la irradiancia.
+#
+# Los ángulos se expresan en grados y las horas en UTC. La orientación del panel y el azimut del sol se
+# miden desde el norte en sentido horario, como la orientación de la API y la columna azimuth de los
+# datos: 0 = norte, 90 = este, 180 = sur, 270 = oeste.
+
+# Constante solar (W/m²), reflectividad del suelo y fracción difusa de la irradiancia directa con
+# cielo despejado
+CONSTANTE_SOLAR = 1361.
+ALBEDO = 0.2
+FRACCION_DIFUSA = 0.1
+
+# Altura del sol en el orto y el ocaso: el borde superior del disco, corregido por la refracción
+ELEVACION_ORTO = -0.833
+
+
+def _instantes_utc(instantes):
+    # Los instantes sin zona horaria se interpretan como UTC (las series de PVGIS están en UTC)
+    instantes = pd.DatetimeIndex(instantes)
+    return instantes.tz_convert('UTC').tz_localize(None) if instantes.tz is not None else instantes
+
+
+def _efemerides(instantes):
+    # Hora UTC (decimal), día del año, ecuación del tiempo (minutos) y declinación (radianes)
+    horas = (instantes.hour + instantes.minute / 60 + instantes.second / 3600).to_numpy(dtype=float)
+    dias = instantes.dayofyear.to_numpy(dtype=float)
+    dias_anio = np.where(instantes.is_leap_year, 366., 365.)
+    g = 2 * np.pi / dias_anio * (dias - 1 + (horas - 12) / 24)
+    ecuacion_tiempo = 229.18 * (0.000075 + 0.001868 * np.cos(g) - 0.032077 * np.sin(g)
+                                - 0.014615 * np.cos(2 * g) - 0.040849 * np.sin(2 * g))
+    declinacion = (0.006918 - 0.399912 * np.cos(g) + 0.070257 * np.sin(g) - 0.006758 * np.cos(2 * g)
+                   + 0.000907 * np.sin(2 * g) - 0.002697 * np.cos(3 * g) + 0.00148 * np.sin(3 * g))
+    return horas, dias, ecuacion_tiempo, declinacion
+
+
+def posicion_solar(instantes, latitud, longitud):
+    # Devuelve (elevación, azimut) del sol en cada instante y ubicación
+    horas, _, ecuacion_tiempo, declinacion = _efemerides(_instantes_utc(instantes))
+
+    # Ángulo horario a partir de la hora solar verdadera
+    hora_solar = horas * 60 + ecuacion_tiempo + 4 * np.asarray(longitud, dtype=float)
+    angulo_horario = np.radians(hora_solar / 4 - 180)
+
+    fi = np.radians(np.asarray(latitud, dtype=float))
+    seno_elevacion = np.sin(fi) * np.sin(declinacion) + np.cos(fi) * np.cos(declinacion) * np.cos(angulo_horario)
+    elevacion = np.degrees(np.arcsin(np.clip(seno_elevacion, -1, 1)))
+    # Azimut medido desde el sur hacia el oeste, que se pasa a medirlo desde el norte
+    azimut = np.degrees(np.arctan2(np.sin(angulo_horario),
+                                   np.cos(angulo_horario) * np.sin(fi) - np.tan(declinacion) * np.cos(fi)))
+    return elevacion, (azimut + 180) % 360
+
+
+def coseno_incidencia(elevacion, azimut, inclinacion, orientacion):
+    # Coseno del ángulo entre el sol y la normal del panel (negativo si el sol queda por detrás)
+    cenit = np.radians(90 - np.asarray(elevacion, dtype=float))
+    beta = np.radians(np.asarray(inclinacion, dtype=float))
+    diferencia = np.radians(np.asarray(azimut, dtype=float) - np.asarray(orientacion, dtype=float))
+    return np.cos(cenit) * np.cos(beta) + np.sin(cenit) * np.sin(beta) * np.cos(diferencia)
+
+
+def orto_ocaso(fechas, latitud, longitud):
+    # Horas UTC (decimales, respecto a las 0 h de cada fecha) de la salida y la puesta del sol. En días
+    # sin noche el orto es 0 y el ocaso 24; en días sin sol ambos son 12
+    fechas = _instantes_utc(fechas).normalize() + pd.Timedelta(hours=12)
+    _, _, ecuacion_tiempo, declinacion = _efemerides(fechas)
+    fi = np.radians(np.asarray(latitud, dtype=float))
+    coseno = (np.sin(np.radians(ELEVACION_ORTO)) - np.sin(fi) * np.sin(declinacion)) / (np.cos(fi) * np.cos(declinacion))
+    semiarco = np.degrees(np.arccos(np.clip(coseno, -1, 1)))
+    mediodia = (720 - 4 * np.asarray(longitud, dtype=float) - ecuacion_tiempo) / 60
+    return np.clip(mediodia - semiarco / 15, 0, 24), np.clip(mediodia + semiarco / 15, 0, 24)
+
+
+def horas_diurnas(instantes, latitud, longitud):
+    # True en las horas (las que empiezan en cada instante) con el sol sobre el horizonte en algún momento
+    instantes = _instantes_utc(instantes)
+    orto, ocaso = orto_ocaso(instantes, latitud, longitud)
+    horas = instantes.hour.to_numpy()
+    return (orto < horas + 1) & (ocaso > horas)
+
+
+def irradiancia_cielo_despejado(elevacion, azimut, dia_anio, inclinacion, orientacion, albedo=ALBEDO):
+    # Irradiancia (W/m²) sobre el plano del panel con cielo despejado: directa de Meinel con la masa de
+    # aire de Kasten y Young, difusa isótropa proporcional a la directa y reflejada por el suelo
+    elevacion = np.asarray(elevacion, dtype=float)
+    sobre_horizonte = elevacion > 0
+    cenit = 90 - np.where(sobre_horizonte, elevacion, 0)
+    masa_aire = 1 / (np.cos(np.radians(cenit)) + 0.50572 * (96.07995 - cenit) ** -1.6364)
+    extraterrestre = CONSTANTE_SOLAR * (1 + 0.033 * np.cos(2 * np.pi * np.asarray(dia_anio, dtype=float) / 365))
+    directa = np.where(sobre_horizonte, extraterrestre * 0.7 ** (masa_aire ** 0.678), 0)
+    difusa = FRACCION_DIFUSA * directa
+    horizontal = directa * np.cos(np.radians(cenit)) + difusa
+    beta = np.radians(np.asarray(inclinacion, dtype=float))
+    incidencia = np.maximum(coseno_incidencia(elevacion, azimut, inclinacion, orientacion), 0)
+    return directa * incidencia + difusa * (1 + np.cos(beta)) / 2 + albedo * horizontal * (1 - np.cos(beta)) / 2
+
+
+class TablaSolar:
+    # Posición del sol precalculada por ubicación, día del año (calendario bisiesto) y media hora, y
+    # horas de orto y ocaso por ubicación y día. Cada valor horario corresponde a la hora que empieza en
+    # h: es diurna si el sol está sobre el horizonte en algún momento de [h, h + 1) y su irradiancia de
+    # cielo despejado es la mayor de h, h + 0.5 y h + 1, de modo que sirve de cota superior
+    PASOS_HORA = 2
+
+    def __init__(self, ubicaciones, anio=2024):
+        # ubicaciones: {nombre: (latitud, longitud)}
+        self.indices = {nombre: posicion for posicion, nombre in enumerate(ubicaciones)}
+        coordenadas = np.array(list(ubicaciones.values()), dtype=float).reshape(-1, 2)
+        dias = pd.date_range(f'{anio}-01-01', f'{anio}-12-31', freq='D')
+        instantes = pd.date_range(dias[0], periods=len(dias) * 24 * self.PASOS_HORA + 1, freq=f'{60 // self.PASOS_HORA}min')
+
+        latitud, longitud = coordenadas[:, :1], coordenadas[:, 1:]
+        elevacion, azimut = posicion_solar(instantes, latitud, longitud)
+        # float32: la tabla de todas las capitales ocupa unos pocos MB por proceso
+        self.elevacion = elevacion.astype(np.float32)
+        self.azimut = azimut.astype(np.float32)
+        self.dia_anio = instantes.dayofyear.to_numpy()
+        self.orto, self.ocaso = (valores.astype(np.float32) for valores in orto_ocaso(dias, latitud, longitud))
+
+    def _posiciones(self, instantes):
+        # Día del año en el calendario bisiesto (el 29 de febrero es el día 60) y hora de cada instante
+        instantes = _instantes_utc(instantes)
+        dias = instantes.dayofyear.to_numpy() - 1
+        dias = dias + ((~instantes.is_leap_year) & (instantes.month > 2))
+        return dias, instantes.hour.to_numpy()
+
+    def horas_diurnas(self, ubicacion, instantes):
+        # True en las horas con el sol sobre el horizonte en algún momento
+        fila = self.indices[ubicacion]
+        dias, horas = self._posiciones(instantes)
+        return (self.orto[fila, dias] < horas + 1) & (self.ocaso[fila, dias] > horas)
+
+    def cielo_despejado(self, ubicacion, inclinacion, orientacion, instantes, albedo=ALBEDO):
+        # Cota de la irradiancia de cielo despejado (W/m²) sobre el panel en cada hora
+        fila = self.indices[ubicacion]
+        dias, horas = self._posiciones(instantes)
+        inicio = (dias * 24 + horas) * self.PASOS_HORA
+        pasos = inicio[:, None] + np.arange(self.PASOS_HORA + 1)
+        return irradiancia_cielo_despejado(
+            self.elevacion[fila, pasos], self.azimut[fila, pasos], self.dia_anio[pasos], inclinacion, orientacion, albedo,
+        ).max(axis=1)
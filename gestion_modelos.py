@@ -0,0 +1,122 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import json
+import os
+import pickle
+
+import joblib
+import pandas as pd
+
+import ajuste_sarimax
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+
+# Gestión del almacén de modelos desde la línea de comandos:
+#   python gestion_modelos.py listar
+#   python gestion_modelos.py mostrar precio_energia [--version V]
+#   python gestion_modelos.py fijar precio_energia V      (la API usa V aunque se entrenen versiones nuevas)
+#   python gestion_modelos.py revertir precio_energia     (vuelve a la versión anterior y la fija)
+#   python gestion_modelos.py liberar precio_energia      (vuelve a la última versión)
+#   python gestion_modelos.py importar irradiacion irradiation_model.pkl
+#   python gestion_modelos.py extender irradiacion observaciones.csv  (SARIMAX: añade datos sin reentrenar)
+# Tras cambiar la versión actual hay que llamar a POST /recargar para que la API la use
+parser = argparse.ArgumentParser(description="Gestión del almacén versionado de modelos")
+parser.add_argument('--almacen', default=os.environ.get('MODELOS_PATH', 'modelos'), help="Directorio del almacén")
+ordenes = parser.add_subparsers(dest='orden', required=True)
+ordenes.add_parser('listar', help="Modelos, versiones y versión actual")
+mostrar = ordenes.add_parser('mostrar', help="Metadatos de una versión")
+mostrar.add_argument('nombre')
+mostrar.add_argument('--version')
+fijar = ordenes.add_parser('fijar', help="Fija la versión que usa la API")
+fijar.add_argument('nombre')
+fijar.add_argument('version')
+revertir = ordenes.add_parser('revertir', help="Vuelve a la versión anterior")
+revertir.add_argument('nombre')
+liberar = ordenes.add_parser('liberar', help="Quita la fijación y usa la última versión")
+liberar.add_argument('nombre')
+importar = ordenes.add_parser('importar', help="Importa un modelo guardado con pickle o joblib")
+importar.add_argument('nombre')
+importar.add_argument('archivo')
+extender = ordenes.add_parser('extender', help="Añade observaciones nuevas a un SARIMAX sin reentrenar")
+extender.add_argument('nombre')
+extender.add_argument('archivo', help="CSV con la columna datetime, la serie y, si las tiene el modelo, sus exógenas")
+extender.add_argument('--columna', default='G(i)', help="Columna de la serie")
+args = parser.parse_args()
+
+almacen = AlmacenModelos(args.almacen)
+
+if args.orden == 'listar':
+    for nombre in almacen.nombres():
+        actual = almacen.version_actual(nombre)
+        estado = " (fijada)" if almacen.fijada(nombre) else ""
+        print(f"{nombre}{estado}")
+        for version in almacen.versiones(nombre):
+            metadatos = almacen.metadatos(nombre, version)
+            marca = '*' if version == actual else ' '
+            metricas = ', '.join(f"{clave}={valor:.4g}" for clave, valor in metadatos['metricas'].items())
+            print(f"  {marca} {version}  {metadatos['tipo']:<8} {metricas}")
+
+elif args.orden == 'mostrar':
+    print(json.dumps(almacen.metadatos(args.nombre, args.version), indent=2, ensure_ascii=False))
+
+elif args.orden == 'fijar':
+    almacen.fijar(args.nombre, args.version)
+    print(f"{args.nombre}: fijada la versión {args.version}")
+
+elif args.orden == 'revertir':
+    print(f"{args.nombre}: revertido a la versión {almacen.revertir(args.nombre)}")
+
+elif args.orden == 'liberar':
+    almacen.liberar(args.nombre)
+    print(f"{args.nombre}: versión actual {almacen.version_actual(args.nombre)}")
+
+elif args.orden == 'importar':
+    # Migración de los artefactos antiguos: se detecta la familia del modelo por su clase
+    try:
+        modelo = joblib.load(args.archivo)
+    except Exception:
+        with open(args.archivo, 'rb') as f:
+            modelo = pickle.load(f)
+
+    if type(modelo).__name__ == 'Prophet':
+        tipo, historia = 'prophet', modelo.history
+        rango, huella = rango_entrenamiento(historia['ds']), huella_datos(historia[['ds', 'y']])
+    elif hasattr(modelo, 'model') and type(modelo.model).__name__ == 'SARIMAX':
+        tipo = 'sarimax'
+        rango = rango_entrenamiento(modelo.model.data.row_labels)
+        huella = huella_datos(modelo.model.data.orig_endog)
+    else:
+        tipo, rango, huella = 'pickle', None, None
+
+    version = almacen.guardar(args.nombre, modelo, tipo, rango=rango, huella=huella)
+    print(f"{args.archivo} -> {args.nombre} {version} ({tipo})")
+
+elif args.orden == 'extender':
+    # Nueva versión con las mismas estimaciones y el filtro extendido hasta la última observación
+    modelo, metadatos = almacen.cargar(args.nombre, completo=True)
+    if metadatos['tipo'] != 'sarimax':
+        parser.error(f"{args.nombre} es de tipo {metadatos['tipo']}: solo se pueden extender los modelos SARIMAX")
+    datos = pd.read_csv(args.archivo, parse_dates=['datetime']).set_index('datetime').sort_index()
+    nombres_exog = metadatos['parametros'].get('nombres_exog')
+    extendido = ajuste_sarimax.extender(modelo, datos[args.columna], exog=datos[nombres_exog] if nombres_exog else None)
+    if extendido is modelo:
+        print(f"{args.nombre}: no hay observaciones posteriores a {modelo.model.data.row_labels[-1]}")
+    else:
+        version = almacen.guardar(
+            args.nombre, extendido, 'sarimax',
+            rango=rango_entrenamiento(extendido.model.data.row_labels),
+            metricas=metadatos['metricas'],
+            huella=huella_datos(extendido.model.data.orig_endog),
+            etiquetas={**metadatos['etiquetas'], 'extendido_desde': metadatos['version']},
+        )
+        print(f"{args.nombre}: {version} (extendido desde {metadatos['version']})")
@@ -0,0 +1,185 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from geometria_solar import coseno_incidencia, posicion_solar
+from sitios import CAPITALES
+
+# Modelos de gradient boosting (HistGradientBoostingRegressor de scikit-learn) para la irradiación y los
+# precios. A diferencia de SARIMAX y Prophet no modelan una serie concreta sino la relación entre unas
+# características y el valor de cada hora:
+#   - irradiación: calendario, posición del sol e incidencia sobre el panel (calculadas a partir de la
+#     latitud, la longitud, la inclinación y la orientación) y la temperatura T2m. Un único modelo se
+#     entrena con todas las ubicaciones a la vez y predice cualquier combinación de sitios y horas en
+#     una sola llamada
+#   - precios: calendario en hora local y precios pasados con al menos 24 horas de antelación, de modo
+#     que el día siguiente completo se predice con datos conocidos (más allá, de forma recursiva)
+
+# Zona horaria de los precios de REE, en la que se calculan sus características de calendario
+ZONA = 'Europe/Madrid'
+
+HIPERPARAMETROS = {
+    'max_iter': 300,
+    'learning_rate': 0.1,
+    'max_leaf_nodes': 63,
+    'min_samples_leaf': 40,
+    'early_stopping': False,
+    'random_state': 0,
+}
+
+CARACTERISTICAS_IRRADIACION = [
+    'hora', 'dia_seno', 'dia_coseno', 'elevacion', 'azimut_solar', 'incidencia',
+    'latitud', 'longitud', 'inclinacion', 'orientacion', 'T2m',
+]
+
+# Retardos de los precios (horas); el menor es el horizonte que se predice de una vez
+RETARDOS_PRECIO = (24, 48, 72, 168)
+CARACTERISTICAS_PRECIO = (['hora', 'dia_semana', 'mes', 'dia_seno', 'dia_coseno']
+                          + [f'precio_{retardo}h' for retardo in RETARDOS_PRECIO] + ['media_dia_anterior'])
+
+
+def ajustar(X, y, **hiperparametros):
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    return HistGradientBoostingRegressor(**{**HIPERPARAMETROS, **hiperparametros}).fit(X, y)
+
+
+def _dia_anio(instantes):
+    angulo = 2 * np.pi * (instantes.dayofyear.to_numpy() - 1) / 366
+    return np.sin(angulo), np.cos(angulo)
+
+
+def caracteristicas_irradiacion(instantes, latitud, longitud, inclinacion, orientacion, temperatura=np.nan):
+    # Una fila por instante (UTC si no tienen zona). La ubicación, la inclinación, la orientación y la
+    # temperatura pueden ser escalares o arrays de la misma longitud que instantes
+    instantes = pd.DatetimeIndex(instantes)
+    if instantes.tz is not None:
+        instantes = instantes.tz_convert('UTC').tz_localize(None)
+    n = len(instantes)
+    latitud, longitud, inclinacion, orientacion, temperatura = (
+        np.broadcast_to(np.asarray(valor, dtype=float), n)
+        for valor in (latitud, longitud, inclinacion, orientacion, temperatura)
+    )
+    elevacion, azimut = posicion_solar(instantes, latitud, longitud)
+    dia_seno, dia_coseno = _dia_anio(instantes)
+    return pd.DataFrame({
+        'hora': instantes.hour.to_numpy(),
+        'dia_seno': dia_seno,
+        'dia_coseno': dia_coseno,
+        'elevacion': elevacion,
+        'azimut_solar': azimut,
+        'incidencia': coseno_incidencia(elevacion, azimut, inclinacion, orientacion),
+        'latitud': latitud,
+        'longitud': longitud,
+        'inclinacion': inclinacion,
+        # Las orientaciones se pasan a [0, 360) para que 360 y 0 sean el mismo valor
+        'orientacion': orientacion % 360,
+        'T2m': temperatura,
+    }, columns=CARACTERISTICAS_IRRADIACION)
+
+
+def tabla_anio_tipico(anio_tipico, anio=2024):
+    # Características y objetivo de un año típico con varias ubicaciones (columnas capital, slope,
+    # azimuth, day, hour, G(i) y T2m). Se sitúa en un año bisiesto para conservar el 29 de febrero.
+    # Devuelve (X, y, instantes)
+    instantes = pd.DatetimeIndex(pd.to_datetime(
+        (anio_tipico['day'].astype('int64') - 1) * 24 + anio_tipico['hour'].astype('int64'),
+        unit='h', origin=f'{anio}-01-01'))
+    capitales = anio_tipico['capital'].astype(str)
+    latitud = capitales.map(lambda capital: CAPITALES[capital][0]).to_numpy(dtype=float)
+    longitud = capitales.map(lambda capital: CAPITALES[capital][1]).to_numpy(dtype=float)
+    X = caracteristicas_irradiacion(instantes, latitud, longitud, anio_tipico['slope'].to_numpy(dtype=float),
+                                    anio_tipico['azimuth'].to_numpy(dtype=float), anio_tipico['T2m'].to_numpy(dtype=float))
+    return X, anio_tipico['G(i)'].to_numpy(dtype=float), instantes
+
+
+def predecir_irradiacion(modelo, sitios, instantes, temperatura=None):
+    # Irradiación de cada sitio (latitud, longitud, inclinación, orientación) en cada instante con una
+    # única llamada al modelo. temperatura: None o array (sitios x instantes). Devuelve (sitios x instantes)
+    sitios = np.asarray(sitios, dtype=float).reshape(-1, 4)
+    instantes = pd.DatetimeIndex(instantes)
+    n_sitios, n_instantes = len(sitios), len(instantes)
+    if temperatura is None:
+        temperatura = np.nan
+    temperatura = np.broadcast_to(np.asarray(temperatura, dtype=float), (n_sitios, n_instantes)).ravel()
+    X = caracteristicas_irradiacion(
+        instantes[np.tile(np.arange(n_instantes), n_sitios)],
+        *(np.repeat(sitios[:, columna], n_instantes) for columna in range(4)),
+        temperatura,
+    )
+    return np.maximum(modelo.predict(X), 0).reshape(n_sitios, n_instantes)
+
+
+def _rejilla_horaria(serie):
+    # Serie horaria regular en UTC (las horas que falten quedan como NaN)
+    indice = pd.DatetimeIndex(serie.index)
+    indice = indice.tz_convert('UTC') if indice.tz is not None else indice.tz_localize(ZONA).tz_convert('UTC')
+    serie = pd.Series(serie.to_numpy(dtype=float), index=indice).groupby(level=0).mean()
+    return serie.asfreq('h')
+
+
+def _calendario_precio(instantes):
+    locales = instantes.tz_convert(ZONA)
+    dia_seno, dia_coseno = _dia_anio(locales)
+    return {
+        'hora': locales.hour.to_numpy(),
+        'dia_semana': locales.dayofweek.to_numpy(),
+        'mes': locales.month.to_numpy(),
+        'dia_seno': dia_seno,
+        'dia_coseno': dia_coseno,
+    }
+
+
+def _retardos_precio(valores, posiciones):
+    # Precios retrasados y media de las 24 horas que terminan 24 horas antes de cada posición
+    def tomar(desplazadas):
+        return np.where(desplazadas >= 0, valores[np.maximum(desplazadas, 0)], np.nan)
+
+    columnas = {f'precio_{retardo}h': tomar(posiciones - retardo) for retardo in RETARDOS_PRECIO}
+    ventana = np.stack([tomar(posiciones - 24 - k) for k in range(24)])
+    validos = ~np.isnan(ventana)
+    with np.errstate(invalid='ignore'):
+        columnas['media_dia_anterior'] = np.where(validos, ventana, 0).sum(axis=0) / validos.sum(axis=0)
+    return columnas
+
+
+def caracteristicas_precio(serie):
+    # Características de cada hora de una serie de precios (índice con zona horaria o en hora local).
+    # Devuelve (X, y) sobre la rejilla horaria UTC, sin las horas con el precio desconocido
+    rejilla = _rejilla_horaria(serie)
+    valores = rejilla.to_numpy()
+    X = pd.DataFrame({**_calendario_precio(rejilla.index),
+                      **_retardos_precio(valores, np.arange(len(valores)))},
+                     index=rejilla.index, columns=CARACTERISTICAS_PRECIO)
+    conocidos = ~np.isnan(valores)
+    return X[conocidos], rejilla[conocidos]
+
+
+def predecir_precio(modelo, historia, instantes):
+    # Precios en los instantes indicados (posteriores a la historia) a partir de la serie histórica. Cada
+    # bloque de RETARDOS_PRECIO[0] horas se predice de una vez; los siguientes usan las predicciones previas
+    rejilla = _rejilla_horaria(historia)
+    instantes = pd.DatetimeIndex(instantes)
+    instantes = instantes.tz_convert('UTC') if instantes.tz is not None else instantes.tz_localize(ZONA).tz_convert('UTC')
+    indice = pd.date_range(rejilla.index[0], max(rejilla.index[-1], instantes.max()), freq='h')
+    valores = rejilla.reindex(indice).to_numpy(copy=True)
+    pendientes = np.flatnonzero(np.isnan(valores) & (indice > rejilla.index[-1]) & (indice <= instantes.max()))
+    horizonte = RETARDOS_PRECIO[0]
+    for inicio in range(0, len(pendientes), horizonte):
+        posiciones = pendientes[inicio:inicio + horizonte]
+        X = pd.DataFrame({**_calendario_precio(indice[posiciones]), **_retardos_precio(valores, posiciones)},
+                         columns=CARACTERISTICAS_PRECIO)
+        valores[posiciones] = modelo.predict(X)
+    return pd.Series(valores, index=indice).reindex(instantes).to_numpy()
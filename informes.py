@@ -0,0 +1,184 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import atexit
+import base64
+import html
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Capa común de gráficos de los scripts de análisis, modelos y comparativas. En lugar de abrir cada
+# figura en una ventana (plt.show(), fig.show() de plotly), los scripts llaman a mostrar():
+#   - con INFORMES_PATH definido, la figura se añade al informe de la ejecución: un único HTML estático
+#     (INFORMES_PATH/<script>_<fecha>.html) con todas las figuras y tablas, que se escribe al terminar
+#   - con MOSTRAR_GRAFICOS=1 se abre como antes (uso interactivo)
+#   - en otro caso no se dibuja, de modo que los scripts se ejecutan sin pantalla y sin esperar a nadie
+# Las series largas se dibujan reducidas con LTTB (reducir), que conserva su forma con unos pocos miles
+# de puntos en lugar de los 17.000 de una serie horaria de dos años
+
+RUTA_INFORMES = os.environ.get('INFORMES_PATH')
+MOSTRAR = os.environ.get('MOSTRAR_GRAFICOS') == '1'
+
+# Puntos por serie de las vistas reducidas
+PUNTOS_VISTA = 2000
+
+
+def lttb(x, y, puntos=PUNTOS_VISTA):
+    # Índices de los puntos que elige Largest-Triangle-Three-Buckets: el primero, el último y, en cada
+    # uno de los puntos - 2 tramos intermedios, el que forma el triángulo de mayor área con el elegido en
+    # el tramo anterior y la media del siguiente. x numérico y creciente; los NaN de y se descartan
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    validos = np.flatnonzero(~np.isnan(y))
+    if len(validos) <= puntos or puntos < 3:
+        return validos
+    x, y = x[validos], y[validos]
+    limites = np.linspace(1, len(x) - 1, puntos - 1).astype(int)
+    # Media de cada tramo, calculada de una vez con sumas acumuladas
+    suma_x, suma_y = np.r_[0, np.cumsum(x)], np.r_[0, np.cumsum(y)]
+    tamanos = np.diff(limites)
+    media_x = (suma_x[limites[1:]] - suma_x[limites[:-1]]) / tamanos
+    media_y = (suma_y[limites[1:]] - suma_y[limites[:-1]]) / tamanos
+    media_x, media_y = np.r_[media_x[1:], x[-1]], np.r_[media_y[1:], y[-1]]
+
+    elegidos = np.empty(puntos, dtype=int)
+    elegidos[0], elegidos[-1] = 0, len(x) - 1
+    anterior = 0
+    for tramo in range(puntos - 2):
+        inicio, fin = limites[tramo], limites[tramo + 1]
+        # Doble del área del triángulo (anterior, candidato, media del tramo siguiente)
+        areas = np.abs((x[anterior] - media_x[tramo]) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (media_y[tramo] - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        elegidos[tramo + 1] = anterior
+    return validos[elegidos]
+
+
+def _eje(x):
+    # Eje x numérico: las fechas (también en texto, como en los CSV de REE y PVGIS) en nanosegundos
+    x = pd.Series(np.asarray(x)) if not isinstance(x, pd.Series) else x
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float)
+    return pd.DatetimeIndex(pd.to_datetime(x, utc=True)).asi8
+
+
+def _tomar(valores, indices):
+    return valores.iloc[indices] if isinstance(valores, pd.Series) else np.asarray(valores)[indices]
+
+
+def reducir(x, y, puntos=PUNTOS_VISTA):
+    # (x, y) reducidos con LTTB para dibujarlos. x puede ser un índice o columna de fechas
+    indices = lttb(_eje(x), y, puntos)
+    return _tomar(x, indices), _tomar(y, indices)
+
+
+def reducir_tabla(df, x, y, puntos=PUNTOS_VISTA):
+    # Filas de df elegidas con LTTB sobre las columnas x e y (para px.line y similares)
+    return df.iloc[lttb(_eje(df[x]), df[y].to_numpy(dtype=float), puntos)]
+
+
+class Informe:
+    # Figuras y tablas de una ejecución, que se escriben juntas en un HTML autocontenido
+
+    def __init__(self, titulo):
+        self.titulo = titulo
+        self.secciones = []
+        self.con_plotly = False
+
+    def figura(self, figura, titulo=None):
+        if hasattr(figura, 'savefig'):
+            # matplotlib: PNG incrustado
+            buffer = io.BytesIO()
+            figura.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+            imagen = base64.b64encode(buffer.getvalue()).decode()
+            contenido = f'<img src="data:image/png;base64,{imagen}">'
+        else:
+            # plotly: la librería JavaScript se incluye una sola vez, con la primera figura
+            contenido = figura.to_html(full_html=False, include_plotlyjs=not self.con_plotly)
+            self.con_plotly = True
+        self.secciones.append((titulo, contenido))
+
+    def tabla(self, df, titulo=None, formato='{:.3f}'.format):
+        self.secciones.append((titulo, df.to_html(float_format=formato, border=0)))
+
+    def html(self):
+        partes = [f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(self.titulo)}</title>',
+                  '<style>body{font-family:sans-serif;margin:2em}img{max-width:100%}'
+                  'table{border-collapse:collapse}td,th{padding:2px 8px;text-align:right}</style></head><body>',
+                  f'<h1>{html.escape(self.titulo)}</h1>']
+        for titulo, contenido in self.secciones:
+            if titulo:
+                partes.append(f'<h2>{html.escape(titulo)}</h2>')
+            partes.append(contenido)
+        partes.append('</body></html>')
+        return '\n'.join(partes)
+
+    def guardar(self, ruta):
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(self.html())
+        return ruta
+
+
+_informe = None
+
+
+def _guardar_informe(ruta):
+    if _informe.secciones:
+        print(f"Informe guardado en {_informe.guardar(ruta)}")
+
+
+def informe():
+    # Informe de la ejecución actual (INFORMES_PATH/<script>_<fecha>.html), que se escribe al terminar
+    global _informe
+    if _informe is None:
+        script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'informe'
+        _informe = Informe(script)
+        atexit.register(_guardar_informe, os.path.join(RUTA_INFORMES, f"{script}_{time.strftime('%Y%m%dT%H%M%S')}.html"))
+    return _informe
+
+
+def _titulo(figura):
+    # Título de la figura: el de plotly o el primero de los ejes de matplotlib
+    if hasattr(figura, 'savefig'):
+        return next((eje.get_title() for eje in figura.axes if eje.get_title()), None)
+    return figura.layout.title.text
+
+
+def mostrar(figura=None, titulo=None):
+    # Sustituye a plt.show() (sin figura: la actual de matplotlib) y a fig.show() de plotly
+    de_matplotlib = figura is None or hasattr(figura, 'savefig')
+    if de_matplotlib:
+        import matplotlib.pyplot as plt
+
+        figura = figura if figura is not None else plt.gcf()
+    if RUTA_INFORMES:
+        informe().figura(figura, titulo or _titulo(figura))
+    if not de_matplotlib:
+        if MOSTRAR:
+            figura.show()
+        return
+    if MOSTRAR:
+        plt.show()
+    plt.close(figura)
+
+
+def tabla(df, titulo=None):
+    # Añade una tabla (métricas, resúmenes) al informe de la ejecución
+    if RUTA_INFORMES:
+        informe().tabla(df, titulo)
@@ -0,0 +1,120 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Métricas de error de las predicciones calculadas de una vez sobre arrays apilados: reales y
+# predicciones de forma (..., puntos), p. ej. (modelos, horas) o (modelos, cortes, horas), y las métricas
+# se agregan sobre el último eje. Las horas sin valor real o sin predicción (NaN) y las que excluya la
+# máscara no cuentan. Con reales nulos (la irradiación de noche):
+#   - el MAPE solo usa las horas con valor real distinto de cero (con una máscara de horas diurnas,
+#     las del día)
+#   - el sMAPE divide entre |real| + |predicción| y solo descarta las horas en que ambos son cero
+#   - el MASE divide el MAE entre el de la predicción estacional ingenua en la serie histórica
+# Todas las métricas salen de unas pocas sumas por punto, de modo que agrupar por hora del día o por mes
+# (por_grupos) es sumar esos términos por grupo con np.bincount
+
+METRICAS = ('mae', 'mse', 'rmse', 'mape', 'smape', 'mase', 'sesgo')
+
+# Periodo de la predicción ingenua del MASE en series horarias (el mismo valor de hace un día)
+PERIODO_MASE = 24
+
+
+def _terminos(reales, predicciones, mascara=None):
+    # Términos por punto cuya suma da todas las métricas (con ceros en los puntos que no cuentan)
+    reales, predicciones = np.broadcast_arrays(np.asarray(reales, dtype=float), np.asarray(predicciones, dtype=float))
+    validos = ~np.isnan(reales) & ~np.isnan(predicciones)
+    if mascara is not None:
+        validos &= np.broadcast_to(np.asarray(mascara, dtype=bool), validos.shape)
+    error = np.where(validos, predicciones - reales, 0.)
+    absoluto = np.abs(error)
+    con_real = validos & (reales != 0)
+    suma = np.abs(reales) + np.abs(predicciones)
+    con_suma = validos & (suma > 0)
+    return {
+        'n': validos.astype(float),
+        'error': error,
+        'absoluto': absoluto,
+        'cuadrado': error ** 2,
+        'porcentual': np.divide(absoluto, np.abs(reales), out=np.zeros_like(absoluto), where=con_real),
+        'n_porcentual': con_real.astype(float),
+        'simetrico': np.divide(2 * absoluto, suma, out=np.zeros_like(absoluto), where=con_suma),
+        'n_simetrico': con_suma.astype(float),
+    }
+
+
+def _metricas(sumas, escala=None):
+    # Métricas a partir de las sumas de los términos; NaN donde no hay puntos que contar
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mae = sumas['absoluto'] / sumas['n']
+        mse = sumas['cuadrado'] / sumas['n']
+        return {
+            'mae': mae,
+            'mse': mse,
+            'rmse': np.sqrt(mse),
+            'mape': 100 * sumas['porcentual'] / sumas['n_porcentual'],
+            'smape': 100 * sumas['simetrico'] / sumas['n_simetrico'],
+            'mase': mae / escala if escala is not None else np.full_like(mae, np.nan),
+            'sesgo': sumas['error'] / sumas['n'],
+        }
+
+
+def escala_mase(historia, periodo=PERIODO_MASE):
+    # Error absoluto medio de la predicción estacional ingenua (el valor de periodo pasos antes) en la
+    # serie histórica, sobre el último eje. Es el denominador del MASE
+    historia = np.asarray(historia, dtype=float)
+    diferencias = np.abs(historia[..., periodo:] - historia[..., :-periodo])
+    with warnings.catch_warnings():
+        # Una serie sin pares válidos da NaN (nanmean avisa de la media vacía)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(diferencias, axis=-1)
+
+
+def errores(reales, predicciones, mascara=None, escala=None):
+    # Métricas ({nombre: array de forma (...,)}) agregadas sobre el último eje. reales, predicciones y
+    # mascara se difunden entre sí: unos mismos reales (puntos,) sirven para predicciones (modelos, puntos).
+    # escala: denominador del MASE (escala_mase), escalar o de la forma del resultado
+    terminos = _terminos(reales, predicciones, mascara)
+    return _metricas({nombre: valores.sum(axis=-1) for nombre, valores in terminos.items()}, escala)
+
+
+def por_grupos(reales, predicciones, grupos, mascara=None, escala=None, nombres=None):
+    # Métricas por grupo (p. ej. la hora del día o el mes de cada punto, enteros no negativos) de cada
+    # serie. grupos se difunde con reales y predicciones. Devuelve un DataFrame con una fila por serie
+    # (índice nombres) y grupo y una columna por métrica más el número de puntos
+    terminos = _terminos(reales, predicciones, mascara)
+    forma = terminos['n'].shape
+    series = int(np.prod(forma[:-1]))
+    grupos = np.broadcast_to(np.asarray(grupos, dtype=np.int64), forma).reshape(series, forma[-1])
+    n_grupos = int(grupos.max()) + 1
+    # Cada (serie, grupo) es una casilla de bincount
+    casillas = (np.arange(series)[:, None] * n_grupos + grupos).ravel()
+    sumas = {nombre: np.bincount(casillas, weights=valores.reshape(series, -1).ravel(), minlength=series * n_grupos)
+             for nombre, valores in terminos.items()}
+    if escala is not None:
+        escala = np.repeat(np.broadcast_to(np.asarray(escala, dtype=float), forma[:-1]).ravel(), n_grupos)
+    tabla = pd.DataFrame({**_metricas(sumas, escala), 'puntos': sumas['n'].astype(int)}, columns=[*METRICAS, 'puntos'])
+    nombres = np.arange(series) if nombres is None else np.asarray(nombres).ravel()
+    tabla.index = pd.MultiIndex.from_product([nombres, np.arange(n_grupos)], names=['serie', 'grupo'])
+    # Solo los grupos que aparecen en los datos
+    presentes = np.bincount(grupos.ravel(), minlength=n_grupos) > 0
+    return tabla[np.tile(presentes, series)]
+
+
+def tabla(reales, predicciones, nombres, mascara=None, escala=None):
+    # Métricas de cada serie (predicciones de forma (series, puntos)) como DataFrame indexado por nombres
+    return pd.DataFrame(errores(reales, predicciones, mascara, escala), index=pd.Index(nombres, name='serie'),
+                        columns=list(METRICAS))
@@ -11,14 +11,17 @@ Fecha: 07/09/2024
 """
 
 import numpy as np
-import pandas as pd
-from statsmodels.tsa.statespace.sarimax import SARIMAX
 from sklearn.metrics import mean_squared_error
 import matplotlib.pyplot as plt
-import pickle
+import os
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import ajuste_sarimax
+import informes
 
 # Cargar el dataset
-data = pd.read_csv("little_typical_year_spain_corrected.csv", parse_dates=['datetime'])
+data = leer('serie_irradiacion', columnas=['datetime', 'G(i)'])
 data = data.set_index('datetime')
 
 # Verificar si hay NaNs en el conjunto de datos
@@ -29,37 +32,47 @@ print(data.isna().sum())
 train_data = data[:int(0.8 * len(data))]
 test_data = data[int(0.8 * len(data)):]
 
-# Configuración del modelo SARIMA
-arima_model = SARIMAX(train_data["G(i)"], order=(2,1,0), seasonal_order=(1,1,0,12)) 
-arima_result = arima_model.fit()
+# Configuración del modelo SARIMA: el periodo estacional se elige con la autocorrelación (24 en datos horarios)
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+order, seasonal_order = ajuste_sarimax.especificacion(train_data["G(i)"], (2,1,0), (1,1,0,None))
+print(f"Periodo estacional: {seasonal_order[3]}")
 
-# Guardar el modelo en un archivo
-with open('arima_model.pkl', 'wb') as pkl_file:
-    pickle.dump(arima_result, pkl_file)
+# Ajuste rápido partiendo de la versión anterior del modelo, si existe
+iniciales = ajuste_sarimax.parametros_previos(almacen, ['irradiacion_arima'], order, seasonal_order)
+arima_result = ajuste_sarimax.ajustar(train_data["G(i)"], order, seasonal_order, iniciales=iniciales)
 
 # Realizar predicciones sobre el conjunto de prueba
 start_index = test_data.index[0]
 end_index = test_data.index[-1]
-predictions = arima_result.predict(start=start_index, end=end_index, typ="levels").rename("Predictions")
+predictions = arima_result.predict(start=start_index, end=end_index).rename("Predictions")
 
 # Evaluación de las predicciones
 test_data['Predictions'] = predictions
 rmse_value = np.sqrt(mean_squared_error(test_data["G(i)"], test_data["Predictions"]))
 print(f'RMSE: {rmse_value}')
 
+# Guardar el modelo en el almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+version = almacen.guardar(
+    'irradiacion_arima', arima_result, 'sarimax',
+    rango=rango_entrenamiento(train_data.index),
+    metricas={'rmse': float(rmse_value)},
+    huella=huella_datos(train_data["G(i)"]),
+)
+print(f"Modelo guardado en el almacén: irradiacion_arima {version}")
+
 # Guardar las predicciones en un archivo CSV
 test_data[['G(i)', 'Predictions']].to_csv("predicciones_arima.csv")
 
 # Visualización de los resultados
 plt.figure(figsize=(12, 6))
-plt.plot(test_data.index, test_data["G(i)"], label="Datos Reales")
-plt.plot(test_data.index, test_data["Predictions"], label="Predicciones", color='red')
+plt.plot(*informes.reducir(test_data.index, test_data["G(i)"]), label="Datos Reales")
+plt.plot(*informes.reducir(test_data.index, test_data["Predictions"]), label="Predicciones", color='red')
 plt.xlabel('Date')
 plt.ylabel('G(i)')
 plt.title('Predicciones vs Datos Reales')
 plt.legend()
-plt.show()
+informes.mostrar()
 
 # Diagnósticos del modelo
 arima_result.plot_diagnostics(figsize=(16, 8))
-plt.show()
+informes.mostrar()
@@ -12,13 +12,17 @@ Fecha: 07/09/2024
 
 import numpy as np
 import pandas as pd
-from statsmodels.tsa.statespace.sarimax import SARIMAX
 from sklearn.metrics import mean_squared_error
 import matplotlib.pyplot as plt
-import joblib
+import os
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import ajuste_sarimax
+import informes
 
 # Cargar los datos
-data = pd.read_csv('little_typical_year_spain_corrected.csv', parse_dates=['datetime'], index_col='datetime')
+data = leer('serie_irradiacion', columnas=['datetime', 'G(i)', 'T2m']).set_index('datetime')
 
 # Dividir en entrenamiento y prueba
 n_periods = 868  # Número de periodos para el conjunto de prueba
@@ -29,11 +33,14 @@ test = data.iloc[-n_periods:]
 train_exog = train[['T2m']]
 test_exog = test[['T2m']]
 
-# Definir el modelo SARIMAX
-model = SARIMAX(train['G(i)'], exog=train_exog, order=(2, 1, 0), seasonal_order=(1, 1, 0, 12))
+# Definir el modelo SARIMAX: el periodo estacional se elige con la autocorrelación (24 en datos horarios)
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+order, seasonal_order = ajuste_sarimax.especificacion(train['G(i)'], (2, 1, 0), (1, 1, 0, None))
+print(f"Periodo estacional: {seasonal_order[3]}")
 
-# Ajustar el modelo
-model_fit = model.fit(disp=False)
+# Ajustar el modelo (ajuste rápido partiendo de la versión anterior, si existe)
+iniciales = ajuste_sarimax.parametros_previos(almacen, ['irradiacion_arimax'], order, seasonal_order)
+model_fit = ajuste_sarimax.ajustar(train['G(i)'], order, seasonal_order, exog=train_exog, iniciales=iniciales)
 
 # Hacer predicciones
 predictions = model_fit.predict(start=len(train), end=len(train)+len(test)-1, exog=test_exog)
@@ -54,13 +61,19 @@ print(f'RMSE: {rmse}')
 
 # Graficar los resultados
 plt.figure(figsize=(10, 6))
-plt.plot(test.index, test['G(i)'], label='Datos Reales')
-plt.plot(test.index, predictions, label='Predicciones', color='red')
+plt.plot(*informes.reducir(test.index, test['G(i)']), label='Datos Reales')
+plt.plot(*informes.reducir(test.index, predictions), label='Predicciones', color='red')
 plt.title('Predicciones vs Datos Reales')
 plt.xlabel('Fecha')
 plt.ylabel('Irradiación G(i)')
 plt.legend()
-plt.show()
-
-# Guardar el modelo SARIMAX
-joblib.dump(model_fit, 'sarimax_model.pkl')
+informes.mostrar()
+
+# Guardar el modelo en el almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+version = almacen.guardar(
+    'irradiacion_arimax', model_fit, 'sarimax',
+    rango=rango_entrenamiento(train.index),
+    metricas={'rmse': float(rmse)},
+    huella=huella_datos(train[['G(i)', 'T2m']]),
+)
+print(f"Modelo guardado en el almacén: irradiacion_arimax {version}")
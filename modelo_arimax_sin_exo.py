@@ -12,24 +12,33 @@ Fecha: 07/09/2024
 
 import numpy as np
 import pandas as pd
-from statsmodels.tsa.statespace.sarimax import SARIMAX
 from sklearn.metrics import mean_squared_error
 import matplotlib.pyplot as plt
-import joblib
+import os
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import ajuste_sarimax
+import informes
 
 # Cargar los datos
-data = pd.read_csv('little_typical_year_spain_corrected.csv', parse_dates=['datetime'], index_col='datetime')
+data = leer('serie_irradiacion', columnas=['datetime', 'G(i)']).set_index('datetime')
 
 # Dividir en entrenamiento y prueba
 n_periods = 868  # Número de periodos para el conjunto de prueba
 train = data.iloc[:-n_periods]
 test = data.iloc[-n_periods:]
 
-# Definir el modelo ARIMA (sin variables exógenas)
-model = SARIMAX(train['G(i)'], order=(2, 1, 0), seasonal_order=(1, 1, 0, 12))
+# Definir el modelo ARIMA (sin variables exógenas): el periodo estacional se elige con la autocorrelación
+# (24 en datos horarios)
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+order, seasonal_order = ajuste_sarimax.especificacion(train['G(i)'], (2, 1, 0), (1, 1, 0, None))
+print(f"Periodo estacional: {seasonal_order[3]}")
 
-# Ajustar el modelo
-model_fit = model.fit(disp=False)
+# Ajustar el modelo (ajuste rápido partiendo de la versión anterior o del modelo de otra ubicación)
+referencias = ['irradiacion'] + [otro for otro in almacen.nombres() if otro.startswith('irradiacion_sitio_')]
+iniciales = ajuste_sarimax.parametros_previos(almacen, referencias, order, seasonal_order)
+model_fit = ajuste_sarimax.ajustar(train['G(i)'], order, seasonal_order, iniciales=iniciales)
 
 # Hacer predicciones
 predictions = model_fit.predict(start=len(train), end=len(train)+len(test)-1)
@@ -50,13 +59,19 @@ print(f'RMSE: {rmse}')
 
 # Graficar los resultados
 plt.figure(figsize=(10, 6))
-plt.plot(test.index, test['G(i)'], label='Datos Reales')
-plt.plot(test.index, predictions, label='Predicciones', color='red')
+plt.plot(*informes.reducir(test.index, test['G(i)']), label='Datos Reales')
+plt.plot(*informes.reducir(test.index, predictions), label='Predicciones', color='red')
 plt.title('Predicciones vs Datos Reales')
 plt.xlabel('Fecha')
 plt.ylabel('Irradiación G(i)')
 plt.legend()
-plt.show()
+informes.mostrar()
 
-# Guardar el modelo ARIMA
-joblib.dump(model_fit, 'sarimax_model_sin_exo.pkl')
+# Guardar el modelo en el almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+version = almacen.guardar(
+    'irradiacion', model_fit, 'sarimax',
+    rango=rango_entrenamiento(train.index),
+    metricas={'rmse': float(rmse)},
+    huella=huella_datos(train['G(i)']),
+)
+print(f"Modelo guardado en el almacén: irradiacion {version}")
@@ -0,0 +1,93 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error
+import matplotlib.pyplot as plt
+import os
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import gradiente
+import informes
+
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+
+# Irradiación: un único modelo para todas las capitales, inclinaciones y orientaciones del año típico
+anio_tipico = leer('anio_tipico', columnas=['capital', 'slope', 'azimuth', 'day', 'hour', 'G(i)', 'T2m'])
+X, y, instantes = gradiente.tabla_anio_tipico(anio_tipico)
+print(f"Irradiación: {len(X)} filas de {anio_tipico[['capital', 'slope', 'azimuth']].drop_duplicates().shape[0]} ubicaciones")
+
+# Las últimas 868 horas del año de cada ubicación se reservan para la prueba, como en los modelos ARIMA
+n_periods = 868
+prueba = np.asarray(instantes >= instantes.max() - pd.Timedelta(hours=n_periods - 1))
+
+inicio = time.perf_counter()
+modelo_irradiacion = gradiente.ajustar(X[~prueba], y[~prueba])
+segundos = time.perf_counter() - inicio
+
+predicciones = np.maximum(modelo_irradiacion.predict(X[prueba]), 0)
+rmse_irradiacion = np.sqrt(mean_squared_error(y[prueba], predicciones))
+print(f'RMSE irradiación: {rmse_irradiacion} (entrenamiento: {segundos:.1f} s)')
+
+version = almacen.guardar(
+    'irradiacion_gradiente', modelo_irradiacion, 'pickle',
+    rango=rango_entrenamiento(instantes[~prueba]),
+    metricas={'rmse': float(rmse_irradiacion), 'segundos_entrenamiento': segundos},
+    huella=huella_datos(anio_tipico[~prueba]),
+    etiquetas={'caracteristicas': gradiente.CARACTERISTICAS_IRRADIACION, 'hiperparametros': gradiente.HIPERPARAMETROS},
+)
+print(f"Modelo guardado en el almacén: irradiacion_gradiente {version}")
+
+# Precios: un modelo por serie con los precios de al menos 24 horas antes. Se evalúa a un día vista
+# (cada día con los precios reales anteriores) y de forma recursiva sobre todo el periodo de prueba,
+# como Prophet
+resultados_precios = {}
+for conjunto, nombre in (('precio_spot', 'precio_energia_gradiente'), ('precio_pvpc', 'tarifa_pvpc_gradiente')):
+    data = leer(conjunto, columnas=['datetime', 'value']).set_index('datetime')['value']
+    X, y = gradiente.caracteristicas_precio(data)
+
+    # División del conjunto de datos en entrenamiento y prueba
+    corte = int(0.8 * len(X))
+    inicio = time.perf_counter()
+    modelo_precio = gradiente.ajustar(X[:corte], y[:corte])
+    segundos = time.perf_counter() - inicio
+
+    dia_vista = modelo_precio.predict(X[corte:])
+    recursivo = gradiente.predecir_precio(modelo_precio, y[:corte], y.index[corte:])
+    rmse_dia_vista = np.sqrt(mean_squared_error(y[corte:], dia_vista))
+    rmse_recursivo = np.sqrt(mean_squared_error(y[corte:], recursivo))
+    print(f'RMSE {conjunto}: {rmse_dia_vista} a un día vista, {rmse_recursivo} recursivo (entrenamiento: {segundos:.1f} s)')
+
+    version = almacen.guardar(
+        nombre, modelo_precio, 'pickle',
+        rango=rango_entrenamiento(y.index[:corte]),
+        metricas={'rmse': float(rmse_dia_vista), 'rmse_recursivo': float(rmse_recursivo), 'segundos_entrenamiento': segundos},
+        huella=huella_datos(y[:corte]),
+        etiquetas={'caracteristicas': gradiente.CARACTERISTICAS_PRECIO, 'hiperparametros': gradiente.HIPERPARAMETROS},
+    )
+    print(f"Modelo guardado en el almacén: {nombre} {version}")
+    resultados_precios[conjunto] = (y[corte:], dia_vista, recursivo)
+
+# Visualización de los resultados de precios
+fig, ejes = plt.subplots(len(resultados_precios), 1, figsize=(12, 8))
+for eje, (conjunto, (reales, dia_vista, recursivo)) in zip(np.atleast_1d(ejes), resultados_precios.items()):
+    eje.plot(*informes.reducir(reales.index, reales), label='Datos Reales', color='black')
+    eje.plot(*informes.reducir(reales.index, dia_vista), label='A un día vista', color='red')
+    eje.plot(*informes.reducir(reales.index, recursivo), label='Recursivo', color='blue', alpha=0.6)
+    eje.set_title(f'Gradient boosting - {conjunto}')
+    eje.legend()
+plt.tight_layout()
+informes.mostrar()
@@ -11,14 +11,17 @@ Fecha: 07/09/2024
 """
 
 import numpy as np
-import pandas as pd
 from prophet import Prophet
 from sklearn.metrics import mean_squared_error
 import matplotlib.pyplot as plt
-import pickle
+import os
+
+from almacen_datos import leer
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import informes
 
 # Cargar el dataset
-data = pd.read_csv("little_typical_year_spain_corrected.csv", parse_dates=['datetime'])
+data = leer('serie_irradiacion', columnas=['datetime', 'G(i)'])
 data = data.set_index('datetime')
 
 # Verificar si hay NaNs en el conjunto de datos
@@ -52,19 +55,26 @@ test_data['Predictions'] = predictions['yhat']
 rmse_value = np.sqrt(mean_squared_error(test_data['y'], test_data['Predictions']))
 print(f'RMSE: {rmse_value}')
 
-# Guardar el modelo en un archivo
-with open('prophet_model.pkl', 'wb') as pkl_file:
-    pickle.dump(model, pkl_file)
+# Guardar el modelo en el almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+version = almacen.guardar(
+    'irradiacion_prophet', model, 'prophet',
+    rango=rango_entrenamiento(train_data['ds']),
+    metricas={'rmse': float(rmse_value)},
+    huella=huella_datos(train_data),
+    objeto=True,  # Prophet original, para validacion_prophet_numpy.py
+)
+print(f"Modelo guardado en el almacén: irradiacion_prophet {version}")
 
 # Guardar las predicciones en un archivo CSV
 test_data[['y', 'Predictions']].to_csv("predicciones_prophet.csv")
 
 # Visualización de los resultados
 plt.figure(figsize=(12, 6))
-plt.plot(test_data.index, test_data['y'], label="Datos Reales")
-plt.plot(test_data.index, test_data['Predictions'], label="Predicciones", color='red')
+plt.plot(*informes.reducir(test_data.index, test_data['y']), label="Datos Reales")
+plt.plot(*informes.reducir(test_data.index, test_data['Predictions']), label="Predicciones", color='red')
 plt.xlabel('Date')
 plt.ylabel('G(i)')
 plt.title('Predicciones vs Datos Reales')
 plt.legend()
-plt.show()
+informes.mostrar()
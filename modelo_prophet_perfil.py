@@ -11,30 +11,22 @@ Fecha: 07/09/2024
 """
 
 import numpy as np
-import pandas as pd
 from prophet import Prophet
 from sklearn.metrics import mean_squared_error
 import matplotlib.pyplot as plt
-import pickle
+import os
 
-# Cargar el dataset
-data = pd.read_csv("typical_year_profile.csv")
-data['datetime'] = pd.to_datetime('2023-01-01') + pd.to_timedelta(data['day'] - 1, unit='D') + pd.to_timedelta(data['hour'], unit='h')
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import informes
+import preprocesado
 
-data = data.set_index('datetime')
-
-# Convertir el índice a UTC para evitar problemas con las zonas horarias
-data.index = pd.to_datetime(data.index, utc=True)
+# Cargar el dataset preparado para Prophet: el año típico del perfil A como serie horaria de 2023 (ds, y).
+# El año típico usa un calendario bisiesto: su 29 de febrero se descarta, como en entrenamiento.py
+df = preprocesado.serie_perfil('COEF. PERFIL A')
 
 # Verificar si hay NaNs en el conjunto de datos
 print("Verificación de NaN en el conjunto de datos:")
-print(data.isna().sum())
-
-# Preprocesamiento para Prophet
-df = data[['COEF. PERFIL A']].reset_index().rename(columns={'datetime': 'ds', 'COEF. PERFIL A': 'y'})
-
-# Eliminar la zona horaria de la columna 'ds' (fechas)
-df['ds'] = df['ds'].dt.tz_localize(None)
+print(df.isna().sum())
 
 # División del conjunto de datos en entrenamiento y prueba
 train_data = df[:int(0.8 * len(df))]
@@ -60,19 +52,26 @@ test_data['Predictions'] = predictions['yhat']
 rmse_value = np.sqrt(mean_squared_error(test_data['y'], test_data['Predictions']))
 print(f'RMSE: {rmse_value}')
 
-# Guardar el modelo en un archivo
-with open('prophet_model_perfil.pkl', 'wb') as pkl_file:
-    pickle.dump(model, pkl_file)
+# Guardar el modelo en el almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+version = almacen.guardar(
+    'perfil_consumo', model, 'prophet',
+    rango=rango_entrenamiento(train_data['ds']),
+    metricas={'rmse': float(rmse_value)},
+    huella=huella_datos(train_data),
+    objeto=True,  # Prophet original, para validacion_prophet_numpy.py
+)
+print(f"Modelo guardado en el almacén: perfil_consumo {version}")
 
 # Guardar las predicciones en un archivo CSV
 test_data[['y', 'Predictions']].to_csv("prophet_model_perfil.csv")
 
 # Visualización de los resultados
 plt.figure(figsize=(12, 6))
-plt.plot(test_data.index, test_data['y'], label="Datos Reales")
-plt.plot(test_data.index, test_data['Predictions'], label="Predicciones", color='red')
+plt.plot(*informes.reducir(test_data.index, test_data['y']), label="Datos Reales")
+plt.plot(*informes.reducir(test_data.index, test_data['Predictions']), label="Predicciones", color='red')
 plt.xlabel('Date')
 plt.ylabel('COEF. PERFIL A')
 plt.title('Predicciones vs Datos Reales')
 plt.legend()
-plt.show()
+informes.mostrar()
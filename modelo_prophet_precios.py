@@ -0,0 +1,96 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import argparse
+import numpy as np
+from prophet import Prophet
+from sklearn.metrics import mean_squared_error
+import matplotlib.pyplot as plt
+import os
+
+from almacen_modelos import AlmacenModelos, huella_datos, rango_entrenamiento
+import informes
+import preprocesado
+
+# Modelos Prophet de los precios de REE: el mismo entrenamiento para cada serie, que solo cambia en el
+# conjunto de datos, el nombre del modelo en el almacén y el CSV de predicciones
+#   python modelo_prophet_precios.py                    (precio de la energía y tarifa PVPC)
+#   python modelo_prophet_precios.py precio_pvpc
+PRECIOS = {
+    'precio_spot': {'modelo': 'precio_energia', 'predicciones': 'prophet_model_pe.csv'},
+    'precio_pvpc': {'modelo': 'tarifa_pvpc', 'predicciones': 'prophet_model_pvpc.csv'},
+}
+
+parser = argparse.ArgumentParser(description="Entrena los modelos Prophet de los precios")
+parser.add_argument('conjuntos', nargs='*', choices=list(PRECIOS), default=list(PRECIOS), help="Series de precios")
+args = parser.parse_args()
+
+# Almacén de modelos (directorio MODELOS_PATH, por defecto 'modelos')
+almacen = AlmacenModelos(os.environ.get('MODELOS_PATH', 'modelos'))
+
+for conjunto in args.conjuntos:
+    nombre = PRECIOS[conjunto]['modelo']
+
+    # Cargar el dataset preparado para Prophet: ds (instantes en UTC sin zona horaria) e y
+    df = preprocesado.serie_precio(conjunto)
+
+    # Verificar si hay NaNs en el conjunto de datos
+    print(f"Verificación de NaN en el conjunto de datos ({conjunto}):")
+    print(df.isna().sum())
+
+    # División del conjunto de datos en entrenamiento y prueba
+    train_data = df[:int(0.8 * len(df))]
+    test_data = df[int(0.8 * len(df)):]
+
+    # Crear y entrenar el modelo Prophet
+    model = Prophet()
+    model.fit(train_data)
+
+    # Realizar predicciones sobre el conjunto de prueba
+    future = model.make_future_dataframe(periods=len(test_data), freq='H')  # Ajusta la frecuencia según tu conjunto de datos
+    forecast = model.predict(future)
+
+    # Extraer solo las predicciones relevantes (correspondientes al conjunto de prueba)
+    predictions = forecast[['ds', 'yhat']].set_index('ds').loc[test_data['ds']]
+
+    # Reemplazar predicciones negativas con cero
+    predictions['yhat'] = predictions['yhat'].apply(lambda x: max(0, x))
+
+    # Evaluación de las predicciones
+    test_data = test_data.set_index('ds')
+    test_data['Predictions'] = predictions['yhat']
+    rmse_value = np.sqrt(mean_squared_error(test_data['y'], test_data['Predictions']))
+    print(f'RMSE: {rmse_value}')
+
+    # Guardar el modelo en el almacén de modelos
+    version = almacen.guardar(
+        nombre, model, 'prophet',
+        rango=rango_entrenamiento(train_data['ds']),
+        metricas={'rmse': float(rmse_value)},
+        huella=huella_datos(train_data),
+        objeto=True,  # Prophet original, para validacion_prophet_numpy.py
+    )
+    print(f"Modelo guardado en el almacén: {nombre} {version}")
+
+    # Guardar las predicciones en un archivo CSV
+    test_data[['y', 'Predictions']].to_csv(PRECIOS[conjunto]['predicciones'])
+
+    # Visualización de los resultados
+    plt.figure(figsize=(12, 6))
+    plt.plot(*informes.reducir(test_data.index, test_data['y']), label="Datos Reales")
+    plt.plot(*informes.reducir(test_data.index, test_data['Predictions']), label="Predicciones", color='red')
+    plt.xlabel('Date')
+    plt.ylabel('value')
+    plt.title(f'Predicciones vs Datos Reales - {nombre}')
+    plt.legend()
+    informes.mostrar()
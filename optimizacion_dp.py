@@ -0,0 +1,217 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import numpy as np
+
+from despacho import EFICIENCIA_BATERIA
+from optimizacion_lp import optimizar_despacho as optimizar_despacho_lp
+
+# Número de niveles de la rejilla de estados de carga sobre la que se calcula la función de valor
+NIVELES_CARGA = 101
+
+# Elementos de las matrices de una hora (baterías x niveles x tramos de coste) y de las funciones de
+# valor guardadas (horas x baterías x niveles, float32): las carteras mayores se resuelven por bloques
+# de baterías para acotar la memoria
+ELEMENTOS_BLOQUE = 2_000_000
+ELEMENTOS_VALORES = 50_000_000
+
+
+def _entrada_salida(carga_origen, carga_destino, eficiencia):
+    # Energía necesaria para cargar y energía entregada al descargar al pasar de una carga a otra
+    delta = carga_destino - carga_origen
+    return np.maximum(delta, 0) / eficiencia, np.maximum(-delta, 0) * eficiencia
+
+
+def _flujos_transicion(entrada_bateria, salida_bateria, generacion, consumo, carga_desde_red, limite_exportacion):
+    # La batería abastece el consumo (también en horas con sol, liberando generación para la venta) y
+    # la generación cubre el consumo que falta. La carga se hace primero con la generación sobrante,
+    # después con la que cubriría el consumo (que pasa a comprarse, como en optimizacion_lp) y, si se
+    # permite, con la red. Los destinos se acotan antes (_tramos) para que la carga sin red no supere
+    # la generación ni la descarga el consumo
+    autoconsumo = np.minimum(generacion, consumo - salida_bateria)
+    sobrante = generacion - autoconsumo
+    carga_sobrante = np.minimum(entrada_bateria, sobrante)
+    carga_autoconsumo = np.minimum(entrada_bateria - carga_sobrante, autoconsumo)
+    carga_red = np.where(carga_desde_red, entrada_bateria - carga_sobrante - carga_autoconsumo, 0.)
+    autoconsumo = autoconsumo - carga_autoconsumo
+
+    # El sobrante que no se almacena se vende, hasta el límite de exportación
+    compra = consumo - salida_bateria - autoconsumo + carga_red
+    venta = np.minimum(sobrante - carga_sobrante, limite_exportacion)
+    return autoconsumo, compra, venta, carga_red
+
+
+def _pendientes(tarifa, precio, eficiencia):
+    # Coste de la hora por kWh más de carga final en cada tramo (última dimensión), de menor a mayor
+    # carga: descarga que no se aprovecha, descarga que libera generación para venderla, descarga que
+    # evita comprar, carga con generación que no se puede exportar, con generación que se vendería y
+    # con generación que cubriría el consumo o con la red
+    cero = np.zeros_like(precio)
+    return np.stack([cero, precio * eficiencia, tarifa * eficiencia, cero, precio / eficiencia, tarifa / eficiencia], axis=-1)
+
+
+def _tramos(carga, capacidad_max, generacion, consumo, carga_desde_red, limite_exportacion, eficiencia):
+    # Cargas finales en que empiezan y acaban los tramos de _pendientes desde cada carga de origen
+    # (una lista de arrays), acotadas a la capacidad. Con 0 <= precio <= tarifa los tramos no vacíos tienen
+    # pendientes crecientes (las horas con déficit no tienen excedente), así que el coste de la hora es
+    # convexo en la carga final; optimizar_despacho resuelve con el LP las baterías que no lo cumplen
+    autoconsumo = np.minimum(generacion, consumo)
+    excedente = generacion - autoconsumo
+    deficit = consumo - autoconsumo
+    liberable = np.minimum(autoconsumo, np.maximum(limite_exportacion - excedente, 0))
+    no_exportable = np.maximum(excedente - limite_exportacion, 0)
+    limites = [
+        carga - consumo / eficiencia,
+        carga - (deficit + liberable) / eficiencia,
+        carga - deficit / eficiencia,
+        carga,
+        carga + no_exportable * eficiencia,
+        carga + excedente * eficiencia,
+        np.where(carga_desde_red, np.inf, carga + generacion * eficiencia),
+    ]
+    return [np.clip(limite, 0, capacidad_max) for limite in limites]
+
+
+def _minimos(valor, pendientes, capacidad_max):
+    # Nivel de la rejilla que minimiza pendiente * carga + valor(carga) para cada pendiente, forma
+    # (baterías, pendientes): con la función de valor convexa, es el inicio del primer tramo de
+    # la rejilla con pendiente mayor que -pendiente
+    niveles = valor.shape[1]
+    tramos = np.diff(valor, axis=1) * ((niveles - 1) / np.where(capacidad_max > 0, capacidad_max, 1))[:, None]
+    nivel = np.count_nonzero(tramos[:, None, :] < -pendientes[:, :, None], axis=2)
+    return capacidad_max[:, None] * nivel / (niveles - 1)
+
+
+def _destino_optimo(limites, minimos):
+    # Carga final que minimiza coste de la hora más valor (ambos convexos): en el tramo k el óptimo
+    # sin restricciones es el mínimo k, así que el global es el mayor de los mínimos acotados por el
+    # final de su tramo, ignorando los tramos vacíos
+    destino = limites[0]
+    for tramo in range(len(limites) - 1):
+        inicio, fin = limites[tramo], limites[tramo + 1]
+        destino = np.where(fin > inicio, np.maximum(destino, np.minimum(minimos[..., tramo], fin)), destino)
+    return np.minimum(destino, limites[-1])
+
+
+def _interpolar(valor, carga, escala):
+    # Función de valor (baterías, niveles) interpolada linealmente en cargas de forma (baterías, ...)
+    forma = carga.shape
+    posicion = (carga * escala.reshape((-1,) + (1,) * (carga.ndim - 1))).reshape(forma[0], -1)
+    izquierda = np.clip(np.floor(posicion).astype(np.intp), 0, valor.shape[1] - 2)
+    peso = posicion - izquierda
+    resultado = (np.take_along_axis(valor, izquierda, axis=1) * (1 - peso)
+                 + np.take_along_axis(valor, izquierda + 1, axis=1) * peso)
+    return resultado.reshape(forma)
+
+
+def optimizar_despacho(energia_generada, consumo, capacidad_bateria_max, carga_inicial_bateria,
+                       tarifa_pvpc_kwh, precio_energia_kwh, eficiencia_bateria=EFICIENCIA_BATERIA,
+                       carga_desde_red=False, limite_exportacion=None, niveles=NIVELES_CARGA):
+    # Arbitraje por programación dinámica (inducción hacia atrás). La función de valor se calcula en una
+    # rejilla de estados de carga y se interpola entre niveles, de modo que la carga es continua: cada
+    # hora puede almacenar cualquier fracción del excedente o descargar exactamente lo que conviene, y
+    # la mejor carga final se obtiene directamente de los tramos de coste (_destino_optimo). Todas las
+    # baterías se resuelven a la vez: las operaciones se difunden sobre (baterías, niveles) y solo el
+    # recorrido de las horas es secuencial. Mismas entradas y salidas que despacho.simular_despacho.
+    # Requiere 0 <= precio <= tarifa en todas las horas (coste de la hora convexo, ver _tramos): las
+    # baterías con alguna hora fuera de ese rango se resuelven con optimizacion_lp
+    energia_generada = np.atleast_2d(np.asarray(energia_generada, dtype=float))
+    forma = energia_generada.shape
+    baterias, horas = forma
+    consumo = np.broadcast_to(np.asarray(consumo, dtype=float), forma)
+    tarifa = np.broadcast_to(np.asarray(tarifa_pvpc_kwh, dtype=float), forma)
+    precio = np.broadcast_to(np.asarray(precio_energia_kwh, dtype=float), forma)
+    capacidad_max = np.broadcast_to(np.asarray(capacidad_bateria_max, dtype=float), (baterias,))
+    carga_inicial = np.broadcast_to(np.asarray(carga_inicial_bateria, dtype=float), (baterias,))
+    desde_red = np.broadcast_to(np.asarray(carga_desde_red, dtype=bool), (baterias,))
+    limite = np.broadcast_to(np.asarray(np.inf if limite_exportacion is None else limite_exportacion, dtype=float), (baterias,))
+
+    no_convexas = ((precio > tarifa) | (precio < 0)).any(axis=1)
+    if no_convexas.any():
+        convexas = ~no_convexas
+        lp = optimizar_despacho_lp(energia_generada[no_convexas], consumo[no_convexas], capacidad_max[no_convexas],
+                                   carga_inicial[no_convexas], tarifa[no_convexas], precio[no_convexas],
+                                   eficiencia_bateria, desde_red[no_convexas], limite[no_convexas])
+        if not convexas.any():
+            return lp
+        dp = optimizar_despacho(energia_generada[convexas], consumo[convexas], capacidad_max[convexas],
+                                carga_inicial[convexas], tarifa[convexas], precio[convexas],
+                                eficiencia_bateria, desde_red[convexas], limite[convexas], niveles)
+        resultado = {clave: np.empty(forma) for clave in dp}
+        for clave in resultado:
+            resultado[clave][convexas] = dp[clave]
+            resultado[clave][no_convexas] = lp[clave]
+        return resultado
+
+    # Carteras grandes: por bloques de baterías, con el mismo resultado
+    bloque = max(1, min(ELEMENTOS_BLOQUE // (niveles * 7), ELEMENTOS_VALORES // (niveles * horas)))
+    if baterias > bloque:
+        partes = [
+            optimizar_despacho(energia_generada[i:i + bloque], consumo[i:i + bloque], capacidad_max[i:i + bloque],
+                               carga_inicial[i:i + bloque], tarifa[i:i + bloque], precio[i:i + bloque],
+                               eficiencia_bateria, desde_red[i:i + bloque], limite[i:i + bloque], niveles)
+            for i in range(0, baterias, bloque)
+        ]
+        return {clave: np.concatenate([parte[clave] for parte in partes]) for clave in partes[0]}
+
+    # Rejilla de estados de carga de cada batería, forma (baterías, niveles), y su inversa para interpolar
+    rejilla = capacidad_max[:, None] * np.linspace(0, 1, niveles)[None, :]
+    escala = np.where(capacidad_max > 0, (niveles - 1) / np.where(capacidad_max > 0, capacidad_max, 1), 0)
+    pendientes = _pendientes(tarifa, precio, eficiencia_bateria)
+
+    def paso(hora, carga, valor_siguiente):
+        # Mejor carga final desde cada carga de origen (baterías, orígenes) y su coste más valor
+        columna = (slice(None), hora, None)
+        limites = _tramos(carga, capacidad_max[:, None], energia_generada[columna], consumo[columna],
+                          desde_red[:, None], limite[:, None], eficiencia_bateria)
+        destino = _destino_optimo(limites, _minimos(valor_siguiente, pendientes[:, hora], capacidad_max)[:, None, :])
+        entrada_bateria, salida_bateria = _entrada_salida(carga, destino, eficiencia_bateria)
+        _, compra, venta, _ = _flujos_transicion(entrada_bateria, salida_bateria, energia_generada[columna],
+                                                 consumo[columna], desde_red[:, None], limite[:, None])
+        coste = tarifa[columna] * compra - precio[columna] * venta
+        return destino, coste + _interpolar(valor_siguiente, destino, escala)
+
+    # Inducción hacia atrás: valor de cada nivel de la rejilla al final de cada hora. float32 basta para
+    # la precisión de los importes y reduce la memoria en horizontes largos
+    valores = np.empty((horas, baterias, niveles), dtype=np.float32)
+    valor = np.zeros((baterias, niveles))
+    for hora in range(horas - 1, -1, -1):
+        valores[hora] = valor
+        if hora > 0:
+            valor = paso(hora, rejilla, valor)[1]
+
+    # Recorrido hacia delante desde la carga inicial exacta, con la mejor carga final de cada hora
+    carga_por_hora = np.empty(forma)
+    carga = carga_inicial[:, None]
+    for hora in range(horas):
+        carga = paso(hora, carga, valores[hora].astype(float))[0]
+        carga_por_hora[:, hora] = carga[:, 0]
+
+    carga_previa = np.column_stack([carga_inicial, carga_por_hora[:, :-1]])
+    entrada_bateria, salida_bateria = _entrada_salida(carga_previa, carga_por_hora, eficiencia_bateria)
+    autoconsumo, compra, venta, carga_red = _flujos_transicion(
+        entrada_bateria, salida_bateria, energia_generada, consumo, desde_red[:, None], limite[:, None],
+    )
+
+    return {
+        'energia_generada': energia_generada,
+        'consumo': consumo,
+        'energia_autoconsumida': autoconsumo,
+        'energia_almacenada': np.maximum(carga_por_hora - carga_previa, 0),
+        'energia_vendida': venta,
+        # Los destinos acotados nunca descargan más que el consumo de la hora
+        'energia_bateria_utilizada': salida_bateria,
+        'energia_cargada_red': carga_red,
+        # La compra total a la red incluye la energía usada para cargar la batería
+        'energia_red': compra,
+        'capacidad_bateria_actual': carga_por_hora,
+    }
@@ -0,0 +1,132 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+from despacho import EFICIENCIA_BATERIA
+
+# Variables del problema por hora, en bloques consecutivos de `horas` columnas
+VARIABLES = [
+    'autoconsumo',  # Generación solar consumida directamente
+    'carga_solar',  # Generación solar enviada a la batería
+    'venta',  # Generación solar vendida a la red
+    'carga_red',  # Energía comprada a la red para cargar la batería
+    'descarga',  # Energía entregada por la batería al consumo
+    'compra',  # Energía comprada a la red para el consumo
+    'carga',  # Estado de carga de la batería al final de la hora
+]
+_COLUMNA = {nombre: i for i, nombre in enumerate(VARIABLES)}
+
+
+@lru_cache(maxsize=32)
+def _estructura(horas, eficiencia, limitar_potencia):
+    # Las matrices solo dependen del número de horas y de la eficiencia: se construyen una vez
+    # (dispersas) y se reutilizan en todas las resoluciones, cambiando únicamente costes y límites
+    identidad = sp.identity(horas, format='csr')
+    cero = sp.csr_matrix((horas, horas))
+
+    def fila(**coeficientes):
+        bloques = [cero] * len(VARIABLES)
+        for nombre, matriz in coeficientes.items():
+            bloques[_COLUMNA[nombre]] = matriz
+        return sp.hstack(bloques, format='csr')
+
+    # carga_t - carga_{t-1} - ef * (carga_solar_t + carga_red_t) + descarga_t / ef = 0
+    diferencia = identidad - sp.eye(horas, k=-1, format='csr')
+    a_eq = sp.vstack([
+        # El consumo se cubre con autoconsumo, batería o red
+        fila(autoconsumo=identidad, descarga=identidad, compra=identidad),
+        fila(carga=diferencia, carga_solar=-eficiencia * identidad, carga_red=-eficiencia * identidad,
+             descarga=identidad / eficiencia),
+    ], format='csr')
+
+    # La generación solar se reparte entre autoconsumo, batería y venta (el resto se pierde)
+    filas_ub = [fila(autoconsumo=identidad, carga_solar=identidad, venta=identidad)]
+    if limitar_potencia:
+        filas_ub.append(fila(carga_solar=identidad, carga_red=identidad))
+    a_ub = sp.vstack(filas_ub, format='csr')
+    return a_eq, a_ub
+
+
+def _resolver_escenario(generacion, consumo, capacidad_max, carga_inicial, tarifa, precio, eficiencia,
+                        carga_desde_red, limite_exportacion, potencia_bateria):
+    horas = len(generacion)
+    limitar_potencia = potencia_bateria is not None
+    a_eq, a_ub = _estructura(horas, eficiencia, limitar_potencia)
+
+    # Minimizar el coste de la energía comprada menos los ingresos por la venta de excedentes
+    coste = np.zeros((len(VARIABLES), horas))
+    coste[_COLUMNA['compra']] = tarifa
+    coste[_COLUMNA['carga_red']] = tarifa
+    coste[_COLUMNA['venta']] = -precio
+
+    b_eq = np.concatenate([consumo, np.zeros(horas)])
+    b_eq[horas] = carga_inicial  # La primera hora parte de la carga inicial
+    b_ub = generacion
+    if limitar_potencia:
+        b_ub = np.concatenate([generacion, np.full(horas, potencia_bateria)])
+
+    limites_superiores = np.full((len(VARIABLES), horas), np.inf)
+    limites_superiores[_COLUMNA['carga']] = capacidad_max
+    if not carga_desde_red:
+        limites_superiores[_COLUMNA['carga_red']] = 0
+    if limite_exportacion is not None:
+        limites_superiores[_COLUMNA['venta']] = limite_exportacion
+    if limitar_potencia:
+        limites_superiores[_COLUMNA['descarga']] = potencia_bateria
+    limites = np.column_stack([np.zeros(limites_superiores.size), limites_superiores.ravel()])
+
+    resultado = linprog(coste.ravel(), A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=limites, method='highs')
+    if resultado.status != 0:
+        raise RuntimeError(f"No se pudo optimizar el despacho de la batería: {resultado.message}")
+    return resultado.x.reshape(len(VARIABLES), horas)
+
+
+def optimizar_despacho(energia_generada, consumo, capacidad_bateria_max, carga_inicial_bateria,
+                       tarifa_pvpc_kwh, precio_energia_kwh, eficiencia_bateria=EFICIENCIA_BATERIA,
+                       carga_desde_red=False, limite_exportacion=None, potencia_bateria=None):
+    # Despacho óptimo de la batería con programación lineal (HiGHS), conociendo de antemano los precios.
+    # Mismas entradas y salidas que despacho.simular_despacho, con forma (escenarios, horas)
+    energia_generada = np.atleast_2d(np.asarray(energia_generada, dtype=float))
+    forma = energia_generada.shape
+    escenarios = forma[0]
+    consumo = np.broadcast_to(np.asarray(consumo, dtype=float), forma)
+    tarifa = np.broadcast_to(np.asarray(tarifa_pvpc_kwh, dtype=float), forma)
+    precio = np.broadcast_to(np.asarray(precio_energia_kwh, dtype=float), forma)
+    capacidad_max = np.broadcast_to(np.asarray(capacidad_bateria_max, dtype=float), (escenarios,))
+    carga_inicial = np.broadcast_to(np.asarray(carga_inicial_bateria, dtype=float), (escenarios,))
+    carga_desde_red = np.broadcast_to(np.asarray(carga_desde_red, dtype=bool), (escenarios,))
+    limite_exportacion = np.broadcast_to(np.asarray(limite_exportacion, dtype=object), (escenarios,))
+
+    solucion = np.stack([
+        _resolver_escenario(energia_generada[i], consumo[i], capacidad_max[i], carga_inicial[i], tarifa[i], precio[i],
+                            eficiencia_bateria, bool(carga_desde_red[i]), limite_exportacion[i], potencia_bateria)
+        for i in range(escenarios)
+    ])
+    variable = {nombre: solucion[:, j] for nombre, j in _COLUMNA.items()}
+
+    return {
+        'energia_generada': energia_generada,
+        'consumo': consumo,
+        'energia_autoconsumida': variable['autoconsumo'],
+        'energia_almacenada': eficiencia_bateria * (variable['carga_solar'] + variable['carga_red']),
+        'energia_vendida': variable['venta'],
+        'energia_bateria_utilizada': variable['descarga'],
+        'energia_cargada_red': variable['carga_red'],
+        # La compra total a la red incluye la energía usada para cargar la batería
+        'energia_red': variable['compra'] + variable['carga_red'],
+        'capacidad_bateria_actual': variable['carga'],
+    }
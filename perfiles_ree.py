@@ -0,0 +1,258 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import io
+import logging
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import numpy as np
+import pandas as pd
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Descarga y normalización de los perfiles de consumo mensuales de REE. En lugar de manejar un navegador,
+# se lee el formulario de la página (campos ocultos de Drupal y opciones de mes y año) y se envía
+# directamente por HTTP. Los archivos se guardan tal cual en un directorio y se procesan en paralelo,
+# de modo que el mismo análisis funciona sin conexión sobre archivos descargados previamente
+
+# Página con el formulario de descarga (configurable para apuntar a un servidor local de pruebas)
+URL_PERFILES = "https://www.ree.es/en/node/13430"
+
+# Identificador del botón de descarga dentro del formulario
+BOTON = 'submit_simel'
+
+# Los perfiles se publican por hora peninsular
+ZONA = 'Europe/Madrid'
+
+# Perfiles de las tarifas de acceso que se conservan
+PERFILES = ['A', 'B', 'C', 'D']
+COLUMNAS_PERFIL = [f'COEF. PERFIL {perfil}' for perfil in PERFILES]
+
+EXTENSIONES = ('.csv', '.txt', '.zip')
+
+
+# Errores del formulario o de un archivo que no se puede interpretar
+class ErrorPerfiles(Exception):
+    pass
+
+
+# Extrae del HTML el formulario que contiene el botón de descarga: acción, campos ocultos y opciones
+class _LectorFormulario(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.formularios = []
+        self._select = None
+
+    def handle_starttag(self, etiqueta, atributos):
+        atributos = dict(atributos)
+        if etiqueta == 'form':
+            self.formularios.append({'accion': atributos.get('action'), 'ocultos': {}, 'selects': {}, 'boton': None})
+        if not self.formularios:
+            return
+        formulario = self.formularios[-1]
+        if etiqueta == 'input' and atributos.get('type') == 'hidden' and atributos.get('name'):
+            formulario['ocultos'][atributos['name']] = atributos.get('value', '')
+        elif etiqueta in ('input', 'button') and atributos.get('id') == BOTON:
+            formulario['boton'] = (atributos.get('name', 'op'), atributos.get('value', ''))
+        elif etiqueta == 'select':
+            self._select = atributos.get('name')
+            formulario['selects'][self._select] = []
+        elif etiqueta == 'option' and self._select and atributos.get('value', '').isdigit():
+            formulario['selects'][self._select].append(int(atributos['value']))
+
+    def handle_endtag(self, etiqueta):
+        if etiqueta == 'select':
+            self._select = None
+
+
+def leer_formulario(html, url):
+    lector = _LectorFormulario()
+    lector.feed(html)
+    formulario = next((f for f in lector.formularios if f['boton']), None)
+    if formulario is None or not {'month', 'year'} <= set(formulario['selects']):
+        raise ErrorPerfiles(f"No se encuentra el formulario de descarga en {url}")
+    formulario['accion'] = urljoin(url, formulario['accion'] or url)
+    return formulario
+
+
+def _nombre_archivo(respuesta, anio, mes):
+    disposicion = respuesta.headers.get('Content-Disposition', '')
+    nombre = re.search(r'filename="?([^";]+)"?', disposicion)
+    nombre = os.path.basename(nombre.group(1)) if nombre else ''
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension not in EXTENSIONES:
+        extension = '.zip' if respuesta.content[:2] == b'PK' else '.csv'
+    # El año y el mes van siempre en el nombre: el parser los usa si el archivo no trae la columna del año
+    return f'perfil_{anio}{mes:02d}{extension}'
+
+
+def _descargar_mes(url, anio, mes, directorio, timeout):
+    # Cada mes con su propia sesión: Drupal asocia el formulario (form_build_id) a la página leída
+    with requests.Session() as sesion:
+        pagina = sesion.get(url, timeout=timeout)
+        pagina.raise_for_status()
+        formulario = leer_formulario(pagina.text, url)
+        datos = dict(formulario['ocultos'], month=str(mes), year=str(anio))
+        datos[formulario['boton'][0]] = formulario['boton'][1]
+        respuesta = sesion.post(formulario['accion'], data=datos, timeout=timeout)
+        respuesta.raise_for_status()
+    if 'text/html' in respuesta.headers.get('Content-Type', ''):
+        raise ErrorPerfiles(f"{anio}-{mes:02d}: la respuesta no es un archivo")
+    ruta = os.path.join(directorio, _nombre_archivo(respuesta, anio, mes))
+    with open(ruta + '.tmp', 'wb') as f:
+        f.write(respuesta.content)
+    os.replace(ruta + '.tmp', ruta)
+    return ruta
+
+
+def meses_descargados(directorio):
+    meses = set()
+    for archivo in os.listdir(directorio) if os.path.isdir(directorio) else []:
+        coincidencia = re.match(r'perfil_(\d{4})(\d{2})\.', archivo)
+        if coincidencia and archivo.lower().endswith(EXTENSIONES):
+            meses.add((int(coincidencia.group(1)), int(coincidencia.group(2))))
+    return meses
+
+
+def descargar(directorio, url=URL_PERFILES, desde_anio=None, hilos=4, timeout=60):
+    # Descarga los meses publicados (hasta el mes anterior al actual) que no estén ya en el directorio.
+    # Devuelve (descargados, fallidos)
+    os.makedirs(directorio, exist_ok=True)
+    pagina = requests.get(url, timeout=timeout)
+    pagina.raise_for_status()
+    formulario = leer_formulario(pagina.text, url)
+
+    hoy = pd.Timestamp.now(tz=ZONA)
+    existentes = meses_descargados(directorio)
+    pendientes = [
+        (anio, mes)
+        for anio in sorted(formulario['selects']['year'])
+        for mes in sorted(formulario['selects']['month'])
+        if (anio, mes) < (hoy.year, hoy.month) and (desde_anio is None or anio >= desde_anio) and (anio, mes) not in existentes
+    ]
+    logger.info("%d meses ya descargados, %d pendientes", len(existentes), len(pendientes))
+
+    descargados, fallidos = [], []
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        futuros = {executor.submit(_descargar_mes, url, anio, mes, directorio, timeout): (anio, mes) for anio, mes in pendientes}
+        for futuro in as_completed(futuros):
+            anio, mes = futuros[futuro]
+            try:
+                descargados.append(futuro.result())
+                logger.info("Perfil de %d-%02d descargado", anio, mes)
+            except (requests.RequestException, ErrorPerfiles) as e:
+                logger.error("Error en %d-%02d: %s", anio, mes, e)
+                fallidos.append((anio, mes, str(e)))
+    return sorted(descargados), fallidos
+
+
+def _textos(ruta):
+    # Contenido de un archivo de perfiles (o de los CSV de un zip), decodificado
+    if ruta.lower().endswith('.zip'):
+        with zipfile.ZipFile(ruta) as comprimido:
+            contenidos = [comprimido.read(n) for n in comprimido.namelist() if n.lower().endswith(('.csv', '.txt'))]
+    else:
+        with open(ruta, 'rb') as f:
+            contenidos = [f.read()]
+    for contenido in contenidos:
+        try:
+            yield contenido.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            yield contenido.decode('latin-1')
+
+
+def _nombre_columna(columna):
+    columna = columna.strip().upper()
+    perfil = re.search(r'COEF.*PERFIL\s*([A-D])\b', columna)
+    if perfil:
+        return f'COEF. PERFIL {perfil.group(1)}'
+    for nombre, alias in (('mes', ('MES', 'MONTH')), ('dia', ('DIA', 'DÍA', 'DAY')),
+                          ('hora', ('HORA', 'HOUR')), ('anio', ('AÑO', 'ANO', 'ANIO', 'YEAR'))):
+        if columna in alias:
+            return nombre
+    return columna
+
+
+def leer_archivo(ruta):
+    # Tabla normalizada de un archivo mensual: año, día del año (calendario bisiesto, 29 de febrero = 60),
+    # hora local y coeficientes de los perfiles. Admite ';' o ',' como separador, coma decimal, horas
+    # 1-24 (con la 25 del día de 25 horas) o 0-23, y el año en una columna o en el nombre del archivo
+    tablas = []
+    for texto in _textos(ruta):
+        lineas = texto.splitlines()
+        cabecera = next((i for i, linea in enumerate(lineas) if re.search(r'COEF.*PERFIL', linea.upper())), None)
+        if cabecera is None:
+            continue
+        separador = ';' if lineas[cabecera].count(';') >= lineas[cabecera].count(',') else ','
+        df = pd.read_csv(io.StringIO('\n'.join(lineas[cabecera:])), sep=separador, dtype=str)
+        df = df.rename(columns=_nombre_columna)
+        perfiles = [c for c in COLUMNAS_PERFIL if c in df]
+        if not perfiles or not {'mes', 'dia', 'hora'} <= set(df):
+            raise ErrorPerfiles(f"{ruta}: columnas no reconocidas ({list(df.columns)})")
+        if 'anio' not in df:
+            anio = re.search(r'(20\d{2})(\d{2})', os.path.basename(ruta))
+            if anio is None:
+                raise ErrorPerfiles(f"{ruta}: sin columna de año ni año en el nombre")
+            df['anio'] = anio.group(1)
+        df = df[['anio', 'mes', 'dia', 'hora', *perfiles]]
+        df = df.apply(lambda c: pd.to_numeric(c.str.strip().str.replace(',', '.'), errors='coerce')).dropna(subset=['anio', 'mes', 'dia', 'hora'])
+        tablas.append(df)
+    if not tablas:
+        raise ErrorPerfiles(f"{ruta}: sin tabla de perfiles")
+    df = pd.concat(tablas, ignore_index=True).astype({'anio': int, 'mes': int, 'dia': int, 'hora': int})
+
+    # Periodo horario (1 = primera hora del día) a hora local: en el día de 25 horas dos periodos caen en
+    # la misma hora y en el de 23 horas falta una; se resuelve al construir el año típico
+    periodo = df['hora'] - (1 if df['hora'].min() >= 1 else 0)
+    medianoche = pd.to_datetime(pd.DataFrame({'year': df['anio'], 'month': df['mes'], 'day': df['dia']})).dt.tz_localize(ZONA)
+    instante = (medianoche + pd.to_timedelta(periodo, unit='h')).dt.tz_convert(ZONA)
+    dia = instante.dt.dayofyear + ((~instante.dt.is_leap_year) & (instante.dt.month > 2))
+    normalizado = pd.DataFrame({'anio': df['anio'], 'day': dia, 'hour': instante.dt.hour})
+    for columna in COLUMNAS_PERFIL:
+        normalizado[columna] = df[columna] if columna in df else np.nan
+    return normalizado
+
+
+def leer_directorio(directorio, procesos=None):
+    # Procesa en paralelo todos los archivos del directorio. Devuelve (tabla, errores)
+    rutas = sorted(
+        os.path.join(directorio, archivo) for archivo in os.listdir(directorio) if archivo.lower().endswith(EXTENSIONES)
+    )
+    tablas, errores = [], []
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        futuros = {executor.submit(leer_archivo, ruta): ruta for ruta in rutas}
+        for futuro in as_completed(futuros):
+            try:
+                tablas.append(futuro.result())
+            except (ErrorPerfiles, ValueError, zipfile.BadZipFile) as e:
+                errores.append((futuros[futuro], str(e)))
+    if not tablas:
+        raise ErrorPerfiles(f"No hay archivos de perfiles válidos en {directorio}" + (f" ({errores[0][1]})" if errores else ""))
+    return pd.concat(tablas, ignore_index=True), errores
+
+
+def anio_tipico(perfiles):
+    # Año típico con el esquema de typical_year_profile.csv (day 1-366, hour 0-23 y un coeficiente por
+    # perfil): primero se unen las horas repetidas de cada año y luego se promedian los años. Las celdas
+    # sin datos (la hora que no existe en el cambio de horario de un único año) se interpolan
+    por_anio = perfiles.groupby(['anio', 'day', 'hour'])[COLUMNAS_PERFIL].mean()
+    tipico = por_anio.groupby(['day', 'hour']).mean()
+    rejilla = pd.MultiIndex.from_product([range(1, 367), range(24)], names=['day', 'hour'])
+    tipico = tipico.reindex(rejilla)
+    tipico = tipico.interpolate(limit_direction='both')
+    return tipico.reset_index()
@@ -0,0 +1,157 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import asyncio
+import datetime
+import logging
+
+import aiohttp
+import pandas as pd
+
+from almacen_datos import existe, guardar, leer
+from descarga_pvgis import ErrorDescarga, LimitadorTasa, pedir
+
+logger = logging.getLogger(__name__)
+
+# Ingesta incremental de los precios horarios de REE (PVPC y mercado spot). En cada ejecución se
+# comparan las horas guardadas con las esperadas en el rango pedido, se descargan solo los días que
+# faltan o están incompletos (agrupados en peticiones de varios días) y se integran en los datasets
+# Parquet sustituyendo las horas repetidas: relanzarla nunca duplica filas
+
+# Servicio de precios de REE (configurable para apuntar a un servidor local de pruebas)
+URL_REE = "https://apidatos.ree.es/es/datos/mercados/precios-mercados-tiempo-real"
+
+# Los precios se publican en hora peninsular: los días de cambio de hora tienen 23 o 25 horas
+ZONA = 'Europe/Madrid'
+
+# Serie de la respuesta que se guarda en cada dataset (se identifica por su título)
+SERIES = {'precio_pvpc': 'pvpc', 'precio_spot': 'spot'}
+
+# La API limita el rango de las consultas horarias; las peticiones se trocean en bloques de días
+DIAS_POR_PETICION = 31
+
+
+def horas_esperadas(desde, hasta):
+    # Todas las horas de los días locales [desde, hasta]. El rango se construye en tiempo absoluto, así
+    # que el último domingo de marzo tiene 23 horas y el último de octubre 25
+    inicio = pd.Timestamp(desde).tz_localize(ZONA)
+    fin = (pd.Timestamp(hasta) + pd.Timedelta(days=1)).tz_localize(ZONA)
+    return pd.date_range(inicio, fin, freq='h', inclusive='left')
+
+
+def dias_incompletos(guardadas, desde, hasta):
+    # Días locales del rango con alguna hora sin guardar
+    esperadas = horas_esperadas(desde, hasta)
+    faltan = esperadas.difference(pd.DatetimeIndex(guardadas).tz_convert(ZONA))
+    return sorted(set(faltan.tz_convert(ZONA).date))
+
+
+def agrupar_rangos(dias, maximo=DIAS_POR_PETICION):
+    # Días consecutivos agrupados en rangos (inicio, fin) de como mucho 'maximo' días
+    rangos = []
+    for dia in dias:
+        if rangos and (dia - rangos[-1][1]).days == 1 and (dia - rangos[-1][0]).days < maximo:
+            rangos[-1][1] = dia
+        else:
+            rangos.append([dia, dia])
+    return [tuple(rango) for rango in rangos]
+
+
+def _horas_guardadas(nombre, raiz, desde, hasta):
+    try:
+        return leer(nombre, columnas=['datetime'], desde=desde, hasta=hasta, raiz=raiz)['datetime']
+    except FileNotFoundError:
+        return pd.Series([], dtype=f'datetime64[ns, {ZONA}]')
+
+
+def _convertir_respuesta(datos, inicio, fin):
+    # Una tabla (datetime, value, percentage) por dataset, limitada a los días pedidos
+    incluidas = {}
+    for serie in (datos or {}).get('included', []):
+        titulo = serie.get('attributes', {}).get('title', '') + ' ' + str(serie.get('type', ''))
+        for nombre, clave in SERIES.items():
+            if clave in titulo.lower():
+                incluidas[nombre] = serie['attributes']['values']
+    if set(incluidas) != set(SERIES):
+        raise ErrorDescarga(f"Respuesta sin las series {sorted(set(SERIES) - set(incluidas))}")
+
+    limites = horas_esperadas(inicio, fin)
+    tablas = {}
+    for nombre, valores in incluidas.items():
+        df = pd.DataFrame(valores, columns=['value', 'percentage', 'datetime'])
+        df['datetime'] = pd.to_datetime(df['datetime'], utc=True).dt.tz_convert(ZONA)
+        tablas[nombre] = df[(df['datetime'] >= limites[0]) & (df['datetime'] <= limites[-1])]
+    return tablas
+
+
+def integrar(nombre, nuevos, raiz=None):
+    # Upsert por instante: se leen los años afectados, las horas nuevas sustituyen a las guardadas y se
+    # reescriben solo esas particiones. Si el conjunto aún está en CSV, se migra completo
+    if nuevos.empty:
+        return 0
+    nuevos = nuevos.copy()
+    nuevos['datetime'] = pd.to_datetime(nuevos['datetime'], utc=True).dt.tz_convert(ZONA)
+    anios = sorted(set(nuevos['datetime'].dt.year))
+    try:
+        existentes = leer(nombre, filtros={'anio': anios} if existe(nombre, raiz) else None, raiz=raiz)
+    except FileNotFoundError:
+        existentes = nuevos.iloc[:0]
+    df = pd.concat([existentes.drop(columns=['anio'], errors='ignore'), nuevos], ignore_index=True)
+    df = df.drop_duplicates('datetime', keep='last').sort_values('datetime')
+    guardar(nombre, df, raiz=raiz)
+    return len(nuevos)
+
+
+async def actualizar(desde, hasta=None, raiz=None, url=URL_REE, dias_por_peticion=DIAS_POR_PETICION,
+                     concurrencia=4, peticiones_por_segundo=2, reintentos=4, espera_base=1., timeout=60):
+    # Completa los datasets de precios en los días locales [desde, hasta] (por defecto hasta hoy).
+    # Devuelve el resumen: peticiones hechas, filas integradas, rangos fallidos y días aún incompletos
+    hasta = hasta or datetime.date.today()
+    desde, hasta = pd.Timestamp(desde).date(), pd.Timestamp(hasta).date()
+    limites = horas_esperadas(desde, hasta)
+
+    dias = set()
+    for nombre in SERIES:
+        dias.update(dias_incompletos(_horas_guardadas(nombre, raiz, limites[0], limites[-1]), desde, hasta))
+    rangos = agrupar_rangos(sorted(dias), dias_por_peticion)
+    resumen = {'peticiones': len(rangos), 'filas': dict.fromkeys(SERIES, 0), 'fallidas': [], 'incompletos': {}}
+    logger.info("%d días por completar en %d peticiones", len(dias), len(rangos))
+
+    limitador = LimitadorTasa(peticiones_por_segundo)
+    semaforo = asyncio.Semaphore(concurrencia)
+    descargados = {nombre: [] for nombre in SERIES}
+
+    async def procesar(sesion, inicio, fin):
+        parametros = {'start_date': f'{inicio}T00:00', 'end_date': f'{fin}T23:59', 'time_trunc': 'hour'}
+        async with semaforo:
+            try:
+                datos = await pedir(sesion, limitador, url, parametros, reintentos, espera_base)
+                tablas = _convertir_respuesta(datos, inicio, fin)
+            except ErrorDescarga as e:
+                logger.error("Error en %s - %s: %s", inicio, fin, e)
+                resumen['fallidas'].append((str(inicio), str(fin), str(e)))
+                return
+        for nombre, tabla in tablas.items():
+            descargados[nombre].append(tabla)
+
+    cabeceras = {'Accept': 'application/json; application/vnd.esios-api-v1+json', 'Content-Type': 'application/json'}
+    async with aiohttp.ClientSession(headers=cabeceras, timeout=aiohttp.ClientTimeout(total=timeout)) as sesion:
+        await asyncio.gather(*(procesar(sesion, inicio, fin) for inicio, fin in rangos))
+
+    # Una sola escritura por dataset, con todo lo descargado
+    for nombre, tablas in descargados.items():
+        if tablas:
+            resumen['filas'][nombre] = await asyncio.to_thread(integrar, nombre, pd.concat(tablas, ignore_index=True), raiz)
+        incompletos = dias_incompletos(_horas_guardadas(nombre, raiz, limites[0], limites[-1]), desde, hasta)
+        if incompletos:
+            resumen['incompletos'][nombre] = incompletos
+    return resumen
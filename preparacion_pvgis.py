@@ -10,15 +10,14 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFB), centra
 Fecha: 07/09/2024
 """
 
-import pandas as pd
+from almacen_datos import guardar, leer
+from sitios import serie_anio_tipico
 
-data = pd.read_csv('typical_year_spain_corrected.csv')
+# Solo se lee la partición de la capital y las columnas necesarias del año típico
+capital_data = leer('anio_tipico', columnas=['day', 'hour', 'G(i)', 'T2m'], filtros={'capital': 'Albacete'})
 
-capital_data = data
-capital_data = data[(data['capital'] == 'Albacete')]
+capital_data = serie_anio_tipico(capital_data)[['datetime', 'G(i)', 'T2m']]
+print(capital_data.head())
 
-capital_data['datetime'] = pd.to_datetime((capital_data['day'] - 1) * 24 + capital_data['hour'], unit='h', origin='2023-01-01')
-capital_data.set_index('datetime', inplace=True)
-capital_data.drop(columns=['day', 'hour'], inplace=True)
-print(capital_data.head)
-capital_data.to_csv("little_typical_year_spain_corrected.csv")
+# Serie horaria con la que se entrenan los modelos de irradiación
+guardar('serie_irradiacion', capital_data)
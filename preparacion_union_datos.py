@@ -10,38 +10,134 @@ Descripción: Este código forma parte del trabajo de fin de grado (TFB), centra
 Fecha: 07/09/2024
 """
 
+import argparse
+import resource
+
+import numpy as np
 import pandas as pd
+import pyarrow.dataset as ds
+
+from almacen_datos import RAIZ_DATOS, existe, guardar, ruta_conjunto, _particionado
+
+# Construcción del "año típico" de cada (capital, inclinación, orientación) a partir de las series
+# horarias de PVGIS. Se recorre el dataset Parquet combinación a combinación y por lotes, acumulando
+# en arrays preasignados la suma, el número de observaciones y un histograma por (día del año, hora).
+# De ahí salen la media y los percentiles P10/P50/P90 sin cargar nunca la serie completa: la memoria
+# no depende de cuántos años ni cuántas ubicaciones se procesen.
+
+DIAS = 366
+HORAS = 24
+PERCENTILES = [10, 50, 90]
+
+parser = argparse.ArgumentParser(description="Genera el año típico (media y percentiles) de las series de PVGIS")
+parser.add_argument('--raiz', default=RAIZ_DATOS, help="Directorio de los datos")
+parser.add_argument('--capitales', nargs='*', help="Procesar solo estas capitales")
+parser.add_argument('--filas-lote', type=int, default=500_000, help="Filas leídas por lote")
+parser.add_argument('--ancho-irradiacion', type=float, default=2., help="Resolución de los percentiles de G(i) (W/m2)")
+parser.add_argument('--ancho-temperatura', type=float, default=0.2, help="Resolución de los percentiles de T2m (ºC)")
+args = parser.parse_args()
+
+
+# Acumulador de una variable para las 366 x 24 celdas del año típico
+class Acumulador:
+    def __init__(self, minimo, maximo, ancho):
+        self.minimo = minimo
+        self.ancho = ancho
+        self.intervalos = int(np.ceil((maximo - minimo) / ancho))
+        self.suma = np.zeros(DIAS * HORAS)
+        self.cuenta = np.zeros(DIAS * HORAS, dtype=np.int64)
+        self.histograma = np.zeros((DIAS * HORAS, self.intervalos), dtype=np.uint32)
+
+    def reiniciar(self):
+        self.suma[:] = 0
+        self.cuenta[:] = 0
+        self.histograma[:] = 0
+
+    def anadir(self, celda, valores):
+        validos = ~np.isnan(valores)
+        celda, valores = celda[validos], valores[validos]
+        self.suma += np.bincount(celda, weights=valores, minlength=DIAS * HORAS)
+        self.cuenta += np.bincount(celda, minlength=DIAS * HORAS)
+        intervalo = np.clip(((valores - self.minimo) / self.ancho).astype(np.int64), 0, self.intervalos - 1)
+        np.add.at(self.histograma.reshape(-1), celda * self.intervalos + intervalo, 1)
+
+    def media(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.suma / self.cuenta
+
+    def estadistico_orden(self, acumulado, k):
+        # Valor (centro del intervalo) de la k-ésima observación ordenada de cada celda, k desde 1
+        indice = np.minimum((acumulado < k[:, None]).sum(axis=1), self.intervalos - 1)
+        return self.minimo + (indice + 0.5) * self.ancho
+
+    def percentil(self, q):
+        # Misma definición que np.percentile (interpolación lineal entre observaciones ordenadas), con
+        # las observaciones localizadas en el histograma: error máximo de medio intervalo
+        acumulado = np.cumsum(self.histograma, axis=1, dtype=np.int64)
+        posicion = (self.cuenta - 1) * q / 100
+        inferior = np.floor(posicion)
+        fraccion = posicion - inferior
+        bajo = self.estadistico_orden(acumulado, inferior + 1)
+        alto = self.estadistico_orden(acumulado, np.minimum(inferior + 2, self.cuenta))
+        return np.where(self.cuenta > 0, bajo + fraccion * (alto - bajo), np.nan)
+
 
-# Cargar el dataset completo
-df = pd.read_csv("pvpc_prices.csv", parse_dates=['time'])
+def celda_anio_tipico(instantes):
+    # Día del año en un calendario bisiesto (el 29 de febrero es siempre el día 60) para que el mismo día
+    # de años bisiestos y no bisiestos caiga en la misma celda
+    dia = instantes.dt.dayofyear.to_numpy()
+    dia = dia + ((~instantes.dt.is_leap_year.to_numpy()) & (instantes.dt.month.to_numpy() > 2))
+    return (dia - 1) * HORAS + instantes.dt.hour.to_numpy()
 
-# Extraer día del año, mes y hora para agrupación
-df['day'] = df['time'].dt.dayofyear
-df['hour'] = df['time'].dt.hour
 
-# Agrupar por día del año, mes, hora, capital, slope y azimuth para calcular promedios
-grouped = df.groupby(['capital', 'slope', 'azimuth', 'day', 'hour']).mean().reset_index()
+if not existe('pvgis', args.raiz):
+    parser.error(f"No existe el dataset {ruta_conjunto('pvgis', args.raiz)}; conviértelo antes con conversion_datos.py pvgis")
 
-# Seleccionar solo las columnas relevantes para el "año típico"
-typical_year = grouped[['day', 'hour', 'capital', 'slope', 'azimuth', 'G(i)', 'T2m']]
+dataset = ds.dataset(ruta_conjunto('pvgis', args.raiz), format='parquet', partitioning=_particionado('pvgis'))
 
-# Guardar el "año típico" en un archivo CSV
-typical_year.to_csv("typical_year_pvpc.csv", index=False)
+# Combinaciones presentes, obtenidas de los directorios de las particiones (sin leer datos)
+combinaciones = sorted({
+    (claves['capital'], claves['slope'], claves['azimuth'])
+    for claves in (ds.get_partition_keys(fragmento.partition_expression) for fragmento in dataset.get_fragments())
+})
+if args.capitales:
+    combinaciones = [c for c in combinaciones if c[0] in args.capitales]
 
-# Cargar el dataset completo
-df = pd.read_csv("spot_prices.csv", parse_dates=['time'])
+acumuladores = {
+    'G(i)': Acumulador(0, 1500, args.ancho_irradiacion),
+    'T2m': Acumulador(-40, 60, args.ancho_temperatura),
+}
+dias = np.repeat(np.arange(1, DIAS + 1), HORAS).astype(np.int16)
+horas = np.tile(np.arange(HORAS), DIAS).astype(np.int8)
 
-# Extraer día del año, mes y hora para agrupación
-df['day'] = df['time'].dt.dayofyear
-df['hour'] = df['time'].dt.hour
+# Se guarda capital a capital: cada partición del año típico se escribe una sola vez
+for capital in sorted({c[0] for c in combinaciones}):
+    resultados = []
+    for _, slope, azimuth in [c for c in combinaciones if c[0] == capital]:
+        for acumulador in acumuladores.values():
+            acumulador.reiniciar()
 
-# Agrupar por día del año, mes, hora, capital, slope y azimuth para calcular promedios
-grouped = df.groupby(['capital', 'slope', 'azimuth', 'day', 'hour']).mean().reset_index()
+        filtro = (ds.field('capital') == capital) & (ds.field('slope') == slope) & (ds.field('azimuth') == azimuth)
+        for lote in dataset.to_batches(columns=['time', *acumuladores], filter=filtro, batch_size=args.filas_lote):
+            if lote.num_rows == 0:
+                continue
+            celda = celda_anio_tipico(lote.column('time').to_pandas())
+            for variable, acumulador in acumuladores.items():
+                acumulador.anadir(celda, lote.column(variable).to_numpy(zero_copy_only=False).astype(float))
 
-# Seleccionar solo las columnas relevantes para el "año típico"
-typical_year = grouped[['day', 'hour', 'capital', 'slope', 'azimuth', 'G(i)', 'T2m']]
+        tipico = pd.DataFrame({'day': dias, 'hour': horas})
+        tipico['slope'] = slope
+        tipico['azimuth'] = azimuth
+        for variable, acumulador in acumuladores.items():
+            tipico[variable] = acumulador.media()
+            for q in PERCENTILES:
+                tipico[f'{variable}_p{q}'] = acumulador.percentil(q)
+        tipico['observaciones'] = acumuladores['G(i)'].cuenta
+        tipico['capital'] = capital
+        resultados.append(tipico)
 
-# Guardar el "año típico" en un archivo CSV
-typical_year.to_csv("typical_year_spot.csv", index=False)
+    guardar('anio_tipico', pd.concat(resultados, ignore_index=True), raiz=args.raiz)
+    memoria = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{capital}: {len(resultados)} combinaciones (memoria máxima {memoria:.0f} MB)")
 
 print("Año típico generado y guardado exitosamente.")
@@ -0,0 +1,129 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import hashlib
+import os
+
+import pandas as pd
+
+from almacen_datos import CONJUNTOS, RAIZ_DATOS, existe, leer, ruta_conjunto
+from sitios import normalizar_nombre, serie_anio_tipico
+
+# Series preparadas para los modelos, con un cargador por conjunto. Cada serie preparada (instantes en
+# UTC sin zona, columnas renombradas, año típico pasado a fechas...) se guarda en una caché en disco
+# (<DATOS_PATH>/_cache o CACHE_PATH) identificada por la huella del contenido de los archivos de origen:
+# mientras los datos no cambien, las ejecuciones siguientes leen la serie ya preparada sin volver a
+# interpretar CSV ni convertir zonas horarias. Cambiar VERSION invalida todas las entradas
+
+VERSION = 1
+DIRECTORIO_CACHE = os.environ.get('CACHE_PATH')
+
+# Huellas de los archivos ya leídos en este proceso, por (ruta, tamaño, fecha de modificación)
+_huellas_archivos = {}
+
+
+def _archivos(nombre, raiz=None, particion=None):
+    # Archivos de los que sale un conjunto: los Parquet del dataset (solo los de la partición indicada,
+    # p. ej. {'capital': 'Albacete'}) o, si no se ha convertido, su CSV
+    if not existe(nombre, raiz):
+        return [os.path.join(raiz or RAIZ_DATOS, CONJUNTOS[nombre]['csv'])]
+    ruta = ruta_conjunto(nombre, raiz)
+    for columna, valor in (particion or {}).items():
+        ruta = os.path.join(ruta, f'{columna}={valor}')
+    return sorted(os.path.join(directorio, archivo) for directorio, _, archivos in os.walk(ruta) for archivo in archivos)
+
+
+def _huella_archivo(ruta):
+    estado = os.stat(ruta)
+    clave = (ruta, estado.st_size, estado.st_mtime_ns)
+    if clave not in _huellas_archivos:
+        huella = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                huella.update(bloque)
+        _huellas_archivos[clave] = huella.hexdigest()
+    return _huellas_archivos[clave]
+
+
+def huella_fuentes(archivos):
+    # Huella del contenido de los archivos (no de sus fechas): copiar los datos no invalida la caché
+    huella = hashlib.sha256(str(VERSION).encode())
+    for ruta in archivos:
+        huella.update(_huella_archivo(ruta).encode())
+    return huella.hexdigest()[:16]
+
+
+def directorio_cache(raiz=None):
+    return DIRECTORIO_CACHE or os.path.join(raiz or RAIZ_DATOS, '_cache')
+
+
+def _en_cache(clave, archivos, preparar, raiz=None):
+    # Serie preparada de la caché o, si no está, preparada y guardada (sustituyendo las anteriores de clave)
+    directorio = directorio_cache(raiz)
+    ruta = os.path.join(directorio, f'{clave}-{huella_fuentes(archivos)}.parquet')
+    if os.path.exists(ruta):
+        return pd.read_parquet(ruta)
+
+    df = preparar()
+    os.makedirs(directorio, exist_ok=True)
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    df.to_parquet(temporal, index=False)
+    os.replace(temporal, ruta)
+    for archivo in os.listdir(directorio):
+        if archivo.startswith(f'{clave}-') and archivo.endswith('.parquet') and archivo != os.path.basename(ruta):
+            os.remove(os.path.join(directorio, archivo))
+    return df
+
+
+def serie_irradiacion(raiz=None):
+    # Serie horaria de irradiación y temperatura: índice datetime (UTC, sin zona) y columnas G(i) y T2m
+    df = _en_cache('serie_irradiacion', _archivos('serie_irradiacion', raiz),
+                   lambda: leer('serie_irradiacion', columnas=['datetime', 'G(i)', 'T2m'], raiz=raiz), raiz)
+    return df.set_index('datetime').asfreq('h')
+
+
+def serie_sitio(capital, slope, azimuth, raiz=None):
+    # Año típico de una ubicación como serie horaria de 2023: índice datetime y columnas G(i) y T2m
+    def preparar():
+        datos = leer('anio_tipico', columnas=['day', 'hour', 'slope', 'azimuth', 'G(i)', 'T2m'], filtros={'capital': capital}, raiz=raiz)
+        datos = datos[(datos['slope'] == slope) & (datos['azimuth'] == azimuth)]
+        return serie_anio_tipico(datos[['day', 'hour', 'G(i)', 'T2m']])
+
+    clave = f'sitio_{normalizar_nombre(capital)}_{int(slope)}_{int(azimuth)}'
+    df = _en_cache(clave, _archivos('anio_tipico', raiz, {'capital': capital}), preparar, raiz)
+    return df.set_index('datetime').asfreq('h')
+
+
+def serie_precio(conjunto, raiz=None):
+    # Precios de REE ('precio_spot' o 'precio_pvpc') para Prophet: ds (instante UTC sin zona) e y (€/MWh)
+    def preparar():
+        data = leer(conjunto, columnas=['datetime', 'value'], raiz=raiz)
+        return pd.DataFrame({'ds': data['datetime'].dt.tz_convert('UTC').dt.tz_localize(None), 'y': data['value']})
+
+    return _en_cache(conjunto, _archivos(conjunto, raiz), preparar, raiz)
+
+
+def serie_precio_horaria(conjunto, raiz=None):
+    # Los mismos precios sobre una rejilla horaria regular (índice UTC sin zona; las horas repetidas se
+    # promedian y las que faltan quedan como NaN)
+    precios = serie_precio(conjunto, raiz)
+    return precios.groupby('ds')['y'].mean().asfreq('h')
+
+
+def serie_perfil(columna='COEF. PERFIL A', raiz=None):
+    # Perfil de consumo de una tarifa como serie horaria de 2023 para Prophet: ds e y
+    def preparar():
+        perfil = serie_anio_tipico(leer('perfil', columnas=['day', 'hour', columna], raiz=raiz))
+        return perfil.rename(columns={'datetime': 'ds', columna: 'y'})[['ds', 'y']]
+
+    return _en_cache(f'perfil_{normalizar_nombre(columna)}', _archivos('perfil', raiz), preparar, raiz)
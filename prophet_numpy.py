@@ -0,0 +1,177 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+# Nanosegundos por segundo y segundos por día, igual que Prophet al construir las series de Fourier
+NANOSEGUNDOS_SEGUNDO = 1_000_000_000
+SEGUNDOS_DIA = 3600 * 24.
+
+
+# Evaluador de yhat de un modelo Prophet ya entrenado a partir de sus componentes exportados:
+# tendencia lineal por tramos, estacionalidades de Fourier y escalado. Reproduce Prophet.predict
+# sin construir DataFrames intermedios ni muestrear la incertidumbre
+class ProphetNumpy:
+    def __init__(self, inicio, t_scale, y_scale, piso, k, m, puntos_cambio, deltas, beta,
+                 aditivo, multiplicativo, periodos, ordenes, tendencia='linear'):
+        self.inicio = int(inicio)  # Primer instante del entrenamiento (ns desde 1970)
+        self.t_scale = float(t_scale)  # Duración del entrenamiento (ns)
+        self.y_scale = float(y_scale)
+        self.piso = float(piso)
+        self.k = float(k)
+        self.m = float(m)
+        self.puntos_cambio = np.asarray(puntos_cambio, dtype=float)
+        self.deltas = np.asarray(deltas, dtype=float)
+        self.beta = np.asarray(beta, dtype=float)
+        self.aditivo = np.asarray(aditivo, dtype=float)
+        self.multiplicativo = np.asarray(multiplicativo, dtype=float)
+        self.periodos = np.asarray(periodos, dtype=float)
+        self.ordenes = np.asarray(ordenes, dtype=int)
+        self.tendencia = tendencia
+
+        # Pendiente y ordenada acumuladas tras cada punto de cambio: la tendencia de cada instante se
+        # obtiene con una búsqueda binaria en lugar de comparar con todos los puntos de cambio
+        self._k_tramos = self.k + np.concatenate([[0.], np.cumsum(self.deltas)])
+        self._m_tramos = self.m + np.concatenate([[0.], np.cumsum(-self.puntos_cambio * self.deltas)])
+
+        # Coeficientes de las estacionalidades aditivas (ya en la escala de y) y multiplicativas
+        self._beta_aditivo = self.beta * self.aditivo * self.y_scale
+        self._beta_multiplicativo = self.beta * self.multiplicativo
+        self._hay_multiplicativas = bool(np.any(self.multiplicativo))
+
+    @classmethod
+    def desde_prophet(cls, modelo):
+        # Extrae los componentes de un modelo Prophet entrenado. Solo se admiten los elementos que usan
+        # nuestros modelos: tendencia lineal o plana y estacionalidades sin condición
+        if modelo.history is None:
+            raise ValueError("El modelo Prophet no está entrenado")
+        if modelo.growth not in ('linear', 'flat'):
+            raise ValueError(f"Tendencia '{modelo.growth}' no soportada en la exportación")
+        if modelo.extra_regressors or modelo.holidays is not None or getattr(modelo, 'country_holidays', None):
+            raise ValueError("La exportación no admite regresores adicionales ni festivos")
+        if any(props['condition_name'] is not None for props in modelo.seasonalities.values()):
+            raise ValueError("La exportación no admite estacionalidades condicionales")
+
+        periodos = [props['period'] for props in modelo.seasonalities.values()]
+        ordenes = [props['fourier_order'] for props in modelo.seasonalities.values()]
+
+        # Prophet usa la media de los parámetros (con MAP hay una única muestra)
+        beta = np.nanmean(modelo.params['beta'], axis=0)
+        columnas = modelo.train_component_cols
+        if len(beta) != 2 * sum(ordenes) or len(columnas) != len(beta):
+            raise ValueError("Los coeficientes del modelo no corresponden con sus estacionalidades")
+
+        # Con escalado 'minmax' la serie se desplaza por su mínimo, que Prophet guarda como suelo
+        piso = modelo.y_min if getattr(modelo, 'scaling', 'absmax') == 'minmax' else 0.
+
+        return cls(
+            inicio=modelo.start.value,
+            t_scale=modelo.t_scale.value,
+            y_scale=modelo.y_scale,
+            piso=piso,
+            k=np.nanmean(modelo.params['k']),
+            m=np.nanmean(modelo.params['m']),
+            puntos_cambio=modelo.changepoints_t if modelo.growth == 'linear' else [],
+            deltas=np.nanmean(modelo.params['delta'], axis=0) if modelo.growth == 'linear' else [],
+            beta=beta,
+            aditivo=columnas['additive_terms'].values,
+            multiplicativo=columnas['multiplicative_terms'].values,
+            periodos=periodos,
+            ordenes=ordenes,
+            tendencia=modelo.growth,
+        )
+
+    def _tendencia(self, ns):
+        t = (ns - self.inicio) / self.t_scale
+        if self.tendencia == 'flat':
+            tendencia = np.full(len(t), self.m)
+        else:
+            # Índice del tramo: número de puntos de cambio anteriores o iguales a cada instante
+            tramo = np.searchsorted(self.puntos_cambio, t, side='right')
+            tendencia = self._k_tramos[tramo] * t + self._m_tramos[tramo]
+        return tendencia * self.y_scale + self.piso
+
+    def _fourier(self, ns):
+        # Matriz de términos de Fourier con el mismo orden de columnas que Prophet: por cada
+        # estacionalidad, sin y cos de cada armónico
+        dias = (ns // NANOSEGUNDOS_SEGUNDO) / SEGUNDOS_DIA
+        angulo = dias * np.pi * 2
+        columnas = np.empty((len(ns), len(self.beta)))
+        inicio = 0
+        for periodo, orden in zip(self.periodos, self.ordenes):
+            armonicos = angulo[:, None] * np.arange(1, orden + 1) / periodo
+            columnas[:, inicio:inicio + 2 * orden:2] = np.sin(armonicos)
+            columnas[:, inicio + 1:inicio + 2 * orden:2] = np.cos(armonicos)
+            inicio += 2 * orden
+        return columnas
+
+    def predecir(self, fechas):
+        # yhat para una secuencia de fechas sin zona horaria (Series, DatetimeIndex o array datetime64)
+        ns = pd.DatetimeIndex(fechas).asi8
+        tendencia = self._tendencia(ns)
+        fourier = self._fourier(ns)
+        yhat = tendencia + fourier @ self._beta_aditivo
+        if self._hay_multiplicativas:
+            yhat += tendencia * (fourier @ self._beta_multiplicativo)
+        return yhat
+
+    def componentes(self):
+        # Arrays y escalares que definen el modelo, para guardarlo en el almacén de modelos o en un .npz
+        arrays = {
+            'puntos_cambio': self.puntos_cambio,
+            'deltas': self.deltas,
+            'beta': self.beta,
+            'aditivo': self.aditivo,
+            'multiplicativo': self.multiplicativo,
+            'periodos': self.periodos,
+            'ordenes': self.ordenes,
+        }
+        parametros = {
+            'inicio': self.inicio,
+            't_scale': self.t_scale,
+            'y_scale': self.y_scale,
+            'piso': self.piso,
+            'k': self.k,
+            'm': self.m,
+            'tendencia': self.tendencia,
+        }
+        return arrays, parametros
+
+    @classmethod
+    def desde_componentes(cls, arrays, parametros):
+        return cls(**parametros, **arrays)
+
+    def guardar(self, destino):
+        # Formato compacto: un .npz con los arrays y los escalares del modelo en JSON
+        arrays, parametros = self.componentes()
+        np.savez(destino, parametros=np.array(json.dumps(parametros)), **arrays)
+
+    @classmethod
+    def cargar(cls, origen):
+        # Acepta una ruta o el contenido del archivo en bytes
+        if isinstance(origen, bytes):
+            origen = io.BytesIO(origen)
+        with np.load(origen, allow_pickle=False) as datos:
+            parametros = json.loads(str(datos['parametros']))
+            arrays = {nombre: datos[nombre] for nombre in datos.files if nombre != 'parametros'}
+        return cls.desde_componentes(arrays, parametros)
+
+
+def predecir_yhat(modelo, fechas):
+    # yhat de un modelo Prophet, exportado o original, para las fechas indicadas
+    if isinstance(modelo, ProphetNumpy):
+        return modelo.predecir(fechas)
+    return modelo.predict(pd.DataFrame({'ds': fechas}))['yhat'].values
@@ -0,0 +1,158 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import pandas as pd
+from aiohttp import web
+
+from almacen_datos import leer, ruta_conjunto
+from descarga_pvgis import ARCHIVO_MANIFIESTO, descargar
+
+# Prueba del descargador de PVGIS contra un servidor HTTP local que imita seriescalc: cada combinación
+# responde según un guion (503, 429 con Retry-After, 404 definitivo o datos) y el servidor anota las
+# peticiones recibidas. Comprueba los reintentos, que se respete Retry-After y que al relanzar la
+# descarga solo se pidan las combinaciones que faltan según el manifiesto. Termina con código 1 si
+# alguna comprobación falla
+
+RETRY_AFTER = 1  # Segundos pedidos por el servidor en las respuestas 429
+
+# Combinaciones (capital, lat, lon, slope, azimuth) y el guion de estados de cada una; tras agotar el
+# guion el servidor responde 200 con datos
+GUIONES = {
+    ('Albacete', 38.9943, -1.8585, 30, '180'): [],
+    ('Alicante', 38.3452, -0.4810, 30, '180'): [503, 503],
+    ('Almería', 36.8340, -2.4637, 30, '90'): [429],
+    ('Ávila', 40.6565, -4.6818, 0, '180'): [404],
+}
+
+parser = argparse.ArgumentParser(description="Prueba el descargador de PVGIS contra un servidor local simulado")
+parser.add_argument('--horas', type=int, default=48, help="Horas de cada serie simulada")
+parser.add_argument('-v', '--verbose', action='store_true', help="Muestra los registros del descargador")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL, format='%(asctime)s %(levelname)s %(message)s')
+
+
+class ServidorSimulado:
+    def __init__(self, guiones, horas):
+        # Las peticiones se identifican por (lat, lon, slope, aspect), como las ve PVGIS
+        self.guiones = {self.clave(*combinacion[1:]): list(guion) for combinacion, guion in guiones.items()}
+        self.horas = horas
+        self.peticiones = defaultdict(list)  # clave -> instantes de las peticiones
+
+    @staticmethod
+    def clave(lat, lon, slope, azimuth):
+        return float(lat), float(lon), int(slope), float(azimuth) - 180
+
+    async def seriescalc(self, peticion):
+        consulta = peticion.query
+        clave = (float(consulta['lat']), float(consulta['lon']), int(consulta['slope']), float(consulta['aspect']))
+        self.peticiones[clave].append(time.monotonic())
+        guion = self.guiones.get(clave)
+        if guion is None:
+            return web.Response(status=400, text="Combinación desconocida")
+        if guion and guion[0] == 404:
+            return web.Response(status=404, text="Sin datos para esta ubicación")
+        if guion:
+            estado = guion.pop(0)
+            cabeceras = {'Retry-After': str(RETRY_AFTER)} if estado == 429 else {}
+            return web.Response(status=estado, headers=cabeceras, text="Servicio no disponible")
+        horas = pd.date_range('2020-01-01 00:10', periods=self.horas, freq='h')
+        return web.json_response({'outputs': {'hourly': [
+            {'time': hora.strftime('%Y%m%d:%H%M'), 'G(i)': float(i % 24), 'T2m': 10.0, 'WS10m': 1.0}
+            for i, hora in enumerate(horas)
+        ]}})
+
+
+fallos = []
+
+
+def comprobar(condicion, mensaje):
+    print(f"{'OK   ' if condicion else 'FALLO'} {mensaje}")
+    if not condicion:
+        fallos.append(mensaje)
+
+
+async def principal(raiz):
+    servidor = ServidorSimulado(GUIONES, args.horas)
+    aplicacion = web.Application()
+    aplicacion.router.add_get('/api/v5_2/seriescalc', servidor.seriescalc)
+    corredor = web.AppRunner(aplicacion)
+    await corredor.setup()
+    sitio = web.TCPSite(corredor, '127.0.0.1', 0)
+    await sitio.start()
+    puerto = corredor.addresses[0][1]
+    url = f"http://127.0.0.1:{puerto}/api/v5_2/seriescalc"
+    combinaciones = list(GUIONES)
+    claves = {combinacion: ServidorSimulado.clave(*combinacion[1:]) for combinacion in combinaciones}
+
+    def ejecutar():
+        return descargar(combinaciones, raiz=raiz, url=url, concurrencia=4, peticiones_por_segundo=0,
+                         reintentos=3, espera_base=0.01, timeout=10)
+
+    try:
+        # Primera ejecución: reintentos ante 503 y 429, fallo definitivo ante 404
+        resumen = await ejecutar()
+        comprobar(resumen['descargadas'] == 3 and resumen['omitidas'] == 0, f"primera ejecución: {resumen['descargadas']} descargadas, {resumen['omitidas']} omitidas")
+        comprobar([f[0] for f in resumen['fallidas']] == ['Ávila'], "el 404 falla sin reintentos y no detiene las demás")
+        for combinacion, esperadas in zip(combinaciones, [1, 3, 2, 1]):
+            recibidas = len(servidor.peticiones[claves[combinacion]])
+            comprobar(recibidas == esperadas, f"{combinacion[0]}: {recibidas} peticiones (esperadas {esperadas})")
+        instantes = servidor.peticiones[claves[combinaciones[2]]]
+        comprobar(instantes[1] - instantes[0] >= RETRY_AFTER - 0.05, f"Retry-After respetado ({instantes[1] - instantes[0]:.2f} s)")
+        datos = leer('pvgis', raiz=raiz)
+        comprobar(len(datos) == 3 * args.horas, f"{len(datos)} filas guardadas en el dataset 'pvgis'")
+
+        # Segunda ejecución: el manifiesto evita repetir las completadas, aunque su última línea esté
+        # a medio escribir; solo se vuelve a pedir la que falló
+        with open(os.path.join(ruta_conjunto('pvgis', raiz), ARCHIVO_MANIFIESTO), 'a', encoding='utf-8') as f:
+            f.write('{"capital": "Ávila", "slo')
+        servidor.peticiones.clear()
+        resumen = await ejecutar()
+        comprobar(resumen['omitidas'] == 3, f"reanudación: {resumen['omitidas']} combinaciones omitidas por el manifiesto")
+        comprobar(set(servidor.peticiones) == {claves[combinaciones[3]]}, "reanudación: solo se pide la combinación que falló")
+
+        # Las entradas sin versión de formato (orientación antigua) cuentan como pendientes
+        ruta = os.path.join(ruta_conjunto('pvgis', raiz), ARCHIVO_MANIFIESTO)
+        with open(ruta, encoding='utf-8') as f:
+            entradas = [json.loads(linea) for linea in f if linea.endswith('}\n')]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for entrada in entradas:
+                if entrada['capital'] == 'Albacete':
+                    del entrada['formato']
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        servidor.peticiones.clear()
+        resumen = await ejecutar()
+        comprobar(claves[combinaciones[0]] in servidor.peticiones and resumen['descargadas'] == 1,
+                  "las entradas sin versión de formato se vuelven a descargar")
+        datos = leer('pvgis', raiz=raiz)
+        comprobar(len(datos) == 3 * args.horas, f"volver a descargar sustituye la partición ({len(datos)} filas)")
+    finally:
+        await corredor.cleanup()
+
+
+with tempfile.TemporaryDirectory() as raiz:
+    asyncio.run(principal(raiz))
+
+if fallos:
+    sys.exit(f"{len(fallos)} comprobación(es) fallida(s)")
+print("El descargador supera todas las comprobaciones contra el servidor simulado")
@@ -0,0 +1,166 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import math
+import re
+import unicodedata
+
+import pandas as pd
+
+# Ubicaciones para las que se entrenan modelos de irradiación (una por capital de provincia, con varias
+# inclinaciones y orientaciones) y selección del modelo más adecuado para una instalación: la capital
+# entrenada más cercana a la ciudad indicada y, dentro de ella, la interpolación entre las inclinaciones
+# y orientaciones entrenadas
+
+# Lista de capitales de provincia de España con sus coordenadas (latitud y longitud)
+CAPITALES = {
+    "Albacete": (38.9943, -1.8585),
+    "Alicante": (38.3452, -0.4810),
+    "Almería": (36.8340, -2.4637),
+    "Ávila": (40.6565, -4.6818),
+    "Badajoz": (38.8786, -6.9700),
+    "Barcelona": (41.3851, 2.1734),
+    "Bilbao": (43.2630, -2.9350),
+    "Burgos": (42.3439, -3.6969),
+    "Cáceres": (39.4763, -6.3722),
+    "Cádiz": (36.5271, -6.2886),
+    "Castellón": (39.9864, -0.0513),
+    "Ciudad Real": (38.9848, -3.9276),
+    "Córdoba": (37.8882, -4.7794),
+    "Cuenca": (40.0707, -2.1374),
+    "Girona": (41.9794, 2.8214),
+    "Granada": (37.1773, -3.5986),
+    "Guadalajara": (40.6333, -3.1669),
+    "Huelva": (37.2614, -6.9447),
+    "Huesca": (42.1401, -0.4089),
+    "Jaén": (37.7796, -3.7849),
+    "León": (42.5987, -5.5671),
+    "Lleida": (41.6176, 0.6200),
+    "Logroño": (42.4627, -2.4445),
+    "Lugo": (43.0125, -7.5550),
+    "Madrid": (40.4168, -3.7038),
+    "Málaga": (36.7213, -4.4214),
+    "Murcia": (37.9922, -1.1307),
+    "Palencia": (42.0095, -4.5270),
+    "Las Palmas": (28.1235, -15.4363),
+    "Pontevedra": (42.4310, -8.6444),
+    "Salamanca": (40.9701, -5.6635),
+    "Santa Cruz de Tenerife": (28.4636, -16.2518),
+    "Santander": (43.4623, -3.8098),
+    "Segovia": (40.9429, -4.1080),
+    "Sevilla": (37.3891, -5.9845),
+    "Soria": (41.7661, -2.4797),
+    "Tarragona": (41.1189, 1.2445),
+    "Teruel": (40.3440, -1.1069),
+    "Toledo": (39.8628, -4.0273),
+    "Valencia": (39.4699, -0.3763),
+    "Valladolid": (41.6523, -4.7245),
+    "Vitoria": (42.8469, -2.6725),
+    "Zamora": (41.5033, -5.7447),
+    "Zaragoza": (41.6490, -0.8891),
+}
+
+# Prefijo de los modelos de irradiación por ubicación en el almacén de modelos
+PREFIJO_MODELO_SITIO = 'irradiacion_sitio_'
+
+
+# La ciudad indicada no es una capital conocida
+class SitioDesconocido(ValueError):
+    pass
+
+
+def normalizar_nombre(texto):
+    # Minúsculas sin tildes ni signos, para comparar nombres de ciudades y construir nombres de archivo
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-')
+
+
+_CAPITALES_NORMALIZADAS = {normalizar_nombre(capital): capital for capital in CAPITALES}
+
+
+def buscar_capital(ciudad):
+    capital = _CAPITALES_NORMALIZADAS.get(normalizar_nombre(ciudad))
+    if capital is None:
+        raise SitioDesconocido(f"Ciudad desconocida '{ciudad}'. Opciones: {', '.join(CAPITALES)}")
+    return capital
+
+
+def nombre_modelo_sitio(capital, slope, azimuth):
+    return f"{PREFIJO_MODELO_SITIO}{normalizar_nombre(capital)}_{int(slope)}_{int(azimuth)}"
+
+
+def clave_sitio(ciudad, inclinacion, orientacion):
+    # Identificador de la instalación en la caché de predicciones (apto como nombre de archivo)
+    return f"{normalizar_nombre(ciudad)}_{float(inclinacion):g}_{float(orientacion) % 360:g}"
+
+
+def distancia_km(latitud1, longitud1, latitud2, longitud2):
+    # Distancia por la superficie terrestre (fórmula del haversine)
+    latitud1, longitud1, latitud2, longitud2 = map(math.radians, (latitud1, longitud1, latitud2, longitud2))
+    a = math.sin((latitud2 - latitud1) / 2) ** 2 + math.cos(latitud1) * math.cos(latitud2) * math.sin((longitud2 - longitud1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+def serie_anio_tipico(anio_tipico, anio=2023):
+    # Serie horaria de un año a partir del año típico (day, hour, ...). El año típico usa un calendario
+    # bisiesto (el día 60 es el 29 de febrero), que se descarta si el año de la serie no es bisiesto
+    df = anio_tipico
+    dia = df['day'].astype('int64')
+    if not pd.Timestamp(anio, 1, 1).is_leap_year:
+        df, dia = df[dia != 60], dia[dia != 60]
+        dia = dia - (dia > 60)
+    df = df.assign(datetime=pd.to_datetime((dia - 1) * 24 + df['hour'].astype('int64'), unit='h', origin=f'{anio}-01-01'))
+    return df.drop(columns=['day', 'hour']).sort_values('datetime').reset_index(drop=True)
+
+
+def _vecinos(valores, objetivo, circular=False):
+    # Valores entrenados que encierran al objetivo, con sus pesos de interpolación lineal. Fuera del
+    # rango se usa el extremo más cercano; las orientaciones se tratan como ángulos (360 = 0)
+    if circular:
+        originales = {float(v) % 360: v for v in valores}
+        ordenados = sorted(originales)
+        objetivo = float(objetivo) % 360
+        if len(ordenados) == 1:
+            return [(originales[ordenados[0]], 1.0)]
+        extendidos = ordenados + [ordenados[0] + 360]
+        if objetivo < ordenados[0]:
+            objetivo += 360
+        for inferior, superior in zip(extendidos, extendidos[1:]):
+            if inferior <= objetivo <= superior:
+                t = (objetivo - inferior) / (superior - inferior)
+                return [(originales[inferior % 360], 1 - t), (originales[superior % 360], t)]
+
+    ordenados = sorted(set(valores))
+    if objetivo <= ordenados[0]:
+        return [(ordenados[0], 1.0)]
+    if objetivo >= ordenados[-1]:
+        return [(ordenados[-1], 1.0)]
+    for inferior, superior in zip(ordenados, ordenados[1:]):
+        if inferior <= objetivo <= superior:
+            t = (objetivo - inferior) / (superior - inferior)
+            return [(inferior, 1 - t), (superior, t)]
+
+
+def ponderar_sitio(sitios, ciudad, inclinacion, orientacion):
+    # sitios: {(capital, slope, azimuth): nombre del modelo}. Devuelve la capital elegida y la lista
+    # (nombre del modelo, peso) cuya combinación estima la irradiación de la instalación
+    latitud, longitud = CAPITALES[buscar_capital(ciudad)]
+    entrenadas = {capital for capital, _, _ in sitios}
+    capital = min(entrenadas, key=lambda c: distancia_km(latitud, longitud, *CAPITALES[c]))
+    combinaciones = {(slope, azimuth): nombre for (c, slope, azimuth), nombre in sitios.items() if c == capital}
+
+    # Interpolación bilineal entre las inclinaciones entrenadas y, en cada una, entre sus orientaciones
+    pesos = {}
+    for slope, peso_slope in _vecinos([s for s, _ in combinaciones], inclinacion):
+        for azimuth, peso_azimuth in _vecinos([a for s, a in combinaciones if s == slope], orientacion, circular=True):
+            pesos[combinaciones[slope, azimuth]] = pesos.get(combinaciones[slope, azimuth], 0) + peso_slope * peso_azimuth
+    return capital, [(nombre, peso) for nombre, peso in pesos.items() if peso > 0]
@@ -0,0 +1,79 @@
+"""
+Universitat Carlemany - Bachelor en Data Science
+
+Proyecto Final de Bachelor: 
+"Optimización Económica del Almacenamiento de Energía en Sistemas Fotovoltaicos Mediante Algoritmos de Machine Learning"
+
+Autor: Pablo Felipe Cano Galán
+Descripción: Este código forma parte del trabajo de fin de grado (TFB), centrado en el desarrollo de modelos de machine learning para la predicción de momentos óptimos de carga y descarga de baterías en sistemas fotovoltaicos, con el fin de maximizar la eficiencia energética y la rentabilidad económica de dichos sistemas. El proyecto incluye la implementación de herramientas de simulación y una aplicación web para facilitar la gestión de sistemas fotovoltaicos.
+
+Fecha: 07/09/2024
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from almacen_modelos import AlmacenModelos
+
+# Comprueba que el evaluador NumPy, tal como lo carga la API desde el almacén de modelos, reproduce
+# Prophet.predict del objeto Prophet guardado en la misma versión (objeto=True al entrenar) sobre el
+# rango de entrenamiento y el año siguiente, que es lo que pide la API, con error relativo máximo
+# TOLERANCIA. Termina con código 1 si algún modelo no coincide o no se puede validar
+TOLERANCIA = 1e-9
+
+parser = argparse.ArgumentParser(description="Valida los modelos Prophet del almacén frente a Prophet.predict")
+parser.add_argument('--modelos', default=os.environ.get('MODELOS_PATH', 'modelos'), help="Almacén de modelos")
+parser.add_argument('--nombres', nargs='+', default=['precio_energia', 'tarifa_pvpc', 'perfil_consumo'],
+                    help="Modelos Prophet a validar (versión actual de cada uno)")
+args = parser.parse_args()
+
+almacen = AlmacenModelos(args.modelos)
+
+
+def fechas_validacion(metadatos):
+    rango = metadatos['rango_entrenamiento']
+    return pd.date_range(rango['inicio'], pd.Timestamp(rango['fin']) + pd.DateOffset(years=1), freq='h')
+
+
+fallos = []
+print(f"{'Modelo':<20}{'Versión':>27}{'Horas':>8}{'Error máx.':>14}{'Error rel.':>14}{'Prophet (s)':>14}{'NumPy (s)':>12}{'24 h (µs)':>12}")
+for nombre in args.nombres:
+    exportado, metadatos = almacen.cargar(nombre)
+    if metadatos['tipo'] != 'prophet' or not metadatos.get('objeto') or not metadatos.get('rango_entrenamiento'):
+        print(f"{nombre:<20}{metadatos['version']:>27}  sin objeto Prophet o rango de entrenamiento guardados")
+        fallos.append(nombre)
+        continue
+    modelo = almacen.cargar_objeto(nombre, metadatos['version'])
+    fechas = fechas_validacion(metadatos)
+
+    inicio = time.perf_counter()
+    referencia = modelo.predict(pd.DataFrame({'ds': fechas}))['yhat'].values
+    tiempo_prophet = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    yhat = exportado.predecir(fechas)
+    tiempo_numpy = time.perf_counter() - inicio
+
+    # Latencia de una petición típica de la API (un día)
+    dia = fechas[:24]
+    repeticiones = 1000
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        exportado.predecir(dia)
+    latencia_dia = (time.perf_counter() - inicio) / repeticiones * 1e6
+
+    error = np.max(np.abs(yhat - referencia))
+    error_relativo = error / np.max(np.abs(referencia))
+    if not error_relativo <= TOLERANCIA:
+        fallos.append(nombre)
+    print(f"{nombre:<20}{metadatos['version']:>27}{len(fechas):>8}{error:>14.2e}{error_relativo:>14.2e}{tiempo_prophet:>14.2f}{tiempo_numpy:>12.4f}{latencia_dia:>12.0f}")
+
+if fallos:
+    sys.exit(f"{len(fallos)} modelo(s) sin validar o que no reproducen Prophet.predict dentro de la tolerancia "
+             f"{TOLERANCIA}: {', '.join(fallos)}")
+print("Todos los modelos exportados reproducen Prophet.predict")